@@ -0,0 +1,185 @@
+import argparse
+import random
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import db
+from metrics_core import compute_metrics, group_by_key
+
+# Metrics are rounded to cents (build_metrics), and a different summation
+# order can move a value across a rounding boundary: allow one cent.
+METRIC_TOLERANCE = 0.01
+
+DEFAULT_SEED = 7
+DEFAULT_EVENTS = 2000
+
+
+def _event(
+    index: int, account_id: str, strategy_id: str, timestamp: str, pnl: float
+) -> Dict[str, Any]:
+    return {
+        "event_id": f"evt_parity_{index:06d}",
+        "account_id": account_id,
+        "strategy_id": strategy_id,
+        "environment": "demo",
+        "venue": "parity",
+        "timestamp": timestamp,
+        "symbol": "XAUUSD",
+        "side": "buy" if index % 2 else "sell",
+        "order_type": "market",
+        "quantity": 1.0,
+        "quantity_type": "lots",
+        "price_open": 100.0,
+        "price_close": 100.0 + pnl,
+        "fees": 0.0,
+        "pnl": pnl,
+        "state": "closed",
+    }
+
+
+def build_fixture_events(num_events: int = DEFAULT_EVENTS, seed: int = DEFAULT_SEED) -> List[dict]:
+    """
+    Fixed events, in insertion order, covering what the metric paths can get
+    wrong:
+    - runs of trades with the same timestamp (ties keep insertion order),
+    - timestamps that go back in time, some with a UTC offset or fractions,
+    - negative, zero and tiny pnl values (summation order matters),
+    - several accounts and strategies, so every aggregate scope has groups.
+    """
+    rng = random.Random(seed)
+    events: List[dict] = []
+
+    def add(account_id: str, strategy_id: str, timestamp: str, pnl: float) -> None:
+        events.append(_event(len(events), account_id, strategy_id, timestamp, pnl))
+
+    # Ties: same timestamp, drawdown depends on the order they are applied.
+    for pnl in (5.0, -7.5, 0.0, 12.25, -20.0, 0.0):
+        add("acc_a", "strat_1", "2025-01-02T10:00:00Z", pnl)
+    # Back in time, and the same instant written with an offset.
+    add("acc_a", "strat_1", "2025-01-01T09:00:00Z", -3.0)
+    add("acc_b", "strat_1", "2025-01-02T12:00:00+02:00", 4.5)
+    add("acc_b", "strat_2", "2025-01-02T10:00:00.250000Z", -0.01)
+    add("acc_b", "strat_2", "2025-01-02T10:00:00.25Z", 0.01)
+    # Values whose float sum depends on the order.
+    for pnl in (0.1, 0.2, -0.3, 1e-9, -1e-9):
+        add("acc_c", "strat_2", "2025-01-03T00:00:00Z", pnl)
+
+    accounts = ["acc_a", "acc_b", "acc_c", "acc_d"]
+    strategies = ["strat_1", "strat_2", "strat_3"]
+    while len(events) < num_events:
+        day = rng.randint(1, 28)
+        second = rng.randint(0, 86399)
+        hours, minutes, seconds = second // 3600, second // 60 % 60, second % 60
+        timestamp = f"2025-02-{day:02d}T{hours:02d}:{minutes:02d}:{seconds:02d}Z"
+        pnl = rng.choice([0.0, round(rng.gauss(0.0, 25.0), 2), -round(rng.random(), 4)])
+        add(rng.choice(accounts), rng.choice(strategies), timestamp, pnl)
+    return events
+
+
+def _close(expected: Any, actual: Any) -> bool:
+    if isinstance(expected, float) or isinstance(actual, float):
+        return abs(float(expected) - float(actual)) <= METRIC_TOLERANCE + 1e-9
+    return expected == actual
+
+
+def compare(label: str, expected: dict, actual: dict) -> bool:
+    """
+    Print and return whether two metrics dicts agree (floats within
+    METRIC_TOLERANCE, everything else exactly).
+    """
+    if expected.keys() == actual.keys() and all(_close(expected[k], actual[k]) for k in expected):
+        return True
+    print(f"[MISMATCH] {label}")
+    print(f"  compute_metrics: {expected}")
+    print(f"  sql/aggregates : {actual}")
+    return False
+
+
+def load_fixture(events: List[dict]) -> None:
+    """
+    Insert the events into the configured database in their list order, mixing
+    the batch and single-event insert paths. Out-of-order timestamps leave
+    aggregate rows dirty; they are replayed afterwards, as the server's
+    AggregateRefresher would.
+    """
+    half = len(events) // 2
+    db.insert_trade_events(events[:half])
+    for event in events[half:half + 100]:
+        db.insert_trade_event(event)
+    db.insert_trade_events(events[half + 100:])
+    db.refresh_dirty_aggregates()
+
+
+def check_parity(events: List[dict]) -> bool:
+    """
+    Compare overall, per-strategy and per-account metrics of the database
+    paths against compute_metrics over the fixture (python engine, ties in
+    insertion order, i.e. the trades id order the SQL paths use).
+    """
+    ok = True
+    for source, fetch in (
+        ("sql", db.fetch_metrics_sql),
+        ("aggregates", db.fetch_aggregated_metrics),
+    ):
+        expected_overall = compute_metrics(events, engine="python")
+        ok &= compare(f"{source} overall", expected_overall, fetch()[0]["metrics"])
+
+        for key_name in ("strategy_id", "account_id"):
+            expected = {
+                key: compute_metrics(group_events, engine="python")
+                for key, group_events in group_by_key(events, key_name).items()
+            }
+            actual = {group["key"]: group["metrics"] for group in fetch(group_by=key_name)}
+            if set(expected) != set(actual):
+                print(f"[MISMATCH] {source} {key_name} groups differ")
+                ok = False
+                continue
+            for key in expected:
+                ok &= compare(f"{source} {key_name} = {key}", expected[key], actual[key])
+    return ok
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Check that the SQL and aggregate metrics match compute_metrics"
+    )
+    parser.add_argument("--events", type=int, default=DEFAULT_EVENTS, help="fixture size")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="fixture seed")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Parity check for the backend metrics paths.
+
+    Loads a fixed set of events into a temporary database (db.configure)
+    and recomputes overall, per-strategy and per-account metrics three ways:
+    - metrics_core.compute_metrics over the events (the reference),
+    - db.fetch_metrics_sql (SQL GROUP BY + window functions),
+    - db.fetch_aggregated_metrics (materialized trade_aggregates),
+    and reports any difference. Exits with status 1 on mismatch.
+    """
+    args = parse_args(argv)
+    events = build_fixture_events(args.events, args.seed)
+    previous_path = db.DB_PATH
+    with tempfile.TemporaryDirectory(prefix="trueedge_parity_") as tmp_dir:
+        db.configure(db_path=Path(tmp_dir) / "parity.db")
+        try:
+            db.init_db()
+            load_fixture(events)
+            print(f"Checking metrics parity over {len(events)} fixture events")
+            ok = check_parity(events)
+        finally:
+            db.close_connections()
+            db.configure(db_path=previous_path)
+            db.close_connections()
+
+    if not ok:
+        sys.exit(1)
+    print("OK: all metrics paths agree.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,364 @@
-import json
+import itertools
+import queue
 import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Set, Tuple
+
+
+# Make sure we can import shared modules from local_logger
+ROOT_DIR = Path(__file__).resolve().parents[1]  # .../02_CODE
+LOCAL_LOGGER_DIR = ROOT_DIR / "local_logger"
+if str(LOCAL_LOGGER_DIR) not in sys.path:
+    sys.path.insert(0, str(LOCAL_LOGGER_DIR))
+
+import json_codec
+from metrics_core import (
+    DEFAULT_GROUP_KEYS,
+    TIMESTAMP_MIN_US,
+    GroupedMetricsAggregator,
+    build_metrics,
+    parse_timestamp_us,
+)
 
 
 DB_PATH = Path(__file__).resolve().parent / "trueedge_backend.db"
 
+# Number of read-only connections kept open for metrics/report queries.
+READER_POOL_SIZE = 4
+
+# Per-connection prepared statement cache (sqlite3 reuses statements by SQL text).
+STATEMENT_CACHE_SIZE = 256
+
+# PRAGMAs applied to every connection. Override via configure().
+# - synchronous: FULL makes every acknowledged commit survive power loss.
+#   NORMAL (opt-in, e.g. server.py --synchronous NORMAL) is faster and still
+#   durable across application crashes in WAL mode, but a power loss can
+#   drop the last commits.
+# - cache_size: negative values are KiB (-65536 = 64 MiB page cache).
+# - mmap_size: bytes of the database file to memory-map for reads.
+# - temp_store: keep temporary tables/indices in memory.
+PRAGMAS: Dict[str, Any] = {
+    "synchronous": "FULL",
+    "cache_size": -65536,
+    "mmap_size": 268435456,
+    "temp_store": "MEMORY",
+}
+
+
+class ConnectionManager:
+    """
+    Long-lived SQLite connections for the backend.
+
+    - One writer connection in WAL mode, serialized by a lock.
+    - A pool of read-only reader connections. In WAL mode readers work on a
+      snapshot and never block the writer (and the writer never blocks them).
+
+    Connections are opened lazily and kept for the lifetime of the process,
+    so requests do not pay connection setup and statements stay prepared.
+
+    data_version() is a cheap change signal for caches: it changes after any
+    commit that modified the database, from this process or another one.
+    """
+
+    _generations = itertools.count(1)
+
+    def __init__(
+        self,
+        db_path: Path,
+        reader_pool_size: int = READER_POOL_SIZE,
+        pragmas: Optional[Dict[str, Any]] = None,
+        statement_cache_size: int = STATEMENT_CACHE_SIZE,
+    ) -> None:
+        self.db_path = Path(db_path)
+        self.reader_pool_size = max(1, reader_pool_size)
+        self.pragmas = dict(PRAGMAS if pragmas is None else pragmas)
+        self.statement_cache_size = statement_cache_size
+
+        self._write_lock = threading.Lock()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._readers_opened = 0
+        self._readers_lock = threading.Lock()
+        self._all_readers: List[sqlite3.Connection] = []
+
+        # Counters for the /internal/stats endpoint (see stats()).
+        self.transactions = 0
+        self.writer_wait_seconds = 0.0
+        self.writer_busy_seconds = 0.0
+        self.reader_waits = 0
+        self.reader_wait_seconds = 0.0
+
+        # Separate connection that only reads PRAGMA data_version.
+        self.generation = next(self._generations)
+        self._version_conn: Optional[sqlite3.Connection] = None
+        self._version_lock = threading.Lock()
+
+    def _prepare(self, conn: sqlite3.Connection) -> None:
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        # Lets SQL order trades by time the same way metrics_core does.
+        conn.create_function(
+            "trueedge_ts_us", 1, parse_timestamp_us, deterministic=True
+        )
+
+    def _open_writer(self) -> sqlite3.Connection:
+        # isolation_level=None: autocommit; multi-statement work uses explicit
+        # BEGIN IMMEDIATE ... COMMIT (see transaction()).
+        conn = sqlite3.connect(
+            self.db_path,
+            isolation_level=None,
+            check_same_thread=False,
+            cached_statements=self.statement_cache_size,
+        )
+        conn.execute("PRAGMA journal_mode = WAL")
+        self._prepare(conn)
+        return conn
+
+    def _open_reader(self) -> sqlite3.Connection:
+        # Make sure the database (and its WAL files) exist before opening read-only.
+        if self._writer is None:
+            with self._write_lock:
+                if self._writer is None:
+                    self._writer = self._open_writer()
+
+        uri = self.db_path.resolve().as_uri() + "?mode=ro"
+        conn = sqlite3.connect(
+            uri,
+            uri=True,
+            check_same_thread=False,
+            cached_statements=self.statement_cache_size,
+        )
+        self._prepare(conn)
+        conn.execute("PRAGMA query_only = 1")
+        return conn
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """
+        Yield the single writer connection, holding the write lock.
+        """
+        waited = time.perf_counter()
+        with self._write_lock:
+            acquired = time.perf_counter()
+            self.writer_wait_seconds += acquired - waited
+            try:
+                if self._writer is None:
+                    self._writer = self._open_writer()
+                yield self._writer
+            finally:
+                self.writer_busy_seconds += time.perf_counter() - acquired
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Yield the writer connection inside BEGIN IMMEDIATE ... COMMIT.
+        Rolls back if the block raises.
+        """
+        with self.writer() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            self.transactions += 1
+
+    def _acquire_reader(self) -> sqlite3.Connection:
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._readers_lock:
+            can_open = self._readers_opened < self.reader_pool_size
+            if can_open:
+                self._readers_opened += 1
+        if not can_open:
+            waited = time.perf_counter()
+            conn = self._readers.get()
+            with self._readers_lock:
+                self.reader_waits += 1
+                self.reader_wait_seconds += time.perf_counter() - waited
+            return conn
+
+        try:
+            conn = self._open_reader()
+        except Exception:
+            with self._readers_lock:
+                self._readers_opened -= 1
+            raise
+        with self._readers_lock:
+            self._all_readers.append(conn)
+        return conn
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """
+        Borrow a read-only connection from the pool.
+
+        Opens a new one while fewer than reader_pool_size exist; otherwise
+        waits for one to be returned.
+        """
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._readers.put(conn)
+
+    def data_version(self) -> Tuple[int, int]:
+        """
+        (manager generation, PRAGMA data_version of a dedicated connection).
+
+        SQLite changes a connection's data_version whenever another connection
+        commits a change to the database, so any write (through this
+        manager's writer or from another process) yields a new value. Reading
+        it does not touch the tables.
+        """
+        with self._version_lock:
+            if self._version_conn is None:
+                self._version_conn = self._open_reader()
+            return self.generation, self._version_conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Pool sizes and lock/wait counters (flat names, *_total are counters).
+        """
+        return {
+            "db_reader_pool_size": self.reader_pool_size,
+            "db_readers_open": self._readers_opened,
+            "db_readers_idle": self._readers.qsize(),
+            "db_reader_waits_total": self.reader_waits,
+            "db_reader_wait_seconds_total": round(self.reader_wait_seconds, 6),
+            "db_writer_wait_seconds_total": round(self.writer_wait_seconds, 6),
+            "db_writer_busy_seconds_total": round(self.writer_busy_seconds, 6),
+            "db_transactions_total": self.transactions,
+        }
+
+    def close(self) -> None:
+        """
+        Close all connections owned by this manager.
+        """
+        with self._version_lock:
+            if self._version_conn is not None:
+                self._version_conn.close()
+                self._version_conn = None
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        with self._readers_lock:
+            for conn in self._all_readers:
+                conn.close()
+            self._all_readers = []
+            self._readers_opened = 0
+            self._readers = queue.LifoQueue()
+
+
+_manager: Optional[ConnectionManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_manager() -> ConnectionManager:
+    """
+    Return the process-wide ConnectionManager, creating it on first use.
+    """
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = ConnectionManager(DB_PATH)
+    return _manager
+
+
+def configure(
+    db_path: Optional[Path] = None,
+    reader_pool_size: Optional[int] = None,
+    **pragmas: Any,
+) -> None:
+    """
+    Change connection settings (database path, reader pool size, PRAGMAs).
+
+    Closes the current connections; the next query reopens them with the new
+    settings. Example:
+        configure(synchronous="FULL", cache_size=-262144)
+    """
+    global _manager, DB_PATH, READER_POOL_SIZE
+    with _manager_lock:
+        if db_path is not None:
+            DB_PATH = Path(db_path)
+        if reader_pool_size is not None:
+            READER_POOL_SIZE = reader_pool_size
+        unknown = set(pragmas) - set(PRAGMAS)
+        if unknown:
+            raise ValueError(f"Unsupported PRAGMA settings: {sorted(unknown)}")
+        PRAGMAS.update(pragmas)
+        if _manager is not None:
+            _manager.close()
+        _manager = ConnectionManager(DB_PATH, reader_pool_size=READER_POOL_SIZE)
+
+
+def data_version() -> Tuple[int, int]:
+    """
+    Token that changes whenever the database content changes
+    (see ConnectionManager.data_version). Only compare it for equality.
+    """
+    return get_manager().data_version()
+
+
+def connection_stats() -> Dict[str, float]:
+    return get_manager().stats()
+
+
+# Rows read by the metrics and events queries, counted per thread so the
+# HTTP layer can report rows scanned per request (take_rows_scanned).
+_rows_scanned = threading.local()
+
+
+def _count_rows_scanned(n: int) -> None:
+    _rows_scanned.count = (getattr(_rows_scanned, "count", None) or 0) + n
+
+
+def take_rows_scanned() -> Optional[int]:
+    """
+    Rows read by this thread's queries since the last call (None if none ran).
+    """
+    count = getattr(_rows_scanned, "count", None)
+    _rows_scanned.count = None
+    return count
+
 
-def get_connection() -> sqlite3.Connection:
+def close_connections() -> None:
     """
-    Open a connection to the SQLite database.
+    Close all pooled connections (e.g. on server shutdown).
     """
-    return sqlite3.connect(DB_PATH)
+    global _manager
+    with _manager_lock:
+        if _manager is not None:
+            _manager.close()
+            _manager = None
+
+
+# Bump when adding a migration to _migrate(); stored in PRAGMA user_version.
+SCHEMA_VERSION = 3
+
+# Rows per transaction when backfilling a new column on an existing table.
+MIGRATION_BATCH_ROWS = 50_000
 
 
 def init_db() -> None:
     """
-    Create the trades table if it does not exist.
+    Create the trades table if it does not exist, and migrate older
+    databases in place to the current schema.
     """
-    conn = get_connection()
-    try:
-        cur = conn.cursor()
-        cur.execute(
+    with get_manager().writer() as conn:
+        conn.execute(
             """
             CREATE TABLE IF NOT EXISTS trades (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -41,110 +378,965 @@ def init_db() -> None:
                 fees REAL,
                 pnl REAL,
                 state TEXT,
-                raw_json TEXT NOT NULL
+                raw_json TEXT NOT NULL,
+                ts_us INTEGER
             )
             """
         )
-        conn.commit()
-    finally:
-        conn.close()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS trade_aggregates (
+                scope TEXT NOT NULL,
+                account_id TEXT NOT NULL,
+                strategy_id TEXT NOT NULL,
+                trade_count INTEGER NOT NULL,
+                total_pnl REAL NOT NULL,
+                wins INTEGER NOT NULL,
+                losses INTEGER NOT NULL,
+                equity REAL NOT NULL,
+                peak REAL NOT NULL,
+                max_drawdown REAL NOT NULL,
+                last_ts_us INTEGER NOT NULL,
+                dirty INTEGER NOT NULL DEFAULT 0,
+                dirty_from_us INTEGER,
+                PRIMARY KEY (scope, account_id, strategy_id)
+            ) WITHOUT ROWID
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS trade_aggregate_checkpoints (
+                scope TEXT NOT NULL,
+                account_id TEXT NOT NULL,
+                strategy_id TEXT NOT NULL,
+                ts_us INTEGER NOT NULL,
+                trade_count INTEGER NOT NULL,
+                total_pnl REAL NOT NULL,
+                wins INTEGER NOT NULL,
+                losses INTEGER NOT NULL,
+                equity REAL NOT NULL,
+                peak REAL NOT NULL,
+                max_drawdown REAL NOT NULL,
+                PRIMARY KEY (scope, account_id, strategy_id, ts_us)
+            ) WITHOUT ROWID
+            """
+        )
+        has_trades = conn.execute("SELECT 1 FROM trades LIMIT 1").fetchone()
+        has_aggregates = conn.execute("SELECT 1 FROM trade_aggregates LIMIT 1").fetchone()
+
+    _migrate()
+
+    # Existing database from before aggregates existed: build them once.
+    if has_trades and not has_aggregates:
+        rebuild_aggregates()
 
 
-def insert_trade_event(event: Dict[str, Any]) -> None:
+def _migrate() -> None:
     """
-    Insert a validated TRADE_EVENT into the trades table.
+    Bring an existing trueedge_backend.db up to SCHEMA_VERSION, in place.
 
-    Raises ValueError if the event_id already exists.
+    Version 1:
+    - trades.ts_us: timestamp as integer microseconds since the epoch (UTC).
+      Added with ALTER TABLE (no table rewrite) and backfilled in batches.
+    - indexes on (account_id, ts_us) and (strategy_id, ts_us) for filtered
+      and time-range queries.
+
+    Version 2:
+    - index on ts_us (plus the implicit id) for unfiltered keyset pagination
+      in (ts_us, id) order.
+
+    Version 3:
+    - trade_aggregates.dirty_from_us: earliest out-of-order timestamp of a
+      dirty row, so refresh_dirty_aggregates replays only from there. Rows
+      already dirty are replayed in full once.
     """
-    conn = get_connection()
-    try:
-        cur = conn.cursor()
-        cur.execute(
-            """
-            INSERT INTO trades (
-                event_id,
-                account_id,
-                strategy_id,
-                environment,
-                venue,
-                timestamp,
-                symbol,
-                side,
-                order_type,
-                quantity,
-                quantity_type,
-                price_open,
-                price_close,
-                fees,
-                pnl,
-                state,
-                raw_json
+    with get_manager().writer() as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return
+
+    if version < 1:
+        with get_manager().writer() as conn:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(trades)")}
+            if "ts_us" not in columns:
+                conn.execute("ALTER TABLE trades ADD COLUMN ts_us INTEGER")
+
+        while True:
+            with get_manager().transaction() as conn:
+                updated = conn.execute(
+                    """
+                    UPDATE trades SET ts_us = trueedge_ts_us(timestamp)
+                    WHERE id IN (SELECT id FROM trades WHERE ts_us IS NULL LIMIT ?)
+                    """,
+                    (MIGRATION_BATCH_ROWS,),
+                ).rowcount
+            if updated < MIGRATION_BATCH_ROWS:
+                break
+
+        with get_manager().writer() as conn:
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_trades_account_ts ON trades (account_id, ts_us)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_trades_strategy_ts ON trades (strategy_id, ts_us)"
+            )
+
+    if version < 2:
+        with get_manager().writer() as conn:
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_trades_ts ON trades (ts_us)")
+
+    if version < 3:
+        with get_manager().transaction() as conn:
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(trade_aggregates)")}
+            if "dirty_from_us" not in columns:
+                conn.execute("ALTER TABLE trade_aggregates ADD COLUMN dirty_from_us INTEGER")
+            conn.execute(
+                "UPDATE trade_aggregates SET dirty_from_us = ? WHERE dirty = 1",
+                (TIMESTAMP_MIN_US,),
             )
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
+
+    with get_manager().writer() as conn:
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+INSERT_TRADE_SQL = """
+    INSERT INTO trades (
+        event_id,
+        account_id,
+        strategy_id,
+        environment,
+        venue,
+        timestamp,
+        symbol,
+        side,
+        order_type,
+        quantity,
+        quantity_type,
+        price_open,
+        price_close,
+        fees,
+        pnl,
+        state,
+        raw_json,
+        ts_us
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Positions in an INSERT_TRADE_SQL row used by the aggregate updates.
+ROW_ACCOUNT_ID = 1
+ROW_STRATEGY_ID = 2
+ROW_PNL = 14
+ROW_TS_US = 17
+
+# Keep IN (...) lookups well below SQLite's bound-parameter limit.
+EVENT_ID_LOOKUP_CHUNK = 500
+EVENT_ID_LOOKUP_SQL = "SELECT event_id FROM trades WHERE event_id IN ({})".format(
+    ", ".join("?" for _ in range(EVENT_ID_LOOKUP_CHUNK))
+)
+
+
+def event_to_row(
+    event: Dict[str, Any], numbers: Optional[tuple] = None, raw_json: Optional[str] = None
+) -> tuple:
+    """
+    Convert a validated TRADE_EVENT dict into a parameter tuple for INSERT_TRADE_SQL.
+
+    numbers are the float values of quantity, price_open, price_close, fees
+    and pnl as returned by the validator (trade_event_validator.NUMERIC_FIELDS
+    order); without them the fields are converted here.
+    raw_json is the event's JSON text as received (one line); without it the
+    event is serialized here.
+    """
+    if numbers is None:
+        numbers = tuple(
+            float(event.get(field, 0.0))
+            for field in ("quantity", "price_open", "price_close", "fees", "pnl")
+        )
+    if raw_json is None:
+        raw_json = json_codec.dumps(event)
+    quantity, price_open, price_close, fees, pnl = numbers
+    timestamp = event.get("timestamp")
+    return (
+        str(event.get("event_id")),
+        str(event.get("account_id")),
+        str(event.get("strategy_id")),
+        str(event.get("environment")),
+        str(event.get("venue")),
+        str(timestamp),
+        str(event.get("symbol")),
+        str(event.get("side")),
+        str(event.get("order_type")),
+        quantity,
+        str(event.get("quantity_type")),
+        price_open,
+        price_close,
+        fees,
+        pnl,
+        str(event.get("state")),
+        raw_json,
+        parse_timestamp_us(timestamp),
+    )
+
+
+# --------------------------------------------------------------------------
+# Materialized metric aggregates
+#
+# trade_aggregates holds running metrics per (account_id, strategy_id) plus the
+# roll-ups the endpoints need, one row per (scope, account_id, strategy_id):
+#   scope "account_strategy" -> one account + one strategy
+#   scope "account"          -> one account, all strategies  (strategy_id = "")
+#   scope "strategy"         -> one strategy, all accounts   (account_id = "")
+#   scope "all"              -> everything                   (both "")
+# Drawdown depends on the interleaving of trades, so roll-ups cannot be summed
+# from the finer rows; each scope keeps its own running equity/peak.
+#
+# Rows are updated in the same transaction as the insert. Count, pnl, wins and
+# losses do not depend on order and are always exact. An event older than the
+# row's last_ts_us would need the equity curve replayed for peak/drawdown: it
+# is folded in as if it were the latest, the row is marked dirty (dirty_from_us
+# = earliest such timestamp), and AggregateRefresher replays it in the
+# background. Reads never write: for a dirty row they compute the group's
+# metrics from the trades table instead (see fetch_aggregated_metrics).
+#
+# trade_aggregate_checkpoints keeps, per row, its state over the trades before
+# each AGGREGATE_CHECKPOINT_US boundary (saved while the row is clean), so a
+# replay starts at the last checkpoint before dirty_from_us, not at the first
+# trade.
+# --------------------------------------------------------------------------
+
+# Seconds between two AggregateRefresher passes over the dirty rows.
+AGGREGATE_REFRESH_INTERVAL = 1.0
+
+# Trade-time spacing of aggregate checkpoints (one hour).
+AGGREGATE_CHECKPOINT_US = 3600 * 1_000_000
+
+AGGREGATE_SELECT_SQL = """
+    SELECT trade_count, total_pnl, wins, losses, equity, peak, max_drawdown,
+           last_ts_us, dirty, dirty_from_us
+    FROM trade_aggregates
+    WHERE scope = ? AND account_id = ? AND strategy_id = ?
+"""
+
+AGGREGATE_UPSERT_SQL = """
+    INSERT OR REPLACE INTO trade_aggregates (
+        scope, account_id, strategy_id,
+        trade_count, total_pnl, wins, losses, equity, peak, max_drawdown,
+        last_ts_us, dirty, dirty_from_us
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+CHECKPOINT_SELECT_SQL = """
+    SELECT ts_us, trade_count, total_pnl, wins, losses, equity, peak, max_drawdown
+    FROM trade_aggregate_checkpoints
+    WHERE scope = ? AND account_id = ? AND strategy_id = ? AND ts_us <= ?
+    ORDER BY ts_us DESC
+    LIMIT 1
+"""
+
+CHECKPOINT_UPSERT_SQL = """
+    INSERT OR REPLACE INTO trade_aggregate_checkpoints (
+        scope, account_id, strategy_id, ts_us,
+        trade_count, total_pnl, wins, losses, equity, peak, max_drawdown
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def _aggregate_keys(account_id: str, strategy_id: str) -> List[Tuple[str, str, str]]:
+    """
+    All aggregate rows an event with this account/strategy contributes to.
+    """
+    return [
+        ("all", "", ""),
+        ("account", account_id, ""),
+        ("strategy", "", strategy_id),
+        ("account_strategy", account_id, strategy_id),
+    ]
+
+
+def _new_aggregate_state() -> List[Any]:
+    # trade_count, total_pnl, wins, losses, equity, peak, max_drawdown, last_ts_us,
+    # dirty, dirty_from_us
+    return [0, 0.0, 0, 0, 0.0, 0.0, 0.0, 0, 0, None]
+
+
+def _fold_aggregate(state: List[Any], pnl: float, ts_us: int) -> None:
+    """
+    Apply one trade to an aggregate state, in place.
+
+    Mirrors compute_metrics: equity starts at 0 and the first equity point is
+    the initial peak. A trade older than the last one seen is still folded
+    in, but marks the state dirty from its timestamp on (peak/drawdown must
+    then be replayed in timestamp order, see refresh_dirty_aggregates).
+    """
+    if state[0] == 0:
+        state[4] = pnl
+        state[5] = pnl
+        state[6] = 0.0
+        state[7] = ts_us
+    else:
+        if ts_us < state[7]:
+            state[8] = 1
+            if state[9] is None or ts_us < state[9]:
+                state[9] = ts_us
+        else:
+            state[7] = ts_us
+        equity = state[4] + pnl
+        state[4] = equity
+        if equity > state[5]:
+            state[5] = equity
+        drawdown = state[5] - equity
+        if drawdown > state[6]:
+            state[6] = drawdown
+
+    state[0] += 1
+    state[1] += pnl
+    if pnl > 0:
+        state[2] += 1
+    elif pnl < 0:
+        state[3] += 1
+
+
+def _fold_checkpointed(
+    key: Tuple[str, str, str],
+    state: List[Any],
+    pnl: float,
+    ts_us: int,
+    checkpoints: List[tuple],
+) -> None:
+    """
+    _fold_aggregate, first adding a checkpoint (CHECKPOINT_UPSERT_SQL
+    parameters) when a clean state crosses an AGGREGATE_CHECKPOINT_US
+    boundary: the state then covers exactly the trades before the boundary.
+    """
+    if state[0] and not state[8] and ts_us > state[7]:
+        boundary = ts_us // AGGREGATE_CHECKPOINT_US * AGGREGATE_CHECKPOINT_US
+        if boundary > state[7]:
+            checkpoints.append(key + (boundary,) + tuple(state[:7]))
+    _fold_aggregate(state, pnl, ts_us)
+
+
+def _update_aggregates(conn: sqlite3.Connection, rows: List[tuple]) -> None:
+    """
+    Fold newly inserted trades rows (INSERT_TRADE_SQL parameter tuples) into
+    trade_aggregates. The caller holds the transaction.
+    """
+    states: Dict[Tuple[str, str, str], List[Any]] = {}
+    checkpoints: List[tuple] = []
+    for row in rows:
+        pnl = row[ROW_PNL]
+        ts_us = row[ROW_TS_US]
+        for key in _aggregate_keys(row[ROW_ACCOUNT_ID], row[ROW_STRATEGY_ID]):
+            state = states.get(key)
+            if state is None:
+                stored = conn.execute(AGGREGATE_SELECT_SQL, key).fetchone()
+                state = list(stored) if stored is not None else _new_aggregate_state()
+                states[key] = state
+            _fold_checkpointed(key, state, pnl, ts_us, checkpoints)
+
+    conn.executemany(
+        AGGREGATE_UPSERT_SQL,
+        [key + tuple(state) for key, state in states.items()],
+    )
+    conn.executemany(CHECKPOINT_UPSERT_SQL, checkpoints)
+
+
+# Grouping columns behind each aggregate scope.
+SCOPE_COLUMNS: Dict[str, List[str]] = {
+    "all": [],
+    "account": ["account_id"],
+    "strategy": ["strategy_id"],
+    "account_strategy": ["account_id", "strategy_id"],
+}
+
+
+def _grouped_metrics_sql(group_columns: List[str], conditions: List[str]) -> str:
+    """
+    Build a query computing metric totals per group from typed columns only.
+
+    The equity curve is a running SUM(pnl) window ordered by (timestamp, id),
+    the peak a running MAX over that curve, and max_drawdown the largest
+    peak - equity gap, exactly like compute_metrics. Each result row is:
+        *group_columns, trade_count, total_pnl, wins, losses,
+        max_drawdown, peak, last_ts_us
+    """
+    groups = "".join(f"{column}, " for column in group_columns)
+    partition = (
+        "PARTITION BY " + ", ".join(group_columns) + " " if group_columns else ""
+    )
+    where = " WHERE " + " AND ".join(conditions) if conditions else ""
+    group_by = " GROUP BY " + ", ".join(group_columns) if group_columns else ""
+    return f"""
+        WITH base AS (
+            SELECT {groups}id, COALESCE(pnl, 0.0) AS pnl, ts_us
+            FROM trades{where}
+        ),
+        curve AS (
+            SELECT {groups}pnl, ts_us,
+                   SUM(pnl) OVER (
+                       {partition}ORDER BY ts_us, id ROWS UNBOUNDED PRECEDING
+                   ) AS equity,
+                   ROW_NUMBER() OVER ({partition}ORDER BY ts_us, id) AS seq
+            FROM base
+        ),
+        peaks AS (
+            SELECT {groups}pnl, ts_us, equity,
+                   MAX(equity) OVER (
+                       {partition}ORDER BY seq ROWS UNBOUNDED PRECEDING
+                   ) AS peak
+            FROM curve
+        )
+        SELECT {groups}COUNT(*), TOTAL(pnl), TOTAL(pnl > 0), TOTAL(pnl < 0),
+               MAX(peak - equity), MAX(peak), MAX(ts_us)
+        FROM peaks{group_by}
+    """
+
+
+def _filter_conditions(
+    account_id: Optional[str],
+    strategy_id: Optional[str],
+    start_us: Optional[int] = None,
+    end_us: Optional[int] = None,
+    symbol: Optional[str] = None,
+) -> Tuple[List[str], List[Any]]:
+    """
+    WHERE conditions for the common trades filters. The time range is
+    half-open: start_us <= ts_us < end_us.
+    """
+    conditions: List[str] = []
+    params: List[Any] = []
+    if account_id:
+        conditions.append("account_id = ?")
+        params.append(account_id)
+    if strategy_id:
+        conditions.append("strategy_id = ?")
+        params.append(strategy_id)
+    if symbol:
+        conditions.append("symbol = ?")
+        params.append(symbol)
+    if start_us is not None:
+        conditions.append("ts_us >= ?")
+        params.append(start_us)
+    if end_us is not None:
+        conditions.append("ts_us < ?")
+        params.append(end_us)
+    return conditions, params
+
+
+def _scope_rows(
+    conn: sqlite3.Connection,
+    scope: str,
+    account_id: Optional[str] = None,
+    strategy_id: Optional[str] = None,
+    max_id: Optional[int] = None,
+) -> List[tuple]:
+    """
+    Compute trade_aggregates rows for one scope straight from the trades table
+    (only trades with id <= max_id, if given).
+    """
+    columns = SCOPE_COLUMNS[scope]
+    conditions, params = _filter_conditions(account_id, strategy_id)
+    if max_id is not None:
+        conditions.append("id <= ?")
+        params.append(max_id)
+    rows = conn.execute(_grouped_metrics_sql(columns, conditions), params).fetchall()
+
+    result: List[tuple] = []
+    for row in rows:
+        groups = dict(zip(columns, row[:len(columns)]))
+        count, total_pnl, wins, losses, max_drawdown, peak, last_ts_us = row[len(columns):]
+        if not count:
+            continue
+        result.append(
             (
-                str(event.get("event_id")),
-                str(event.get("account_id")),
-                str(event.get("strategy_id")),
-                str(event.get("environment")),
-                str(event.get("venue")),
-                str(event.get("timestamp")),
-                str(event.get("symbol")),
-                str(event.get("side")),
-                str(event.get("order_type")),
-                float(event.get("quantity", 0.0)),
-                str(event.get("quantity_type")),
-                float(event.get("price_open", 0.0)),
-                float(event.get("price_close", 0.0)),
-                float(event.get("fees", 0.0)),
-                float(event.get("pnl", 0.0)),
-                str(event.get("state")),
-                json.dumps(event),
-            ),
+                scope,
+                groups.get("account_id", ""),
+                groups.get("strategy_id", ""),
+                count,
+                total_pnl,
+                int(wins),
+                int(losses),
+                total_pnl,  # equity (starting from 0)
+                peak,
+                max_drawdown,
+                last_ts_us,
+                0,
+                None,
+            )
+        )
+    return result
+
+
+def rebuild_aggregates() -> int:
+    """
+    Recompute trade_aggregates from scratch from the trades table.
+    Returns the number of aggregate rows written.
+    """
+    with get_manager().transaction() as conn:
+        rows: List[tuple] = []
+        for scope in SCOPE_COLUMNS:
+            rows.extend(_scope_rows(conn, scope))
+        conn.execute("DELETE FROM trade_aggregates")
+        conn.execute("DELETE FROM trade_aggregate_checkpoints")
+        conn.executemany(AGGREGATE_UPSERT_SQL, rows)
+    return len(rows)
+
+
+def _group_trades(
+    conn: sqlite3.Connection,
+    account_id: str,
+    strategy_id: str,
+    since_us: Optional[int],
+    id_condition: str,
+    max_id: int,
+) -> List[tuple]:
+    """
+    (pnl, ts_us) of one aggregate row's trades from since_us on (all if None)
+    matching id_condition ("id <= ?" / "id > ?"), in (ts_us, id) order.
+    """
+    conditions, params = _filter_conditions(account_id or None, strategy_id or None, since_us)
+    conditions.append(id_condition)
+    params.append(max_id)
+    return conn.execute(
+        "SELECT COALESCE(pnl, 0.0), ts_us FROM trades WHERE "
+        + " AND ".join(conditions)
+        + " ORDER BY ts_us, id",
+        params,
+    ).fetchall()
+
+
+def refresh_dirty_aggregates() -> int:
+    """
+    Recompute aggregate rows that were marked dirty by out-of-order inserts.
+    Returns the number of rows rewritten.
+
+    Each row is replayed on a reader snapshot, so ingestion is not blocked
+    meanwhile, starting from its last checkpoint at or before dirty_from_us
+    (through the account / strategy / time ts_us indexes); checkpoints are
+    rewritten along the way. A short write transaction then folds in the
+    group's trades committed after the snapshot; if one of those is out of
+    order again, the row stays dirty for the next pass.
+    """
+    manager = get_manager()
+    with manager.reader() as conn:
+        dirty_rows = conn.execute(
+            "SELECT scope, account_id, strategy_id, dirty_from_us "
+            "FROM trade_aggregates WHERE dirty = 1"
+        ).fetchall()
+
+    for scope, account_id, strategy_id, dirty_from_us in dirty_rows:
+        key = (scope, account_id, strategy_id)
+        if dirty_from_us is None:
+            dirty_from_us = TIMESTAMP_MIN_US
+        with manager.reader() as conn:
+            max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM trades").fetchone()[0]
+            checkpoint = conn.execute(CHECKPOINT_SELECT_SQL, key + (dirty_from_us,)).fetchone()
+            if checkpoint is not None:
+                since_us = checkpoint[0]
+                state = list(checkpoint[1:]) + [since_us - 1, 0, None]
+            else:
+                since_us = None
+                state = _new_aggregate_state()
+            replay = _group_trades(conn, account_id, strategy_id, since_us, "id <= ?", max_id)
+        _count_rows_scanned(len(replay))
+
+        checkpoints: List[tuple] = []
+        for pnl, ts_us in replay:
+            _fold_checkpointed(key, state, pnl, ts_us, checkpoints)
+
+        with manager.transaction() as conn:
+            newer = _group_trades(conn, account_id, strategy_id, None, "id > ?", max_id)
+            for pnl, ts_us in newer:
+                _fold_checkpointed(key, state, pnl, ts_us, checkpoints)
+            if since_us is None:
+                conn.execute(
+                    "DELETE FROM trade_aggregate_checkpoints "
+                    "WHERE scope = ? AND account_id = ? AND strategy_id = ?",
+                    key,
+                )
+            else:
+                conn.execute(
+                    "DELETE FROM trade_aggregate_checkpoints "
+                    "WHERE scope = ? AND account_id = ? AND strategy_id = ? AND ts_us > ?",
+                    key + (since_us,),
+                )
+            conn.executemany(CHECKPOINT_UPSERT_SQL, checkpoints)
+            conn.execute(AGGREGATE_UPSERT_SQL, key + tuple(state))
+    return len(dirty_rows)
+
+
+class AggregateRefresher:
+    """
+    Background thread running refresh_dirty_aggregates every `interval`
+    seconds, so out-of-order inserts are replayed off the request path.
+    """
+
+    def __init__(self, interval: float = AGGREGATE_REFRESH_INTERVAL) -> None:
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.rows_refreshed = 0
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="trueedge-aggregates", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.rows_refreshed += refresh_dirty_aggregates()
+            except sqlite3.Error as e:
+                print(f"[WARN] Refreshing trade aggregates failed: {e}")
+
+
+def fetch_metrics_sql(
+    group_by: Optional[str] = None,
+    account_id: Optional[str] = None,
+    strategy_id: Optional[str] = None,
+    starting_balance: float = 0.0,
+    start_us: Optional[int] = None,
+    end_us: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Compute metrics with SQL (GROUP BY + window functions) over typed columns,
+    without decoding raw_json.
+
+    Same arguments and result shape as fetch_aggregated_metrics, plus an
+    optional time window [start_us, end_us) that uses the ts_us indexes.
+    The metrics dicts match metrics_core.compute_metrics.
+    """
+    if group_by not in (None, "account_id", "strategy_id"):
+        raise ValueError(f"Unsupported group_by: {group_by!r}")
+
+    columns = [group_by] if group_by else []
+    conditions, params = _filter_conditions(account_id, strategy_id, start_us, end_us)
+    query = _grouped_metrics_sql(columns, conditions)
+    if group_by:
+        query += f" ORDER BY {group_by}"
+
+    with get_manager().reader() as conn:
+        rows = conn.execute(query, params).fetchall()
+    # The trades that were aggregated, not the (few) result rows.
+    _count_rows_scanned(sum(row[len(columns)] or 0 for row in rows))
+
+    results: List[Dict[str, Any]] = []
+    for row in rows:
+        key = row[0] if group_by else None
+        count, total_pnl, wins, losses, max_drawdown, _peak, _last_ts = row[len(columns):]
+        results.append(
+            {
+                "key": key,
+                "count": count,
+                "metrics": build_metrics(
+                    count,
+                    total_pnl,
+                    max_drawdown or 0.0,
+                    int(wins),
+                    int(losses),
+                    starting_balance,
+                ),
+            }
+        )
+    return results
+
+
+def fetch_aggregated_metrics(
+    group_by: Optional[str] = None,
+    account_id: Optional[str] = None,
+    strategy_id: Optional[str] = None,
+    starting_balance: float = 0.0,
+) -> List[Dict[str, Any]]:
+    """
+    Read metrics from trade_aggregates instead of scanning the trades table.
+
+    group_by is None, "strategy_id" or "account_id". Returns a list of
+    {"key": group value (None when not grouped), "count": n, "metrics": {...}},
+    where metrics has the same shape as metrics_core.compute_metrics.
+    Without group_by the list has exactly one entry.
+
+    Read-only and exact: a row still marked dirty (out-of-order inserts
+    since the last refresh_dirty_aggregates) is recomputed for this read
+    from the trades table, on the same reader snapshot.
+    """
+    by_account = bool(account_id) or group_by == "account_id"
+    by_strategy = bool(strategy_id) or group_by == "strategy_id"
+    if by_account and by_strategy:
+        scope = "account_strategy"
+    elif by_account:
+        scope = "account"
+    elif by_strategy:
+        scope = "strategy"
+    else:
+        scope = "all"
+
+    query = (
+        "SELECT account_id, strategy_id, trade_count, total_pnl, wins, losses, "
+        "max_drawdown, dirty FROM trade_aggregates WHERE scope = ?"
+    )
+    params: List[Any] = [scope]
+    if account_id:
+        query += " AND account_id = ?"
+        params.append(account_id)
+    if strategy_id:
+        query += " AND strategy_id = ?"
+        params.append(strategy_id)
+    if group_by:
+        query += f" ORDER BY {group_by}"
+
+    with get_manager().reader() as conn:
+        rows = conn.execute(query, params).fetchall()
+        scanned = len(rows)
+        for i, (acc_id, strat_id, *_, dirty) in enumerate(rows):
+            if dirty:
+                exact = _scope_rows(conn, scope, acc_id or None, strat_id or None)[0]
+                rows[i] = (acc_id, strat_id, *exact[3:7], exact[9], 0)
+                scanned += exact[3]
+    _count_rows_scanned(scanned)
+
+    results: List[Dict[str, Any]] = []
+    for acc_id, strat_id, count, total_pnl, wins, losses, max_drawdown, _dirty in rows:
+        if group_by == "account_id":
+            key = acc_id
+        elif group_by == "strategy_id":
+            key = strat_id
+        else:
+            key = None
+        results.append(
+            {
+                "key": key,
+                "count": count,
+                "metrics": build_metrics(
+                    count, total_pnl, max_drawdown, wins, losses, starting_balance
+                ),
+            }
+        )
+
+    if group_by is None and not results:
+        results.append(
+            {
+                "key": None,
+                "count": 0,
+                "metrics": build_metrics(0, 0.0, 0.0, 0, 0, starting_balance),
+            }
         )
-        conn.commit()
+    return results
+
+
+def insert_trade_event(
+    event: Dict[str, Any], numbers: Optional[tuple] = None, raw_json: Optional[str] = None
+) -> None:
+    """
+    Insert a validated TRADE_EVENT into the trades table
+    (and fold it into trade_aggregates in the same transaction).
+    numbers / raw_json: the validator's coerced numeric fields and the JSON
+    as received (see event_to_row).
+
+    Raises ValueError if the event_id already exists.
+    """
+    row = event_to_row(event, numbers, raw_json)
+    try:
+        with get_manager().transaction() as conn:
+            conn.execute(INSERT_TRADE_SQL, row)
+            _update_aggregates(conn, [row])
     except sqlite3.IntegrityError:
         raise ValueError("Event with this event_id already exists in database")
-    finally:
-        conn.close()
+
+
+def _existing_event_ids(conn: sqlite3.Connection, event_ids: List[str]) -> Set[str]:
+    """
+    Return the subset of event_ids that are already stored in the trades table.
+    """
+    existing: Set[str] = set()
+    for start in range(0, len(event_ids), EVENT_ID_LOOKUP_CHUNK):
+        chunk = event_ids[start:start + EVENT_ID_LOOKUP_CHUNK]
+        # Pad with NULLs so every lookup uses the same (cached) statement.
+        chunk = chunk + [None] * (EVENT_ID_LOOKUP_CHUNK - len(chunk))
+        rows = conn.execute(EVENT_ID_LOOKUP_SQL, chunk).fetchall()
+        existing.update(row[0] for row in rows)
+    return existing
+
+
+def insert_trade_events(
+    events: List[Dict[str, Any]], numbers: Optional[List[Optional[tuple]]] = None
+) -> List[str]:
+    """
+    Insert a batch of validated TRADE_EVENTs in a single transaction.
+    numbers: per event, the validator's coerced numeric fields (see event_to_row).
+
+    Returns one status per input event, in the same order:
+    - "accepted"  -> the event was inserted,
+    - "duplicate" -> its event_id already exists in the database
+                     (or appears earlier in the same batch) and it was skipped.
+
+    Duplicates never fail the batch; all accepted rows are written with one
+    executemany and committed together with their trade_aggregates updates.
+    """
+    if numbers is None:
+        numbers = [None] * len(events)
+    return insert_trade_rows([event_to_row(ev, n) for ev, n in zip(events, numbers)])
+
+
+def insert_trade_rows(rows: List[tuple]) -> List[str]:
+    """
+    insert_trade_events for rows already converted with event_to_row
+    (the group-commit writer gets rows, so the conversion is done by the
+    request threads rather than the single writer thread).
+    """
+    if not rows:
+        return []
+
+    statuses: List[str] = []
+    accepted: List[tuple] = []
+
+    # BEGIN IMMEDIATE takes the write lock up front, so the duplicate check
+    # and the insert see the same table state.
+    with get_manager().transaction() as conn:
+        seen = _existing_event_ids(conn, list({row[0] for row in rows}))
+        for row in rows:
+            event_id = row[0]
+            if event_id in seen:
+                statuses.append("duplicate")
+                continue
+            seen.add(event_id)
+            accepted.append(row)
+            statuses.append("accepted")
+
+        conn.executemany(INSERT_TRADE_SQL, accepted)
+        _update_aggregates(conn, accepted)
+
+    return statuses
+
+
+# Columns compute_grouped_metrics_sql may group by.
+GROUPABLE_COLUMNS = {"account_id", "strategy_id", "symbol", "venue", "environment"}
+
+
+def compute_grouped_metrics_sql(
+    account_id: Optional[str] = None,
+    strategy_id: Optional[str] = None,
+    start_us: Optional[int] = None,
+    end_us: Optional[int] = None,
+    group_keys=DEFAULT_GROUP_KEYS,
+    starting_balance: float = 0.0,
+) -> Dict[str, Any]:
+    """
+    Overall + per-group metrics from one ordered scan of typed columns,
+    fed into metrics_core.GroupedMetricsAggregator.
+
+    Same result shape as metrics_core.compute_grouped_metrics.
+    """
+    unknown = set(group_keys) - GROUPABLE_COLUMNS
+    if unknown:
+        raise ValueError(f"Unsupported group keys: {sorted(unknown)}")
+
+    conditions, params = _filter_conditions(account_id, strategy_id, start_us, end_us)
+    columns = "".join(f", {key_name}" for key_name in group_keys)
+    query = f"SELECT COALESCE(pnl, 0.0){columns} FROM trades"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY ts_us, id"
+
+    aggregator = GroupedMetricsAggregator(group_keys)
+    scanned = 0
+    with get_manager().reader() as conn:
+        for row in conn.execute(query, params):
+            aggregator.add_values(row[0], row[1:])
+            scanned += 1
+    _count_rows_scanned(scanned)
+    return aggregator.results(starting_balance)
 
 
 def fetch_events(
     account_id: Optional[str] = None,
     strategy_id: Optional[str] = None,
+    start_us: Optional[int] = None,
+    end_us: Optional[int] = None,
 ) -> List[Dict[str, Any]]:
     """
-    Fetch events from the trades table, optionally filtered by account_id/strategy_id.
+    Fetch events from the trades table, optionally filtered by account_id/strategy_id
+    and a [start_us, end_us) time window.
     Returns a list of TRADE_EVENT dicts reconstructed from raw_json.
     """
-    conn = get_connection()
-    try:
-        cur = conn.cursor()
-        query = "SELECT raw_json FROM trades"
-        conditions = []
-        params: List[Any] = []
-
-        if account_id:
-            conditions.append("account_id = ?")
-            params.append(account_id)
-        if strategy_id:
-            conditions.append("strategy_id = ?")
-            params.append(strategy_id)
-
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
-
-        cur.execute(query, params)
-        rows = cur.fetchall()
-
-        events: List[Dict[str, Any]] = []
-        for (raw_json,) in rows:
-            try:
-                events.append(json.loads(raw_json))
-            except json.JSONDecodeError:
-                # Skip rows with invalid JSON (should not happen, but be safe)
-                continue
+    query = "SELECT raw_json FROM trades"
+    conditions, params = _filter_conditions(account_id, strategy_id, start_us, end_us)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+
+    with get_manager().reader() as conn:
+        rows = conn.execute(query, params).fetchall()
+    _count_rows_scanned(len(rows))
+
+    events: List[Dict[str, Any]] = []
+    for (raw_json,) in rows:
+        try:
+            events.append(json_codec.loads(raw_json))
+        except json_codec.DecodeError:
+            # Skip rows with invalid JSON (should not happen, but be safe)
+            continue
+
+    return events
+
+
+def iter_events_raw(
+    account_id: Optional[str] = None,
+    strategy_id: Optional[str] = None,
+    symbol: Optional[str] = None,
+    start_us: Optional[int] = None,
+    end_us: Optional[int] = None,
+    after: Optional[Tuple[int, int]] = None,
+    limit: Optional[int] = None,
+    batch_size: int = 1000,
+) -> Iterator[List[Tuple[int, int, str]]]:
+    """
+    Stream stored events in (ts_us, id) order, in batches of
+    (ts_us, id, raw_json) rows, without decoding the JSON.
+
+    - after: keyset cursor; only rows strictly after this (ts_us, id) are returned.
+    - limit: stop after this many rows (None = no limit).
+
+    Each batch is its own keyset query (the last row of a batch is the
+    cursor of the next one) on a pooled reader that is returned before the
+    batch is yielded. A slow consumer therefore holds neither a reader nor
+    a WAL snapshot, and checkpoints can proceed. The flip side: rows
+    committed mid-stream show up if they sort after the current position.
+    """
+    conditions, params = _filter_conditions(
+        account_id, strategy_id, start_us, end_us, symbol=symbol
+    )
+    conditions.append("(ts_us, id) > (?, ?)")
+    query = (
+        "SELECT ts_us, id, raw_json FROM trades WHERE "
+        + " AND ".join(conditions)
+        + " ORDER BY ts_us, id LIMIT ?"
+    )
+    # Start before every row: ts_us is never below TIMESTAMP_MIN_US.
+    cursor = after if after is not None else (TIMESTAMP_MIN_US - 1, 0)
+    remaining = limit
 
-        return events
-    finally:
-        conn.close()
+    while remaining is None or remaining > 0:
+        page = batch_size if remaining is None else min(batch_size, remaining)
+        with get_manager().reader() as conn:
+            rows = conn.execute(query, [*params, *cursor, page]).fetchall()
+        if not rows:
+            break
+        _count_rows_scanned(len(rows))
+        yield rows
+        if len(rows) < page:
+            break
+        cursor = (rows[-1][0], rows[-1][1])
+        if remaining is not None:
+            remaining -= len(rows)
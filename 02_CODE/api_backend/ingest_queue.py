@@ -0,0 +1,180 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import db
+
+
+DEFAULT_MAX_BATCH_EVENTS = 1000
+DEFAULT_MAX_WAIT_MS = 5.0
+DEFAULT_QUEUE_SIZE = 10000
+
+_STOP = object()
+
+
+class IngestQueueFull(Exception):
+    """Raised when the write-behind queue is at capacity (caller should retry later)."""
+    pass
+
+
+class GroupCommitWriter:
+    """
+    Write-behind queue with group commit for backend trade ingestion.
+
+    - Request handlers submit validated events, already converted to rows
+      (db.event_to_row), and get a Future back.
+    - A single writer thread drains the queue and inserts everything it
+      collected in one transaction (db.insert_trade_rows).
+    - A group is flushed when it holds max_batch_events events, or when
+      max_wait_ms have passed since its first event arrived.
+    - Each Future resolves to the per-event statuses ("accepted" /
+      "duplicate") only after the group's COMMIT returned, so an
+      acknowledgement still means the event is stored.
+
+    How durable a COMMIT is depends on the SQLite synchronous PRAGMA
+    (see db.configure); with group commit, synchronous=FULL costs one fsync
+    per group instead of one per event.
+    """
+
+    def __init__(
+        self,
+        max_batch_events: int = DEFAULT_MAX_BATCH_EVENTS,
+        max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        insert_fn: Callable[[List[tuple]], List[str]] = db.insert_trade_rows,
+    ) -> None:
+        self.max_batch_events = max(1, max_batch_events)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.insert_fn = insert_fn
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+
+        # Simple counters, useful when tuning max_batch_events / max_wait_ms.
+        self.groups_committed = 0
+        self.events_committed = 0
+        self.groups_failed = 0
+        self.rejected_full = 0
+        self.commit_seconds = 0.0
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="trueedge-group-commit", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Flush everything already queued, then stop the writer thread.
+        """
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def pending(self) -> int:
+        """
+        Number of submissions waiting in the queue.
+        """
+        return self._queue.qsize()
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Queue depth and commit counters (flat names, *_total are counters).
+        """
+        return {
+            "ingest_queue_depth": self.pending(),
+            "ingest_queue_capacity": self._queue.maxsize,
+            "ingest_rejected_full_total": self.rejected_full,
+            "ingest_groups_committed_total": self.groups_committed,
+            "ingest_groups_failed_total": self.groups_failed,
+            "ingest_events_committed_total": self.events_committed,
+            "ingest_commit_seconds_total": round(self.commit_seconds, 6),
+        }
+
+    def submit(self, events: List[tuple]) -> "Future[List[str]]":
+        """
+        Queue the rows of validated events for the next group commit.
+
+        Returns a Future resolving to one status per event once the group has
+        been committed. Raises IngestQueueFull if the queue is at capacity.
+        """
+        future: "Future[List[str]]" = Future()
+        if not events:
+            future.set_result([])
+            return future
+        try:
+            self._queue.put_nowait((events, future))
+        except queue.Full:
+            self.rejected_full += 1
+            raise IngestQueueFull("Ingest queue is full, retry later")
+        return future
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+
+            group: List[Tuple[List[tuple], Future]] = [item]
+            group_events = len(item[0])
+            deadline = time.monotonic() + self.max_wait
+
+            while group_events < self.max_batch_events:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        item = self._queue.get(timeout=remaining)
+                    else:
+                        item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                group.append(item)
+                group_events += len(item[0])
+
+            self._commit_group(group)
+
+        # Drain anything submitted before stop() so no caller waits forever.
+        leftover: List[Tuple[List[tuple], Future]] = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                leftover.append(item)
+        if leftover:
+            self._commit_group(leftover)
+
+    def _commit_group(self, group: List[Tuple[List[tuple], Future]]) -> None:
+        all_events: List[tuple] = []
+        for events, _ in group:
+            all_events.extend(events)
+
+        started = time.perf_counter()
+        try:
+            statuses = self.insert_fn(all_events)
+        except Exception as e:
+            self.groups_failed += 1
+            for _, future in group:
+                future.set_exception(e)
+            return
+        finally:
+            self.commit_seconds += time.perf_counter() - started
+
+        self.groups_committed += 1
+        self.events_committed += len(all_events)
+
+        start = 0
+        for events, future in group:
+            end = start + len(events)
+            future.set_result(statuses[start:end])
+            start = end
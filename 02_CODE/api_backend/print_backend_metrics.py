@@ -1,12 +1,23 @@
+import sys
+from pathlib import Path
 from urllib import request
 
+# Make sure we can import shared modules from local_logger
+ROOT_DIR = Path(__file__).resolve().parents[1]  # .../02_CODE
+LOCAL_LOGGER_DIR = ROOT_DIR / "local_logger"
+if str(LOCAL_LOGGER_DIR) not in sys.path:
+    sys.path.insert(0, str(LOCAL_LOGGER_DIR))
+
+from http_compression import read_response
+
 
 def fetch(path: str) -> None:
     url = f"http://127.0.0.1:9000{path}"
     print(f"\n=== GET {url} ===")
     try:
-        with request.urlopen(url) as resp:
-            body = resp.read().decode("utf-8")
+        req = request.Request(url, headers={"Accept-Encoding": "gzip"})
+        with request.urlopen(req) as resp:
+            body = read_response(resp).decode("utf-8")
             print("Status:", resp.status)
             print("Body:", body)
     except Exception as e:
@@ -0,0 +1,19 @@
+import db
+
+
+def main() -> None:
+    """
+    Recompute the trade_aggregates table from the trades table.
+
+    Run this after restoring or editing trueedge_backend.db by hand; normal
+    inserts keep the aggregates up to date on their own.
+    """
+    db.init_db()
+    print(f"Rebuilding metric aggregates in {db.DB_PATH} ...")
+    rows = db.rebuild_aggregates()
+    print(f"Done: {rows} aggregate rows written.")
+    db.close_connections()
+
+
+if __name__ == "__main__":
+    main()
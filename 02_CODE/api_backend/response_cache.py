@@ -0,0 +1,228 @@
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Mapping, Optional, Tuple
+from urllib.parse import parse_qsl
+
+
+# Make sure we can import shared modules from local_logger
+ROOT_DIR = Path(__file__).resolve().parents[1]  # .../02_CODE
+LOCAL_LOGGER_DIR = ROOT_DIR / "local_logger"
+if str(LOCAL_LOGGER_DIR) not in sys.path:
+    sys.path.insert(0, str(LOCAL_LOGGER_DIR))
+
+from http_compression import GZIP_MIN_BYTES, accepts_gzip, gzip_bytes, is_compressible
+
+
+# Defaults for the backend's GET response cache (see server.py --cache-*).
+DEFAULT_MAX_ENTRIES = 512
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+
+def cache_key(path: str, query: str) -> Tuple[str, Tuple[Tuple[str, str], ...]]:
+    """
+    (path, normalized query): parameters sorted, empty values kept, so
+    ?a=1&b=2 and ?b=2&a=1 share an entry.
+    """
+    return path, tuple(sorted(parse_qsl(query, keep_blank_values=True)))
+
+
+class CachedResponse:
+    """
+    One rendered 200 response plus its validators.
+
+    The gzip variant is compressed on first use and kept, so cache hits do
+    not recompress; it has its own ETag (the identity one + "-gzip"), as a
+    strong validator must differ per content coding.
+    """
+
+    __slots__ = ("version", "content_type", "body", "etag", "last_modified", "_gzip_body")
+
+    def __init__(
+        self, version: Hashable, content_type: str, body: bytes, etag: str, last_modified: int
+    ) -> None:
+        self.version = version
+        self.content_type = content_type
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified  # whole seconds since the epoch
+        self._gzip_body: Optional[bytes] = None
+
+    @property
+    def gzip_etag(self) -> str:
+        return self.etag[:-1] + '-gzip"'
+
+    def uses_gzip(self, accept_encoding: Optional[str]) -> bool:
+        return (
+            len(self.body) >= GZIP_MIN_BYTES
+            and is_compressible(self.content_type)
+            and accepts_gzip(accept_encoding)
+        )
+
+    def headers(self, accept_encoding: Optional[str] = None) -> Dict[str, str]:
+        """
+        Response headers for a client sending accept_encoding
+        (Content-Encoding itself is added by encoded_body's caller).
+        """
+        # no-cache: clients may store the response but must revalidate it,
+        # which is a cheap 304 while the data has not changed.
+        return {
+            "ETag": self.gzip_etag if self.uses_gzip(accept_encoding) else self.etag,
+            "Last-Modified": formatdate(self.last_modified, usegmt=True),
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+
+    def encoded_body(self, accept_encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+        """
+        (body, Content-Encoding or None) for a client sending accept_encoding.
+        """
+        if not self.uses_gzip(accept_encoding):
+            return self.body, None
+        if self._gzip_body is None:
+            self._gzip_body = gzip_bytes(self.body)
+        return self._gzip_body, "gzip"
+
+    def not_modified(self, request_headers: Mapping[str, str]) -> bool:
+        """
+        True if the request's If-None-Match (or, without it,
+        If-Modified-Since) says the client already has this response.
+        """
+        if_none_match = request_headers.get("If-None-Match")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            if "*" in tags:
+                return True
+            # Weak comparison: either coding of the same body matches.
+            etags = (self.etag, self.gzip_etag)
+            return any((tag[2:] if tag.startswith("W/") else tag) in etags for tag in tags)
+        if_modified_since = request_headers.get("If-Modified-Since")
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return self.last_modified <= since
+        return False
+
+
+class ResponseCache:
+    """
+    LRU cache of rendered GET responses, invalidated by a data version.
+
+    - Entries are keyed on cache_key(path, query) and tagged with the data
+      version (db.data_version()) read before rendering. A lookup with another
+      version renders again; an entry is never served for a version it was
+      not rendered at or after.
+    - Bounded by max_entries and by max_bytes of cached bodies; the least
+      recently used entries are evicted first.
+    - The ETag is a hash of the body, so a re-render that produced the same
+      bytes keeps its ETag and Last-Modified, and clients keep getting 304.
+    - Concurrent misses on one key render once; the other requests wait for
+      that result instead of all running the same queries.
+    """
+
+    def __init__(
+        self, max_entries: int = DEFAULT_MAX_ENTRIES, max_bytes: int = DEFAULT_MAX_BYTES
+    ) -> None:
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._rendering: Dict[Hashable, threading.Lock] = {}
+
+        # Simple counters, useful when sizing the cache.
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _lookup(self, key: Hashable, version: Hashable) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.version == version:
+            self._entries.move_to_end(key)
+            return entry
+        return None
+
+    def get(
+        self,
+        key: Hashable,
+        version: Hashable,
+        render: Callable[[], Tuple[str, bytes]],
+    ) -> CachedResponse:
+        """
+        The cached response for key at version, calling render() ->
+        (content_type, body) on a miss. Exceptions from render() propagate
+        and nothing is cached.
+        """
+        with self._lock:
+            entry = self._lookup(key, version)
+            if entry is not None:
+                self.hits += 1
+                return entry
+            render_lock = self._rendering.setdefault(key, threading.Lock())
+
+        with render_lock:
+            with self._lock:
+                # Someone else may have rendered it while we waited.
+                entry = self._lookup(key, version)
+                if entry is not None:
+                    self.hits += 1
+                    return entry
+                self.misses += 1
+                previous = self._entries.get(key)
+
+            content_type, body = render()
+            etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+            if previous is not None and previous.etag == etag:
+                last_modified = previous.last_modified
+            else:
+                last_modified = int(time.time())
+                if previous is not None and last_modified <= previous.last_modified:
+                    # Keep Last-Modified increasing per key, so a change within
+                    # the same second is not hidden from If-Modified-Since.
+                    last_modified = previous.last_modified + 1
+            entry = CachedResponse(version, content_type, body, etag, last_modified)
+            if previous is not None and previous.etag == etag:
+                entry._gzip_body = previous._gzip_body
+
+            with self._lock:
+                self._store(key, entry)
+                if self._rendering.get(key) is render_lock:
+                    del self._rendering[key]
+            return entry
+
+    def _store(self, key: Hashable, entry: CachedResponse) -> None:
+        if len(entry.body) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old.body)
+        self._entries[key] = entry
+        self._bytes += len(entry.body)
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted.body)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -1,6 +1,16 @@
 import json
+import sys
+from pathlib import Path
 from urllib import request
 
+# Make sure we can import shared modules from local_logger
+ROOT_DIR = Path(__file__).resolve().parents[1]  # .../02_CODE
+LOCAL_LOGGER_DIR = ROOT_DIR / "local_logger"
+if str(LOCAL_LOGGER_DIR) not in sys.path:
+    sys.path.insert(0, str(LOCAL_LOGGER_DIR))
+
+from http_compression import encode_request_body, read_response
+
 
 def build_demo_event() -> dict:
     """
@@ -29,19 +39,19 @@ def build_demo_event() -> dict:
 def main() -> None:
     url = "http://127.0.0.1:9000/trade_event"
     event = build_demo_event()
-    data = json.dumps(event).encode("utf-8")
+    data, headers = encode_request_body(json.dumps(event).encode("utf-8"))
 
     req = request.Request(
         url,
         data=data,
-        headers={"Content-Type": "application/json"},
+        headers={"Content-Type": "application/json", **headers},
         method="POST",
     )
 
     print(f"Sending demo TRADE_EVENT to {url} ...")
     try:
         with request.urlopen(req) as resp:
-            body = resp.read().decode("utf-8")
+            body = read_response(resp).decode("utf-8")
             print("Response status:", resp.status)
             print("Response body:", body)
     except Exception as e:
@@ -1,10 +1,25 @@
+import argparse
 import json
+import select
 import sys
-from http.server import HTTPServer, BaseHTTPRequestHandler
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from http.server import HTTPServer, ThreadingHTTPServer, BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
 from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
 
 import db
+from ingest_queue import (
+    DEFAULT_MAX_BATCH_EVENTS,
+    DEFAULT_MAX_WAIT_MS,
+    DEFAULT_QUEUE_SIZE,
+    GroupCommitWriter,
+    IngestQueueFull,
+)
+from response_cache import DEFAULT_MAX_BYTES, DEFAULT_MAX_ENTRIES, ResponseCache, cache_key
 
 
 # Make sure we can import shared modules from local_logger
@@ -13,8 +28,68 @@ LOCAL_LOGGER_DIR = ROOT_DIR / "local_logger"
 if str(LOCAL_LOGGER_DIR) not in sys.path:
     sys.path.insert(0, str(LOCAL_LOGGER_DIR))
 
-from trade_event_validator import validate_trade_event, TradeEventValidationError
-from metrics_core import compute_metrics, group_by_key
+import json_codec
+from trade_event_validator import validate_many, validate_trade_event, TradeEventValidationError
+from http_compression import (
+    BodyDecodeError,
+    BodyTooLarge,
+    UnsupportedEncoding,
+    accepts_gzip,
+    compress_response,
+    gzip_stream,
+    read_body,
+)
+from instrumentation import RequestTimer, StatsRegistry, http_stats_registry, record_request
+from metrics_core import TIMESTAMP_MIN_US, parse_timestamp_us
+
+# An event's JSON exactly as received: bytes (NDJSON line, single body) or
+# text (element of a JSON array body).
+RawJson = Union[bytes, str]
+
+# Upper bound on events accepted in one POST /trade_events request.
+MAX_BATCH_EVENTS = 50_000
+
+# Upper bound on a request body after decoding (gzip bodies are decompressed
+# in a stream and rejected with 413 as soon as they exceed it).
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 9000
+# Thread per connection: an idle keep-alive connection then costs a parked
+# thread, not one of a fixed number of workers.
+DEFAULT_MODE = "threaded"
+DEFAULT_WORKERS = 16
+
+# GET /events page sizes (JSON mode).
+EVENTS_DEFAULT_LIMIT = 1000
+EVENTS_MAX_LIMIT = 10000
+
+# Idle keep-alive connections are closed after this many seconds, so a quiet
+# client cannot hold on to a worker thread forever.
+KEEPALIVE_TIMEOUT = 15.0
+
+# Pooled mode: how often a worker holding an idle keep-alive connection checks
+# whether other connections are waiting for a worker (it then closes its own).
+IDLE_POLL_INTERVAL = 0.05
+
+# How long a request waits for its group commit before giving up with 503.
+INGEST_ACK_TIMEOUT = 30.0
+
+# GET endpoints served through the response cache (when the server has one):
+# their output depends only on the query string and the database content.
+CACHEABLE_GET_PATHS = {"/metrics/overall", "/metrics/by_strategy", "/metrics/by_account", "/report"}
+
+# Paths reported by name in /internal/stats; any other path counts as "other",
+# so scanners probing random URLs cannot grow the stats without bound.
+STATS_ENDPOINTS = CACHEABLE_GET_PATHS | {
+    "/health",
+    "/events",
+    "/trade_event",
+    "/trade_events",
+    "/internal/stats",
+}
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
 
 
 def metrics_table_html(title: str, metrics: dict) -> str:
@@ -35,24 +110,501 @@ def metrics_table_html(title: str, metrics: dict) -> str:
     """
 
 
+def report_html(results: Dict[str, Any], filters_text: str) -> str:
+    """
+    HTML page for GET /report from report_metrics() results.
+    """
+    overall_metrics = results["overall"]
+
+    strat_blocks = []
+    for strat_id, m in results["groups"]["strategy_id"].items():
+        strat_blocks.append(metrics_table_html(f"strategy_id = {strat_id}", m))
+
+    acc_blocks = []
+    for acc_id, m in results["groups"]["account_id"].items():
+        acc_blocks.append(metrics_table_html(f"account_id = {acc_id}", m))
+
+    return f"""<!DOCTYPE html>
+<html>
+<head>
+  <meta charset="utf-8" />
+  <title>TRUEEDGE Backend Report</title>
+</head>
+<body>
+  <h1>TRUEEDGE Backend Report</h1>
+  <p>This report is generated from the SQLite database (trueedge_backend.db).</p>
+  <p><strong>Filters:</strong> {filters_text}</p>
+
+  {metrics_table_html("OVERALL metrics (from backend DB)", overall_metrics)}
+
+  <h2>Metrics by strategy_id</h2>
+  {''.join(strat_blocks) if strat_blocks else "<p>No strategy data.</p>"}
+
+  <h2>Metrics by account_id</h2>
+  {''.join(acc_blocks) if acc_blocks else "<p>No account data.</p>"}
+
+  <p style="margin-top: 20px; font-size: 12px; color: #555;">
+    Served by TRUEEDGE backend API at /report.
+  </p>
+</body>
+</html>
+"""
+
+
+def parse_time_param(value: Optional[str]) -> Optional[int]:
+    """
+    Parse a from/to query parameter (ISO 8601 date or datetime; UTC if no
+    offset is given) into epoch microseconds. Raises ValueError if invalid.
+    """
+    if value is None or value == "":
+        return None
+    ts_us = parse_timestamp_us(value)
+    if ts_us == TIMESTAMP_MIN_US:
+        raise ValueError(f"Invalid timestamp: {value!r}")
+    return ts_us
+
+
+def fetch_metrics(
+    group_by: Optional[str] = None,
+    account_id: Optional[str] = None,
+    strategy_id: Optional[str] = None,
+    start_us: Optional[int] = None,
+    end_us: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Metrics for the endpoints: the materialized aggregates when no time window
+    is requested, otherwise an indexed SQL query over [start_us, end_us).
+    """
+    if start_us is None and end_us is None:
+        return db.fetch_aggregated_metrics(
+            group_by=group_by, account_id=account_id, strategy_id=strategy_id
+        )
+    return db.fetch_metrics_sql(
+        group_by=group_by,
+        account_id=account_id,
+        strategy_id=strategy_id,
+        start_us=start_us,
+        end_us=end_us,
+    )
+
+
+def encode_cursor(ts_us: int, row_id: int) -> str:
+    """
+    Keyset pagination cursor for GET /events: the (ts_us, id) of the last row.
+    """
+    return f"{ts_us}:{row_id}"
+
+
+def decode_cursor(value: str) -> Tuple[int, int]:
+    try:
+        ts_part, id_part = value.split(":")
+        return int(ts_part), int(id_part)
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {value!r}")
+
+
+def report_metrics(
+    account_id: Optional[str] = None,
+    strategy_id: Optional[str] = None,
+    start_us: Optional[int] = None,
+    end_us: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Overall, per-strategy and per-account metrics for /report, in the
+    metrics_core.compute_grouped_metrics shape.
+
+    Without a time window these come straight from the aggregates; with one,
+    a single ordered scan of the window feeds all three groupings at once.
+    """
+    if start_us is not None or end_us is not None:
+        return db.compute_grouped_metrics_sql(
+            account_id=account_id,
+            strategy_id=strategy_id,
+            start_us=start_us,
+            end_us=end_us,
+            group_keys=("strategy_id", "account_id"),
+        )
+
+    filters = {"account_id": account_id, "strategy_id": strategy_id}
+    return {
+        "overall": db.fetch_aggregated_metrics(**filters)[0]["metrics"],
+        "groups": {
+            key_name: {
+                group["key"]: group["metrics"]
+                for group in db.fetch_aggregated_metrics(group_by=key_name, **filters)
+            }
+            for key_name in ("strategy_id", "account_id")
+        },
+    }
+
+
+class IngestBusy(Exception):
+    """The ingest queue cannot take or acknowledge events right now (HTTP 503)."""
+    pass
+
+
+def parse_batch_body(body: bytes) -> List[Tuple[Optional[Any], Optional[RawJson], Optional[str]]]:
+    """
+    Parse a bulk ingest body into a list of (event, raw, error) triples,
+    where raw is the event's own JSON text as received (see raw_event_json).
+
+    - A body starting with "[" is treated as a JSON array of events.
+    - Anything else is treated as NDJSON: one JSON event per non-empty line.
+
+    A broken NDJSON line only marks that entry invalid. A malformed JSON array
+    cannot be split into events, so it raises ValueError for the whole body.
+    """
+    items: List[Tuple[Optional[Any], Optional[RawJson], Optional[str]]] = []
+
+    if body.lstrip().startswith(b"["):
+        try:
+            text = body.decode("utf-8")
+        except UnicodeDecodeError as e:
+            raise ValueError(f"Body is not valid UTF-8: {e}")
+        for event, raw in _split_json_array(text):
+            if isinstance(event, dict):
+                items.append((event, raw, None))
+            else:
+                items.append((event, None, "TRADE_EVENT must be a JSON object"))
+        return items
+
+    for line in body.split(b"\n"):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            event = json_codec.loads(line)
+        except json_codec.DecodeError as e:
+            items.append((None, None, f"Invalid JSON: {e}"))
+            continue
+        if isinstance(event, dict):
+            items.append((event, line, None))
+        else:
+            items.append((event, None, "TRADE_EVENT must be a JSON object"))
+    return items
+
+
+def _split_json_array(text: str) -> Iterator[Tuple[Any, str]]:
+    """
+    (element, its source text) for each element of the JSON array in text,
+    decoding every element only once.
+    """
+    end = len(text)
+    index = _skip_whitespace(text, text.index("[") + 1)
+    if index < end and text[index] == "]":
+        index += 1
+    else:
+        while True:
+            try:
+                element, element_end = json_codec.raw_decode(text, index)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Invalid JSON: {e}")
+            yield element, text[index:element_end]
+            index = _skip_whitespace(text, element_end)
+            if index < end and text[index] == ",":
+                index = _skip_whitespace(text, index + 1)
+                continue
+            if index < end and text[index] == "]":
+                index += 1
+                break
+            raise ValueError(f"Invalid JSON: Expecting ',' delimiter or ']' at char {index}")
+    if _skip_whitespace(text, index) != end:
+        raise ValueError(f"Invalid JSON: Extra data after the array at char {index}")
+
+
+def _skip_whitespace(text: str, index: int) -> int:
+    while index < len(text) and text[index] in " \t\n\r":
+        index += 1
+    return index
+
+
+def raw_event_json(raw: Optional[RawJson], event: Dict[str, Any]) -> str:
+    """
+    The raw_json stored for an event: its JSON text exactly as the client sent
+    it when that is a single line, otherwise (pretty-printed, or not UTF-8)
+    the event re-serialized on one line.
+    """
+    text = json_codec.single_line(raw) if raw is not None else None
+    return text if text is not None else json_codec.dumps(event)
+
+
+class PooledHTTPServer(HTTPServer):
+    """
+    HTTPServer that handles connections on a fixed-size thread pool.
+
+    Each accepted connection (including all keep-alive requests on it) runs on
+    one worker; extra connections wait in the pool's queue instead of spawning
+    unbounded threads. While connections are queued the pool is saturated:
+    workers then close their keep-alive connections once they are idle (see
+    TrueedgeBackendHandler.handle), so idle sockets do not block new clients.
+    """
+
+    request_queue_size = 128
+
+    def __init__(self, server_address, handler_class, workers: int = DEFAULT_WORKERS) -> None:
+        super().__init__(server_address, handler_class)
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="trueedge-http"
+        )
+        self._queued = 0
+        self._queued_lock = threading.Lock()
+
+    def saturated(self) -> bool:
+        """
+        True while accepted connections are waiting for a free worker.
+        """
+        return self._queued > 0
+
+    def process_request(self, request, client_address) -> None:
+        with self._queued_lock:
+            self._queued += 1
+        self._executor.submit(self._process_request_worker, request, client_address)
+
+    def _process_request_worker(self, request, client_address) -> None:
+        with self._queued_lock:
+            self._queued -= 1
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def handle_error(self, request, client_address) -> None:
+        """
+        A client closing its keep-alive connection mid-request is normal;
+        only print tracebacks for other errors.
+        """
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            return
+        super().handle_error(request, client_address)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class BacklogThreadingHTTPServer(ThreadingHTTPServer):
+    """
+    One thread per connection (no upper bound), with a larger listen backlog.
+    """
+
+    request_queue_size = 128
+
+
+def create_server(
+    host: str = DEFAULT_HOST,
+    port: int = DEFAULT_PORT,
+    mode: str = DEFAULT_MODE,
+    workers: int = DEFAULT_WORKERS,
+) -> HTTPServer:
+    """
+    Build the HTTP server for the given serving mode:
+    - "threaded": one thread per connection (default),
+    - "pooled":   fixed pool of `workers` threads,
+    - "single":   the original single-threaded HTTPServer.
+    """
+    server_address = (host, port)
+    if mode == "pooled":
+        server = PooledHTTPServer(server_address, TrueedgeBackendHandler, workers=workers)
+    elif mode == "threaded":
+        server = BacklogThreadingHTTPServer(server_address, TrueedgeBackendHandler)
+    elif mode == "single":
+        server = HTTPServer(server_address, TrueedgeBackendHandler)
+    else:
+        raise ValueError(f"Unknown server mode: {mode!r}")
+    server.stats = create_stats_registry(server)
+    return server
+
+
+def create_stats_registry(server: HTTPServer) -> StatsRegistry:
+    """
+    Request stats for GET /internal/stats, plus the DB connection manager,
+    the ingest queue and the response cache as collectors (read from the
+    server when the stats are exported, so they may be attached later).
+    """
+    stats = http_stats_registry()
+    stats.add_collector(db.connection_stats)
+
+    def ingest_stats() -> Dict[str, float]:
+        writer = getattr(server, "ingest_writer", None)
+        return writer.stats() if writer is not None else {}
+
+    def cache_stats() -> Dict[str, float]:
+        cache = getattr(server, "response_cache", None)
+        if cache is None:
+            return {}
+        values = cache.stats()
+        return {
+            "response_cache_entries": values["entries"],
+            "response_cache_bytes": values["bytes"],
+            "response_cache_hits_total": values["hits"],
+            "response_cache_misses_total": values["misses"],
+            "response_cache_evictions_total": values["evictions"],
+        }
+
+    stats.add_collector(ingest_stats)
+    stats.add_collector(cache_stats)
+    return stats
+
+
 class TrueedgeBackendHandler(BaseHTTPRequestHandler):
-    def _send_json(self, status_code: int, payload: dict) -> None:
-        body = json.dumps(payload).encode("utf-8")
+    # HTTP/1.1 keeps connections open between requests (every response
+    # carries Content-Length, so clients can reuse the socket).
+    protocol_version = "HTTP/1.1"
+    timeout = KEEPALIVE_TIMEOUT
+    # Small JSON responses on a persistent connection would otherwise wait on
+    # Nagle + delayed ACK.
+    disable_nagle_algorithm = True
+
+    def handle(self) -> None:
+        """
+        BaseHTTPRequestHandler.handle, except that on a saturated pooled
+        server an idle keep-alive connection is closed instead of holding
+        its worker for up to KEEPALIVE_TIMEOUT.
+        """
+        saturated = getattr(self.server, "saturated", None)
+        if saturated is None:
+            super().handle()
+            return
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection and self._wait_for_request(saturated):
+            self.handle_one_request()
+
+    def _wait_for_request(self, saturated: Callable[[], bool]) -> bool:
+        """
+        Wait until the next request on this connection can be read (True), or
+        give up (False) when other connections need the worker or the
+        keep-alive timeout passes.
+        """
+        deadline = time.monotonic() + KEEPALIVE_TIMEOUT
+        while True:
+            if self._request_buffered():
+                return True
+            readable, _, _ = select.select([self.connection], [], [], IDLE_POLL_INTERVAL)
+            if readable:
+                return True
+            if saturated() or time.monotonic() >= deadline:
+                return False
+
+    def _request_buffered(self) -> bool:
+        """
+        True when rfile already holds bytes of a pipelined request (select
+        cannot see those).
+        """
+        self.connection.settimeout(0.0)
+        try:
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return True  # let handle_one_request hit the error
+        finally:
+            self.connection.settimeout(self.timeout)
+
+    def send_response(self, code: int, message: Optional[str] = None) -> None:
+        self._status = code  # for the request stats
+        super().send_response(code, message)
+
+    def _instrumented(self, method: str, handle: Callable[[], None]) -> None:
+        """
+        Run handle() with a RequestTimer and record the request in the
+        server's stats (when it has them).
+        """
+        self.timer = RequestTimer()
+        self._status = None
+        db.take_rows_scanned()  # nothing left over from a failed request
+        try:
+            handle()
+        finally:
+            stats = getattr(self.server, "stats", None)
+            if stats is not None:
+                endpoint = urlparse(self.path).path
+                record_request(
+                    stats,
+                    method,
+                    endpoint if endpoint in STATS_ENDPOINTS else "other",
+                    self._status,
+                    self.timer,
+                    db.take_rows_scanned(),
+                )
+
+    def _send_body(
+        self,
+        status_code: int,
+        content_type: str,
+        body: bytes,
+        headers: Optional[Dict[str, str]] = None,
+        compress: bool = True,
+    ) -> None:
+        """
+        Send a complete response. With compress, the body is gzipped when the
+        client accepts it and it is large enough (http_compression).
+        """
+        if compress:
+            with self.timer.phase("compress"):
+                body, extra = compress_response(
+                    body, content_type, self.headers.get("Accept-Encoding")
+                )
+            if extra:
+                headers = {**(headers or {}), **extra}
         self.send_response(status_code)
-        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Type", content_type)
         self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if self.close_connection:
+            self.send_header("Connection", "close")
         self.end_headers()
         self.wfile.write(body)
 
+    def _send_json(
+        self, status_code: int, payload: dict, headers: Optional[Dict[str, str]] = None
+    ) -> None:
+        with self.timer.phase("serialize"):
+            body = json.dumps(payload).encode("utf-8")
+        self._send_body(status_code, "application/json", body, headers)
+
     def _send_html(self, status_code: int, html: str) -> None:
-        body = html.encode("utf-8")
-        self.send_response(status_code)
-        self.send_header("Content-Type", "text/html; charset=utf-8")
-        self.send_header("Content-Length", str(len(body)))
-        self.end_headers()
-        self.wfile.write(body)
+        self._send_body(status_code, "text/html; charset=utf-8", html.encode("utf-8"))
+
+    def _send_cacheable(
+        self, path: str, query_string: str, render: Callable[[], Tuple[str, bytes]]
+    ) -> None:
+        """
+        Send a GET response through the server's ResponseCache, if any.
+
+        While db.data_version() is unchanged the cached body is reused; a
+        request whose If-None-Match / If-Modified-Since matches gets a 304
+        without a body.
+        """
+        cache: Optional[ResponseCache] = getattr(self.server, "response_cache", None)
+        if cache is None:
+            content_type, body = render()
+            self._send_body(200, content_type, body)
+            return
+
+        entry = cache.get(cache_key(path, query_string), db.data_version(), render)
+        accept_encoding = self.headers.get("Accept-Encoding")
+        headers = entry.headers(accept_encoding)
+        if entry.not_modified(self.headers):
+            self.send_response(304)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            if self.close_connection:
+                self.send_header("Connection", "close")
+            self.end_headers()
+            return
+        with self.timer.phase("compress"):
+            body, encoding = entry.encoded_body(accept_encoding)
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        self._send_body(200, entry.content_type, body, headers, compress=False)
 
     def do_GET(self) -> None:
+        self._instrumented("GET", self._handle_get)
+
+    def _handle_get(self) -> None:
         parsed = urlparse(self.path)
         path = parsed.path
 
@@ -60,167 +612,443 @@ class TrueedgeBackendHandler(BaseHTTPRequestHandler):
             self._send_json(200, {"status": "ok", "service": "trueedge_backend"})
             return
 
+        if path == "/internal/stats":
+            self._send_stats(parse_qs(parsed.query).get("format", ["json"])[0])
+            return
+
+        query = parse_qs(parsed.query)
+        if path in CACHEABLE_GET_PATHS:
+            time_range = self._time_range(query)
+            if time_range is None:
+                return
+            self._send_cacheable(
+                path,
+                parsed.query,
+                lambda: self._render_get(path, query, *time_range),
+            )
+            return
+
+        if path == "/events":
+            time_range = self._time_range(query)
+            if time_range is None:
+                return
+            self._handle_events(query, time_range[2], time_range[3])
+            return
+
+        # If we reach here, endpoint is not found
+        self._send_json(404, {"status": "error", "message": "Not found"})
+
+    def _time_range(
+        self, query: Dict[str, List[str]]
+    ) -> Optional[Tuple[Optional[str], Optional[str], Optional[int], Optional[int]]]:
+        """
+        Optional time window of /metrics/*, /report and /events: ?from=...&to=...
+        (ISO 8601, from inclusive, to exclusive), as (from, to, start_us, end_us).
+        Sends 400 and returns None if either value is invalid.
+        """
+        time_from = query.get("from", [None])[0]
+        time_to = query.get("to", [None])[0]
+        try:
+            return time_from, time_to, parse_time_param(time_from), parse_time_param(time_to)
+        except ValueError as e:
+            self._send_json(400, {"status": "error", "message": str(e)})
+            return None
+
+    def _send_stats(self, fmt: str) -> None:
+        """
+        GET /internal/stats: request counts and latency percentiles per
+        endpoint, time per phase, rows scanned, DB / queue / cache gauges.
+        format=json (default) or format=prometheus (text exposition format).
+        """
+        stats: Optional[StatsRegistry] = getattr(self.server, "stats", None)
+        if stats is None:
+            self._send_json(404, {"status": "error", "message": "Stats are disabled"})
+            return
+        if fmt == "prometheus":
+            with self.timer.phase("serialize"):
+                body = stats.to_prometheus().encode("utf-8")
+            self._send_body(200, PROMETHEUS_CONTENT_TYPE, body)
+            return
+        if fmt != "json":
+            self._send_json(400, {"status": "error", "message": f"Unsupported format: {fmt!r}"})
+            return
+        self._send_json(200, {"status": "ok", "service": "trueedge_backend", **stats.to_dict()})
+
+    def _render_get(
+        self,
+        path: str,
+        query: Dict[str, List[str]],
+        time_from: Optional[str],
+        time_to: Optional[str],
+        start_us: Optional[int],
+        end_us: Optional[int],
+    ) -> Tuple[str, bytes]:
+        """
+        Render one of the CACHEABLE_GET_PATHS as (content type, body).
+        """
         if path == "/metrics/overall":
-            query = parse_qs(parsed.query)
             account_id = query.get("account_id", [None])[0]
             strategy_id = query.get("strategy_id", [None])[0]
 
-            events = db.fetch_events(account_id=account_id, strategy_id=strategy_id)
-            metrics = compute_metrics(events, starting_balance=0.0)
+            with self.timer.phase("db"):
+                overall = fetch_metrics(
+                    account_id=account_id,
+                    strategy_id=strategy_id,
+                    start_us=start_us,
+                    end_us=end_us,
+                )[0]
             response = {
                 "status": "ok",
                 "filters": {
                     "account_id": account_id,
                     "strategy_id": strategy_id,
+                    "from": time_from,
+                    "to": time_to,
                 },
-                "count": len(events),
-                "metrics": metrics,
+                "count": overall["count"],
+                "metrics": overall["metrics"],
             }
-            self._send_json(200, response)
-            return
+            with self.timer.phase("serialize"):
+                return "application/json", json.dumps(response).encode("utf-8")
 
         if path == "/metrics/by_strategy":
-            query = parse_qs(parsed.query)
             account_id = query.get("account_id", [None])[0]
 
-            events = db.fetch_events(account_id=account_id, strategy_id=None)
-            groups = group_by_key(events, "strategy_id")
+            with self.timer.phase("db"):
+                groups = fetch_metrics(
+                    group_by="strategy_id",
+                    account_id=account_id,
+                    start_us=start_us,
+                    end_us=end_us,
+                )
 
             strategies = []
-            for strat_id, strat_events in groups.items():
-                m = compute_metrics(strat_events, starting_balance=0.0)
+            for group in groups:
                 strategies.append(
                     {
-                        "strategy_id": strat_id,
-                        "count": len(strat_events),
-                        "metrics": m,
+                        "strategy_id": group["key"],
+                        "count": group["count"],
+                        "metrics": group["metrics"],
                     }
                 )
 
             response = {
                 "status": "ok",
-                "filters": {"account_id": account_id},
+                "filters": {"account_id": account_id, "from": time_from, "to": time_to},
                 "strategies": strategies,
             }
-            self._send_json(200, response)
-            return
+            with self.timer.phase("serialize"):
+                return "application/json", json.dumps(response).encode("utf-8")
 
         if path == "/metrics/by_account":
-            query = parse_qs(parsed.query)
             strategy_id = query.get("strategy_id", [None])[0]
 
-            events = db.fetch_events(account_id=None, strategy_id=strategy_id)
-            groups = group_by_key(events, "account_id")
+            with self.timer.phase("db"):
+                groups = fetch_metrics(
+                    group_by="account_id",
+                    strategy_id=strategy_id,
+                    start_us=start_us,
+                    end_us=end_us,
+                )
 
             accounts = []
-            for acc_id, acc_events in groups.items():
-                m = compute_metrics(acc_events, starting_balance=0.0)
+            for group in groups:
                 accounts.append(
                     {
-                        "account_id": acc_id,
-                        "count": len(acc_events),
-                        "metrics": m,
+                        "account_id": group["key"],
+                        "count": group["count"],
+                        "metrics": group["metrics"],
                     }
                 )
 
             response = {
                 "status": "ok",
-                "filters": {"strategy_id": strategy_id},
+                "filters": {"strategy_id": strategy_id, "from": time_from, "to": time_to},
                 "accounts": accounts,
             }
-            self._send_json(200, response)
-            return
+            with self.timer.phase("serialize"):
+                return "application/json", json.dumps(response).encode("utf-8")
 
         if path == "/report":
-            query = parse_qs(parsed.query)
             account_id = query.get("account_id", [None])[0]
             strategy_id = query.get("strategy_id", [None])[0]
-
-            events = db.fetch_events(account_id=account_id, strategy_id=strategy_id)
-            overall_metrics = compute_metrics(events, starting_balance=0.0)
-
-            by_strategy = group_by_key(events, "strategy_id")
-            strat_blocks = []
-            for strat_id, strat_events in by_strategy.items():
-                m = compute_metrics(strat_events, starting_balance=0.0)
-                strat_blocks.append(metrics_table_html(f"strategy_id = {strat_id}", m))
-
-            by_account = group_by_key(events, "account_id")
-            acc_blocks = []
-            for acc_id, acc_events in by_account.items():
-                m = compute_metrics(acc_events, starting_balance=0.0)
-                acc_blocks.append(metrics_table_html(f"account_id = {acc_id}", m))
-
+            with self.timer.phase("db"):
+                results = report_metrics(account_id, strategy_id, start_us, end_us)
             filters_desc = []
             if account_id:
                 filters_desc.append(f"account_id = {account_id}")
             if strategy_id:
                 filters_desc.append(f"strategy_id = {strategy_id}")
+            if time_from:
+                filters_desc.append(f"from = {time_from}")
+            if time_to:
+                filters_desc.append(f"to = {time_to}")
             filters_text = ", ".join(filters_desc) if filters_desc else "none"
 
-            html_content = f"""<!DOCTYPE html>
-<html>
-<head>
-  <meta charset="utf-8" />
-  <title>TRUEEDGE Backend Report</title>
-</head>
-<body>
-  <h1>TRUEEDGE Backend Report</h1>
-  <p>This report is generated from the SQLite database (trueedge_backend.db).</p>
-  <p><strong>Filters:</strong> {filters_text}</p>
+            with self.timer.phase("serialize"):
+                html_content = report_html(results, filters_text)
+            return "text/html; charset=utf-8", html_content.encode("utf-8")
+        raise ValueError(f"Not a cacheable path: {path!r}")
 
-  {metrics_table_html("OVERALL metrics (from backend DB)", overall_metrics)}
+    def _handle_events(
+        self,
+        query: Dict[str, List[str]],
+        start_us: Optional[int],
+        end_us: Optional[int],
+    ) -> None:
+        """
+        GET /events: raw TRADE_EVENTs in (timestamp, id) order.
 
-  <h2>Metrics by strategy_id</h2>
-  {''.join(strat_blocks) if strat_blocks else "<p>No strategy data.</p>"}
+        Filters: account_id, strategy_id, symbol, from, to.
+        - format=json (default): one page of `limit` events plus `next_cursor`;
+          pass it back as ?cursor=... to get the next page (keyset pagination).
+        - format=ndjson (or Accept: application/x-ndjson): streams every
+          matching event, one per line, with chunked transfer encoding.
+          An optional cursor/limit still apply.
+        """
+        cursor = query.get("cursor", [None])[0]
+        limit_param = query.get("limit", [None])[0]
+        try:
+            after = decode_cursor(cursor) if cursor else None
+            limit = int(limit_param) if limit_param else None
+            if limit is not None and limit <= 0:
+                raise ValueError(f"Invalid limit: {limit_param!r}")
+        except ValueError as e:
+            self._send_json(400, {"status": "error", "message": str(e)})
+            return
 
-  <h2>Metrics by account_id</h2>
-  {''.join(acc_blocks) if acc_blocks else "<p>No account data.</p>"}
+        fmt = query.get("format", [None])[0]
+        if fmt is None:
+            accept = self.headers.get("Accept", "")
+            fmt = "ndjson" if "application/x-ndjson" in accept else "json"
 
-  <p style="margin-top: 20px; font-size: 12px; color: #555;">
-    Served by TRUEEDGE backend API at /report.
-  </p>
-</body>
-</html>
-"""
-            self._send_html(200, html_content)
+        filters = {
+            "account_id": query.get("account_id", [None])[0],
+            "strategy_id": query.get("strategy_id", [None])[0],
+            "symbol": query.get("symbol", [None])[0],
+            "start_us": start_us,
+            "end_us": end_us,
+        }
+
+        if fmt == "ndjson":
+            self._stream_events_ndjson(filters, after, limit)
+            return
+        if fmt != "json":
+            self._send_json(400, {"status": "error", "message": f"Unsupported format: {fmt!r}"})
             return
 
-        # If we reach here, endpoint is not found
-        self._send_json(404, {"status": "error", "message": "Not found"})
+        page_size = min(limit or EVENTS_DEFAULT_LIMIT, EVENTS_MAX_LIMIT)
+        # Fetch one extra row to know whether another page exists.
+        rows: List[Tuple[int, int, str]] = []
+        with self.timer.phase("db"):
+            for batch in db.iter_events_raw(**filters, after=after, limit=page_size + 1):
+                rows.extend(batch)
 
-    def do_POST(self) -> None:
-        parsed = urlparse(self.path)
-        path = parsed.path
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = encode_cursor(rows[-1][0], rows[-1][1])
 
-        if path != "/trade_event":
-            self._send_json(404, {"status": "error", "message": "Not found"})
-            return
+        # raw_json is already serialized; splice it in instead of decoding.
+        with self.timer.phase("serialize"):
+            head = json.dumps(
+                {"status": "ok", "count": len(rows), "next_cursor": next_cursor}
+            )[:-1]
+            body = (
+                head + ', "events": [' + ", ".join(raw for _, _, raw in rows) + "]}"
+            ).encode("utf-8")
+        self._send_body(200, "application/json", body)
+
+    def _stream_events_ndjson(
+        self,
+        filters: Dict[str, Any],
+        after: Optional[Tuple[int, int]],
+        limit: Optional[int],
+    ) -> None:
+        batches = db.iter_events_raw(**filters, after=after, limit=limit)
+        chunked = self.request_version == "HTTP/1.1"
+        # Streamed gzip: every batch is sync-flushed, so the client can decode
+        # each chunk as it arrives.
+        compressor = gzip_stream() if accepts_gzip(self.headers.get("Accept-Encoding")) else None
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Vary", "Accept-Encoding")
+        if compressor is not None:
+            self.send_header("Content-Encoding", "gzip")
+        if chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        else:
+            # HTTP/1.0 has no chunked encoding: the end of the body is the close.
+            self.close_connection = True
+            self.send_header("Connection", "close")
+        self.end_headers()
+
+        timer = self.timer
+        try:
+            while True:
+                with timer.phase("db"):
+                    rows = next(batches, None)
+                if rows is None:
+                    break
+                data = "".join(raw + "\n" for _, _, raw in rows).encode("utf-8")
+                if compressor is not None:
+                    data = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+                self._write_stream_chunk(data, chunked)
+            if compressor is not None:
+                self._write_stream_chunk(compressor.flush(), chunked)
+            if chunked:
+                self.wfile.write(b"0\r\n\r\n")
+        except Exception as e:
+            # Headers are already sent; dropping the connection without the
+            # final chunk tells the client the stream is incomplete.
+            self.close_connection = True
+            self.log_error("GET /events stream aborted: %s", e)
+        finally:
+            batches.close()
+
+    def _write_stream_chunk(self, data: bytes, chunked: bool) -> None:
+        if not data:
+            return  # an empty chunk would end a chunked body
+        if chunked:
+            self.wfile.write(b"%X\r\n%s\r\n" % (len(data), data))
+        else:
+            self.wfile.write(data)
+
+    def _read_body(self) -> Optional[bytes]:
+        """
+        Read the request body according to Content-Length, decoding
+        Content-Encoding: gzip (up to MAX_BODY_BYTES once decompressed).
+        Sends an error response (400, 411, 413, 415) and returns None if the
+        body cannot be used.
+        """
+        if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+            # The unread body would corrupt the next request on this connection.
+            self.close_connection = True
+            self._send_json(411, {"status": "error", "message": "Content-Length required"})
+            return None
 
         content_length = self.headers.get("Content-Length")
         try:
             length = int(content_length) if content_length is not None else 0
+            if length < 0:
+                raise ValueError(length)
         except ValueError:
+            self.close_connection = True
             self._send_json(400, {"status": "error", "message": "Invalid Content-Length"})
+            return None
+        try:
+            with self.timer.phase("read"):
+                return read_body(
+                    self.rfile, length, self.headers.get("Content-Encoding"), MAX_BODY_BYTES
+                )
+        except BodyDecodeError as e:
+            if isinstance(e, BodyTooLarge):
+                status_code = 413
+            elif isinstance(e, UnsupportedEncoding):
+                status_code = 415
+            else:
+                status_code = 400
+            # The rest of the body may still be unread.
+            self.close_connection = True
+            self._send_json(status_code, {"status": "error", "message": str(e)})
+            return None
+
+    def _ingest_writer(self) -> Optional[GroupCommitWriter]:
+        return getattr(self.server, "ingest_writer", None)
+
+    def _store_events(
+        self,
+        events: List[Dict[str, Any]],
+        numbers: List[tuple],
+        raws: List[Optional[RawJson]],
+    ) -> List[str]:
+        """
+        Store validated events and return their per-event statuses.
+        numbers: the coerced numeric fields the validator returned per event;
+        raws: each event's JSON as received (stored by raw_event_json).
+
+        With a group-commit writer attached to the server, this waits until the
+        group containing these events is committed. Raises IngestBusy when the
+        queue is full or the commit does not complete in time.
+        """
+        # Rows are built here, in the request thread, so the single
+        # group-commit writer thread only runs the INSERTs.
+        rows = [
+            db.event_to_row(event, n, raw_event_json(raw, event))
+            for event, n, raw in zip(events, numbers, raws)
+        ]
+        writer = self._ingest_writer()
+        # In group mode "db" includes the wait for the group's commit.
+        with self.timer.phase("db"):
+            if writer is None:
+                return db.insert_trade_rows(rows)
+            try:
+                future = writer.submit(rows)
+            except IngestQueueFull as e:
+                raise IngestBusy(str(e))
+            try:
+                return future.result(timeout=INGEST_ACK_TIMEOUT)
+            except FutureTimeoutError:
+                raise IngestBusy("Timed out waiting for commit; events may still be stored")
+
+    def _send_busy(self, message: str) -> None:
+        self._send_json(
+            503, {"status": "error", "message": message}, headers={"Retry-After": "1"}
+        )
+
+    def do_POST(self) -> None:
+        self._instrumented("POST", self._handle_post)
+
+    def _handle_post(self) -> None:
+        parsed = urlparse(self.path)
+        path = parsed.path
+
+        if path == "/trade_event":
+            self._handle_trade_event()
             return
 
-        body = self.rfile.read(length)
+        if path == "/trade_events":
+            self._handle_trade_events()
+            return
+
+        # The body is left unread, so do not reuse this connection.
+        self.close_connection = True
+        self._send_json(404, {"status": "error", "message": "Not found"})
+
+    def _handle_trade_event(self) -> None:
+        body = self._read_body()
+        if body is None:
+            return
+
+        # Parsed once; the body itself is what gets stored as raw_json.
         try:
-            payload = json.loads(body.decode("utf-8"))
-        except json.JSONDecodeError as e:
+            with self.timer.phase("parse"):
+                payload = json_codec.loads(body)
+        except json_codec.DecodeError as e:
             self._send_json(400, {"status": "error", "message": f"Invalid JSON: {e}"})
             return
 
         # Validate TRADE_EVENT
         try:
-            validate_trade_event(payload)
+            with self.timer.phase("validate"):
+                numbers = validate_trade_event(payload)
         except TradeEventValidationError as e:
             self._send_json(400, {"status": "error", "message": f"Invalid TRADE_EVENT: {e}"})
             return
 
-        # Insert into DB
+        # Insert into DB (directly, or through the group-commit queue)
         try:
-            db.insert_trade_event(payload)
+            if self._ingest_writer() is not None:
+                statuses = self._store_events([payload], [numbers], [body])
+                if statuses[0] == "duplicate":
+                    raise ValueError("Event with this event_id already exists in database")
+            else:
+                with self.timer.phase("db"):
+                    db.insert_trade_event(payload, numbers, raw_event_json(body, payload))
+        except IngestBusy as e:
+            self._send_busy(str(e))
+            return
         except ValueError as e:
             self._send_json(400, {"status": "error", "message": str(e)})
             return
@@ -230,6 +1058,94 @@ class TrueedgeBackendHandler(BaseHTTPRequestHandler):
 
         self._send_json(200, {"status": "ok"})
 
+    def _handle_trade_events(self) -> None:
+        """
+        Bulk ingest: accepts a JSON array of TRADE_EVENTs or NDJSON (one event per line).
+
+        Every event gets its own result entry ("accepted", "duplicate" or "invalid");
+        a bad or duplicate event never fails the rest of the batch.
+        """
+        body = self._read_body()
+        if body is None:
+            return
+
+        try:
+            with self.timer.phase("parse"):
+                items = parse_batch_body(body)
+        except ValueError as e:
+            self._send_json(400, {"status": "error", "message": str(e)})
+            return
+
+        if len(items) > MAX_BATCH_EVENTS:
+            self._send_json(
+                413,
+                {
+                    "status": "error",
+                    "message": f"Batch too large: {len(items)} events (max {MAX_BATCH_EVENTS})",
+                },
+            )
+            return
+
+        results: List[Dict[str, Any]] = []
+        valid_events: List[Dict[str, Any]] = []
+        valid_numbers: List[tuple] = []
+        valid_raws: List[Optional[RawJson]] = []
+        valid_positions: List[int] = []
+
+        # Parse errors come first; everything that parsed is validated in one pass.
+        with self.timer.phase("validate"):
+            check_errors, check_numbers = validate_many(
+                [event for event, _, error in items if error is None]
+            )
+        checked = iter(zip(check_errors, check_numbers))
+
+        for index, (event, raw, error) in enumerate(items):
+            result: Dict[str, Any] = {"index": index}
+            if isinstance(event, dict):
+                result["event_id"] = event.get("event_id")
+            numbers = None
+            if error is None:
+                check_error, numbers = next(checked)
+                if check_error is not None:
+                    error = f"Invalid TRADE_EVENT: {check_error}"
+            if error is not None:
+                result["status"] = "invalid"
+                result["message"] = error
+            else:
+                valid_events.append(event)
+                valid_numbers.append(numbers)
+                valid_raws.append(raw)
+                valid_positions.append(index)
+            results.append(result)
+
+        try:
+            statuses = self._store_events(valid_events, valid_numbers, valid_raws)
+        except IngestBusy as e:
+            self._send_busy(str(e))
+            return
+        except Exception as e:
+            self._send_json(500, {"status": "error", "message": f"Internal error: {e}"})
+            return
+
+        for position, status in zip(valid_positions, statuses):
+            results[position]["status"] = status
+
+        counts = {"accepted": 0, "duplicate": 0, "invalid": 0}
+        for result in results:
+            counts[result["status"]] += 1
+
+        self._send_json(
+            200,
+            {
+                "status": "ok",
+                "total": len(results),
+                "accepted": counts["accepted"],
+                "duplicates": counts["duplicate"],
+                "invalid": counts["invalid"],
+                "results": results,
+            },
+        )
+
     # Reduce default noisy logging
     def log_message(self, format: str, *args) -> None:
         sys.stdout.write(
@@ -238,18 +1154,130 @@ class TrueedgeBackendHandler(BaseHTTPRequestHandler):
         )
 
 
-def main() -> None:
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="TRUEEDGE backend API server")
+    parser.add_argument("--host", default=DEFAULT_HOST, help="bind address")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="listen port")
+    parser.add_argument(
+        "--mode",
+        choices=["threaded", "pooled", "single"],
+        default=DEFAULT_MODE,
+        help="threaded: thread per connection (default); pooled: fixed worker pool, "
+        "idle keep-alive connections are closed while others wait; "
+        "single: one request at a time",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="worker threads in pooled mode (concurrent requests being served)",
+    )
+    parser.add_argument(
+        "--ingest-mode",
+        choices=["direct", "group"],
+        default="direct",
+        help="direct: one commit per request; group: write-behind queue with group commit",
+    )
+    parser.add_argument(
+        "--group-max-events",
+        type=int,
+        default=DEFAULT_MAX_BATCH_EVENTS,
+        help="group mode: commit once this many events are queued",
+    )
+    parser.add_argument(
+        "--group-max-wait-ms",
+        type=float,
+        default=DEFAULT_MAX_WAIT_MS,
+        help="group mode: commit at most this many ms after a group's first event",
+    )
+    parser.add_argument(
+        "--ingest-queue-size",
+        type=int,
+        default=DEFAULT_QUEUE_SIZE,
+        help="group mode: pending requests before POSTs get 503 Retry-After",
+    )
+    parser.add_argument(
+        "--synchronous",
+        choices=["OFF", "NORMAL", "FULL", "EXTRA"],
+        default=None,
+        help="SQLite synchronous PRAGMA (default: FULL, so an acknowledged "
+        "event survives power loss; NORMAL is faster but can lose the last "
+        "commits on power loss)",
+    )
+    parser.add_argument(
+        "--cache-entries",
+        type=int,
+        default=DEFAULT_MAX_ENTRIES,
+        help="responses kept in the /metrics/* and /report cache (0 disables it)",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=float,
+        default=DEFAULT_MAX_BYTES / (1024 * 1024),
+        help="upper bound on the cached response bodies, in MiB",
+    )
+    parser.add_argument(
+        "--no-stats",
+        action="store_true",
+        help="do not record request stats (GET /internal/stats returns 404)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.synchronous is not None:
+        db.configure(synchronous=args.synchronous)
     db.init_db()
-    server_address = ("127.0.0.1", 9000)
-    httpd = HTTPServer(server_address, TrueedgeBackendHandler)
-    print("TRUEEDGE backend API running on http://127.0.0.1:9000")
+    httpd = create_server(args.host, args.port, mode=args.mode, workers=args.workers)
+    if args.no_stats:
+        httpd.stats = None
+
+    ingest_writer = None
+    if args.ingest_mode == "group":
+        ingest_writer = GroupCommitWriter(
+            max_batch_events=args.group_max_events,
+            max_wait_ms=args.group_max_wait_ms,
+            queue_size=args.ingest_queue_size,
+        )
+        ingest_writer.start()
+        httpd.ingest_writer = ingest_writer
+
+    # Out-of-order inserts leave aggregate rows dirty; GETs never write, so
+    # they are replayed in the background.
+    aggregate_refresher = db.AggregateRefresher()
+    aggregate_refresher.start()
+
+    if args.cache_entries > 0:
+        httpd.response_cache = ResponseCache(
+            max_entries=args.cache_entries,
+            max_bytes=int(args.cache_max_mb * 1024 * 1024),
+        )
+
+    base_url = f"http://{args.host}:{args.port}"
+    if args.mode == "pooled":
+        print(f"TRUEEDGE backend API running on {base_url} (pooled, {args.workers} workers)")
+    else:
+        print(f"TRUEEDGE backend API running on {base_url} ({args.mode})")
+    if ingest_writer is not None:
+        print(
+            f"Ingest: group commit (max {args.group_max_events} events / "
+            f"{args.group_max_wait_ms:g} ms per group)"
+        )
+    if args.cache_entries > 0:
+        print(f"Response cache: {args.cache_entries} entries / {args.cache_max_mb:g} MiB (ETag, 304)")
     print("Endpoints:")
     print("  GET  /health")
     print("  POST /trade_event")
-    print("  GET  /metrics/overall?account_id=...&strategy_id=...")
-    print("  GET  /metrics/by_strategy?account_id=...")
-    print("  GET  /metrics/by_account?strategy_id=...")
-    print("  GET  /report?account_id=...&strategy_id=...")
+    print("  POST /trade_events   (JSON array or NDJSON body)")
+    print("  GET  /metrics/overall?account_id=...&strategy_id=...&from=...&to=...")
+    print("  GET  /metrics/by_strategy?account_id=...&from=...&to=...")
+    print("  GET  /metrics/by_account?strategy_id=...&from=...&to=...")
+    print("  GET  /report?account_id=...&strategy_id=...&from=...&to=...")
+    print("  GET  /events?account_id=...&strategy_id=...&symbol=...&from=...&to=...")
+    print("       &limit=...&cursor=...  (format=ndjson streams everything)")
+    if not args.no_stats:
+        print("  GET  /internal/stats?format=json|prometheus")
     print("Press Ctrl+C to stop.")
     try:
         httpd.serve_forever()
@@ -257,6 +1285,10 @@ def main() -> None:
         print("\nStopping TRUEEDGE backend API...")
     finally:
         httpd.server_close()
+        if ingest_writer is not None:
+            ingest_writer.stop()
+        aggregate_refresher.stop()
+        db.close_connections()
 
 
 if __name__ == "__main__":
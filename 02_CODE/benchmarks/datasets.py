@@ -0,0 +1,110 @@
+import random
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, List
+
+# Make sure we can import shared modules from local_logger
+ROOT_DIR = Path(__file__).resolve().parents[1]  # .../02_CODE
+LOCAL_LOGGER_DIR = ROOT_DIR / "local_logger"
+if str(LOCAL_LOGGER_DIR) not in sys.path:
+    sys.path.insert(0, str(LOCAL_LOGGER_DIR))
+
+import json_codec
+from simulate_trades import build_simulated_event
+
+# Generated datasets are cached here (one .jsonl per size / seed / shape).
+DATA_DIR = Path(__file__).resolve().parent / "data"
+
+DEFAULT_SEED = 42
+DEFAULT_ACCOUNTS = 50
+DEFAULT_STRATEGIES = 10
+
+# Fixed start time, so a dataset only depends on its parameters.
+BASE_TIME = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+_WRITE_BATCH_LINES = 10_000
+
+
+def dataset_path(
+    size: int,
+    seed: int = DEFAULT_SEED,
+    accounts: int = DEFAULT_ACCOUNTS,
+    strategies: int = DEFAULT_STRATEGIES,
+) -> Path:
+    return DATA_DIR / f"trades_n{size}_seed{seed}_a{accounts}_s{strategies}.jsonl"
+
+
+def build_event(index: int, accounts: int, strategies: int) -> dict:
+    """
+    simulate_trades.build_simulated_event, spread over accounts x strategies
+    (consecutive events go to different accounts; each account cycles
+    through the strategies).
+    """
+    event = build_simulated_event(index, BASE_TIME)
+    event["account_id"] = f"acc_bench_{index % accounts:04d}"
+    event["strategy_id"] = f"strat_bench_{(index // accounts) % strategies:03d}"
+    return event
+
+
+def ensure_dataset(
+    size: int,
+    seed: int = DEFAULT_SEED,
+    accounts: int = DEFAULT_ACCOUNTS,
+    strategies: int = DEFAULT_STRATEGIES,
+) -> Path:
+    """
+    Path of the dataset with these parameters, generating it first if it is
+    not cached yet. The same parameters always give the same file.
+    """
+    path = dataset_path(size, seed, accounts, strategies)
+    if path.exists():
+        return path
+
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    print(f"[INFO] Generating {size} events -> {path.name}")
+    # build_simulated_event draws from the module-level random generator.
+    random.seed(seed)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("w", encoding="utf-8", newline="\n") as f:
+        lines: List[str] = []
+        for index in range(size):
+            lines.append(json_codec.dumps(build_event(index, accounts, strategies)))
+            if len(lines) >= _WRITE_BATCH_LINES:
+                f.write("\n".join(lines) + "\n")
+                lines = []
+        if lines:
+            f.write("\n".join(lines) + "\n")
+    # Only a complete file gets the final name.
+    tmp_path.replace(path)
+    return path
+
+
+def iter_lines(path: Path, batch_lines: int = 1000) -> Iterator[List[bytes]]:
+    """
+    Yield the dataset's JSON lines (bytes, without newline) in batches.
+    """
+    batch: List[bytes] = []
+    with path.open("rb") as f:
+        for line in f:
+            line = line.rstrip(b"\r\n")
+            if not line:
+                continue
+            batch.append(line)
+            if len(batch) >= batch_lines:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def read_lines(path: Path, limit: int) -> List[bytes]:
+    """
+    The first limit JSON lines of a dataset.
+    """
+    lines: List[bytes] = []
+    for batch in iter_lines(path):
+        lines.extend(batch[: limit - len(lines)])
+        if len(lines) >= limit:
+            break
+    return lines
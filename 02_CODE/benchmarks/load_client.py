@@ -0,0 +1,369 @@
+import argparse
+import http.client
+import itertools
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+# Make sure we can import shared modules from local_logger
+ROOT_DIR = Path(__file__).resolve().parents[1]  # .../02_CODE
+LOCAL_LOGGER_DIR = ROOT_DIR / "local_logger"
+if str(LOCAL_LOGGER_DIR) not in sys.path:
+    sys.path.insert(0, str(LOCAL_LOGGER_DIR))
+
+import json_codec
+from http_compression import encode_request_body
+from instrumentation import LATENCY_BOUNDS, Histogram
+from simulate_trades import TradeSimulator
+
+DEFAULT_URL = "http://127.0.0.1:9000/trade_event"
+DEFAULT_CONNECTIONS = 8
+DEFAULT_REQUESTS = 10_000
+
+REPORT_PERCENTILES = (50, 90, 99, 99.9)
+
+# The text histogram groups LATENCY_BOUNDS four at a time (one row per
+# doubling of the latency).
+HISTOGRAM_ROW_BUCKETS = 4
+
+
+def build_bodies(
+    requests: int, batch_size: int, seed: int, accounts: int, gzip_bodies: bool
+) -> List[tuple]:
+    """
+    (body, headers, events) per request, generated before the run so the
+    client spends no time on it while measuring. Events come from
+    simulate_trades.TradeSimulator, so every event_id is new: batch_size 1
+    gives one JSON event per body, more gives NDJSON for /trade_events.
+    """
+    simulator = TradeSimulator(requests * batch_size, seed=seed, accounts=accounts)
+    events = simulator.events()
+    bodies = []
+    for _ in range(requests):
+        batch = list(itertools.islice(events, batch_size))
+        body = "\n".join(json_codec.dumps(event) for event in batch).encode("utf-8")
+        if gzip_bodies:
+            body, headers = encode_request_body(body)
+        else:
+            headers = {}
+        headers["Content-Type"] = "application/json" if batch_size == 1 else "application/x-ndjson"
+        bodies.append((body, headers, len(batch)))
+    return bodies
+
+
+def record_corrected(histogram: Histogram, value: float, expected_interval: float) -> None:
+    """
+    Record value, plus the samples a closed-loop client missed while it was
+    stuck waiting (HdrHistogram's recordValueWithExpectedInterval): for a
+    response that took longer than the expected interval, the requests that
+    should have been sent meanwhile would have waited value - interval,
+    value - 2 * interval, and so on.
+    """
+    histogram.observe(value)
+    if expected_interval <= 0:
+        return
+    missing = value - expected_interval
+    while missing >= expected_interval:
+        histogram.observe(missing)
+        missing -= expected_interval
+
+
+class LoadWorker(threading.Thread):
+    """
+    One keep-alive connection sending requests until the run is over.
+
+    - Closed loop (rate 0): the next request goes out as soon as the
+      previous response is read.
+    - Open loop (rate > 0): request k is due at start + k / rate, whichever
+      connection takes it. Latency is measured from that intended send
+      time, so time spent queued behind slow responses counts (no
+      coordinated omission); service_time is measured from the actual send.
+    """
+
+    def __init__(self, run: "LoadRun") -> None:
+        super().__init__(daemon=True)
+        self.run_state = run
+        self.latency = Histogram(LATENCY_BOUNDS)
+        self.service_time = Histogram(LATENCY_BOUNDS)
+        self.statuses: Dict[str, int] = {}
+        self.events = 0
+
+    def run(self) -> None:
+        state = self.run_state
+        conn = http.client.HTTPConnection(state.host, state.port, timeout=state.timeout)
+        try:
+            while True:
+                k = state.next_request()
+                if k is None:
+                    break
+                body, headers, events = state.bodies[k % len(state.bodies)]
+                intended = state.start + k / state.rate if state.rate > 0 else None
+                if intended is not None:
+                    delay = intended - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                sent = time.perf_counter()
+                try:
+                    conn.request(state.method, state.path, body, headers)
+                    resp = conn.getresponse()
+                    resp.read()
+                    status = str(resp.status)
+                except (OSError, http.client.HTTPException) as e:
+                    conn.close()  # reconnects on the next request
+                    status = type(e).__name__
+                done = time.perf_counter()
+
+                self.statuses[status] = self.statuses.get(status, 0) + 1
+                if status.startswith("2"):
+                    self.events += events
+                self.service_time.observe(done - sent)
+                if intended is not None:
+                    self.latency.observe(done - intended)
+                else:
+                    record_corrected(self.latency, done - sent, state.expected_interval)
+        finally:
+            conn.close()
+
+
+class LoadRun:
+    """
+    Shared state of a run: the target, the request counter and the deadline.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        bodies: List[tuple],
+        requests: int,
+        connections: int,
+        rate: float = 0.0,
+        duration: Optional[float] = None,
+        expected_interval: float = 0.0,
+        timeout: float = 30.0,
+    ) -> None:
+        parsed = urlparse(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self.path = parsed.path or "/"
+        if parsed.query:
+            self.path += "?" + parsed.query
+        self.method = "POST" if bodies else "GET"
+        self.bodies = bodies or [(None, {}, 0)]
+        self.requests = requests
+        self.connections = connections
+        self.rate = rate
+        self.duration = duration
+        self.expected_interval = expected_interval
+        self.timeout = timeout
+        self.start = 0.0
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def next_request(self) -> Optional[int]:
+        with self._lock:
+            k = next(self._counter)
+        if k >= self.requests:
+            return None
+        if self.duration is not None and time.perf_counter() - self.start >= self.duration:
+            return None
+        return k
+
+    def execute(self) -> Dict[str, Any]:
+        workers = [LoadWorker(self) for _ in range(self.connections)]
+        self.start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - self.start
+
+        latency = Histogram(LATENCY_BOUNDS)
+        service_time = Histogram(LATENCY_BOUNDS)
+        statuses: Dict[str, int] = {}
+        events = 0
+        for worker in workers:
+            latency.merge(worker.latency)
+            service_time.merge(worker.service_time)
+            for status, n in worker.statuses.items():
+                statuses[status] = statuses.get(status, 0) + n
+            events += worker.events
+        return {
+            "elapsed": elapsed,
+            "requests": service_time.count,
+            "statuses": statuses,
+            "events": events,
+            "latency": latency,
+            "service_time": service_time,
+        }
+
+
+def _percentiles_ms(histogram: Histogram) -> Dict[str, float]:
+    values = {f"p{p:g}": round(histogram.percentile(p) * 1000.0, 3) for p in REPORT_PERCENTILES}
+    values["max"] = round(histogram.max * 1000.0, 3)
+    if histogram.count:
+        values["mean"] = round(histogram.sum / histogram.count * 1000.0, 3)
+    return values
+
+
+def summarize(result: Dict[str, Any], args: argparse.Namespace) -> Dict[str, Any]:
+    elapsed = result["elapsed"]
+    ok = sum(n for status, n in result["statuses"].items() if status.startswith("2"))
+    latency: Histogram = result["latency"]
+    return {
+        "url": args.url,
+        "mode": "open-loop" if args.rate > 0 else "closed-loop",
+        "target_rate": args.rate or None,
+        "connections": args.connections,
+        "batch_size": args.batch_size,
+        "elapsed_s": round(elapsed, 3),
+        "requests": result["requests"],
+        "ok": ok,
+        "statuses": result["statuses"],
+        "requests_per_s": round(result["requests"] / elapsed, 1) if elapsed else 0.0,
+        "events_per_s": round(result["events"] / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": _percentiles_ms(latency),
+        "latency_corrected": args.rate > 0 or args.expected_interval_ms > 0,
+        "latency_samples": latency.count,
+        "service_time_ms": _percentiles_ms(result["service_time"]),
+    }
+
+
+def print_histogram(histogram: Histogram) -> None:
+    """
+    Text histogram of a latency Histogram, one row per doubling.
+    """
+    if not histogram.count:
+        return
+    rows = []
+    lower = 0.0
+    buckets = histogram.buckets
+    for start in range(0, len(buckets), HISTOGRAM_ROW_BUCKETS):
+        end = min(start + HISTOGRAM_ROW_BUCKETS, len(buckets))
+        n = sum(buckets[start:end])
+        upper = LATENCY_BOUNDS[end - 1] if end - 1 < len(LATENCY_BOUNDS) else float("inf")
+        rows.append((lower, upper, n))
+        lower = upper
+    used = [i for i, row in enumerate(rows) if row[2]]
+    widest = max(row[2] for row in rows)
+    for lower, upper, n in rows[used[0]: used[-1] + 1]:
+        bar = "#" * max(1 if n else 0, round(40 * n / widest))
+        print(
+            f"  {lower * 1000:>10.3f} - {upper * 1000:>10.3f} ms  {n:>9}  "
+            f"{n / histogram.count:>6.1%}  {bar}"
+        )
+
+
+def print_report(summary: Dict[str, Any], latency: Histogram) -> None:
+    rate = f" at {summary['target_rate']:g} req/s" if summary["target_rate"] else ""
+    print(
+        f"{summary['mode']}{rate}, {summary['connections']} connections, "
+        f"batch {summary['batch_size']} -> {summary['url']}"
+    )
+    print(
+        f"Requests: {summary['requests']} in {summary['elapsed_s']:.2f} s, "
+        f"{summary['ok']} ok, statuses {summary['statuses']}"
+    )
+    print(
+        f"Throughput: {summary['requests_per_s']:.1f} req/s, "
+        f"{summary['events_per_s']:.1f} events/s accepted"
+    )
+    columns = [f"p{p:g}" for p in REPORT_PERCENTILES] + ["max", "mean"]
+    print(f"  {'(ms)':<24}" + "".join(f"{name:>10}" for name in columns))
+    label = "latency (corrected)" if summary["latency_corrected"] else "latency"
+    rows = ((label, summary["latency_ms"]), ("service time", summary["service_time_ms"]))
+    for name, values in rows:
+        print(f"  {name:<24}" + "".join(f"{values.get(column, 0.0):>10.3f}" for column in columns))
+    print("Latency histogram:")
+    print_histogram(latency)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="TRUEEDGE load client: concurrent keep-alive connections, "
+        "open- or closed-loop, with a latency histogram"
+    )
+    parser.add_argument("--url", default=DEFAULT_URL, help="target URL (default: %(default)s)")
+    parser.add_argument("--connections", "-c", type=int, default=DEFAULT_CONNECTIONS)
+    parser.add_argument(
+        "--requests",
+        "-n",
+        type=int,
+        help=f"requests to send in total (default {DEFAULT_REQUESTS}, "
+        "or unlimited with --duration)",
+    )
+    parser.add_argument(
+        "--duration",
+        "-d",
+        type=float,
+        help=f"stop after this many seconds; without --requests, {DEFAULT_REQUESTS} "
+        "bodies are generated and sent round-robin (repeats are duplicates to the server)",
+    )
+    parser.add_argument(
+        "--rate",
+        "-r",
+        type=float,
+        default=0.0,
+        help="open loop: requests per second across all connections "
+        "(default 0: closed loop, as fast as the server answers)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="events per request: 1 = one JSON event (/trade_event), "
+        "more = NDJSON (/trade_events); 0 = GET without a body",
+    )
+    parser.add_argument(
+        "--expected-interval-ms",
+        type=float,
+        default=0.0,
+        help="closed loop: correct for coordinated omission assuming one request "
+        "per connection every this many ms",
+    )
+    parser.add_argument("--gzip", action="store_true", help="send bodies >= 512 bytes gzipped")
+    parser.add_argument("--seed", type=int, default=1, help="simulator seed for the events")
+    parser.add_argument("--accounts", type=int, default=100, help="simulated accounts")
+    parser.add_argument("--timeout", type=float, default=30.0, help="socket timeout in seconds")
+    parser.add_argument("--json", help="also write the summary to this JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.connections < 1 or (args.requests or 1) < 1 or args.batch_size < 0:
+        raise SystemExit("--connections and --requests must be >= 1, --batch-size >= 0")
+    body_count = args.requests or DEFAULT_REQUESTS
+    if args.requests:
+        requests = args.requests
+    else:
+        requests = sys.maxsize if args.duration else DEFAULT_REQUESTS
+
+    bodies: List[tuple] = []
+    if args.batch_size > 0:
+        print(f"[INFO] Generating {body_count} request bodies ({args.batch_size} events each)...")
+        bodies = build_bodies(body_count, args.batch_size, args.seed, args.accounts, args.gzip)
+
+    run = LoadRun(
+        args.url,
+        bodies,
+        requests,
+        args.connections,
+        rate=args.rate,
+        duration=args.duration,
+        expected_interval=args.expected_interval_ms / 1000.0,
+        timeout=args.timeout,
+    )
+    result = run.execute()
+    summary = summarize(result, args)
+    print_report(summary, result["latency"])
+    if args.json:
+        Path(args.json).write_text(json.dumps(summary, indent=2), encoding="utf-8")
+        print(f"[INFO] Summary written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
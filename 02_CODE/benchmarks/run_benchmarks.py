@@ -0,0 +1,569 @@
+import argparse
+import http.client
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows: no peak RSS
+    resource = None
+
+# Make sure we can import the local_logger and api_backend modules
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT_DIR = BENCH_DIR.parent  # .../02_CODE
+for module_dir in (ROOT_DIR / "local_logger", ROOT_DIR / "api_backend"):
+    if str(module_dir) not in sys.path:
+        sys.path.insert(0, str(module_dir))
+
+import datasets
+import json_codec
+
+SUITES = ("logger", "logger_service", "metrics", "backend")
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+
+# Events sent one request at a time by the ingest benchmarks (capped by the
+# dataset size); the backend suite then bulk-loads the rest of the dataset.
+DEFAULT_INGEST_EVENTS = 2_000
+DEFAULT_REPEAT = 5
+
+# compare: a metric more than this much worse than the baseline is a regression.
+DEFAULT_THRESHOLD = 0.10
+
+RESULTS_DIR = BENCH_DIR / "results"
+
+BULK_BATCH_EVENTS = 1_000
+
+# GET endpoints timed by the backend suite. The windowed query takes the SQL
+# path instead of the trade_aggregates table.
+BACKEND_GET_PATHS = (
+    ("metrics_overall", "/metrics/overall"),
+    ("metrics_by_strategy", "/metrics/by_strategy"),
+    ("metrics_by_account", "/metrics/by_account"),
+    ("report", "/report"),
+    ("metrics_overall_window", "/metrics/overall?from=2020-01-01&to=2020-07-01"),
+)
+
+
+# ----------------------------------------------------------------------
+# Measurement helpers
+# ----------------------------------------------------------------------
+
+def _percentile(sorted_values: List[float], p: float) -> float:
+    # Nearest-rank percentile.
+    index = max(0, math.ceil(p / 100.0 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def latency_summary(name: str, samples: List[float]) -> Dict[str, float]:
+    """
+    p50/p95/p99/max in milliseconds of per-request times in seconds.
+    """
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    result = {}
+    for p in (50, 95, 99):
+        result[f"{name}_p{p}_ms"] = _percentile(ordered, p) * 1000.0
+    result[f"{name}_max_ms"] = ordered[-1] * 1000.0
+    return result
+
+
+def timed(fn: Callable[[], Any], repeat: int) -> Tuple[float, Any]:
+    """
+    Median wall time in seconds of repeat calls of fn, and the last result.
+    """
+    times = []
+    result = None
+    for _ in range(max(1, repeat)):
+        result = None  # let the previous result go before the next run
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and in bytes on macOS.
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _serve_in_thread(httpd) -> threading.Thread:
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    return thread
+
+
+# ----------------------------------------------------------------------
+# Suites (each one runs in its own process, see run_case)
+# ----------------------------------------------------------------------
+
+def bench_logger(
+    dataset: Path, size: int, args: argparse.Namespace, work_dir: Path
+) -> Dict[str, float]:
+    """
+    logger.append_trade_event: one validated, deduplicated, unbuffered
+    append per event (the default writer).
+    """
+    import logger
+
+    logger.LOG_FILE = work_dir / "trades_log.jsonl"
+    events = [json_codec.loads(line) for line in datasets.read_lines(dataset, args.ingest_events)]
+
+    samples = []
+    start = time.perf_counter()
+    for event in events:
+        t0 = time.perf_counter()
+        logger.append_trade_event(event)
+        samples.append(time.perf_counter() - t0)
+    total = time.perf_counter() - start
+    logger.default_writer().close()
+
+    return {
+        "append_trade_event_events_per_s": len(events) / total,
+        **latency_summary("append_trade_event", samples),
+    }
+
+
+def bench_logger_service(
+    dataset: Path, size: int, args: argparse.Namespace, work_dir: Path
+) -> Dict[str, float]:
+    """
+    POST /trade_event to logger_service, one event per request (the service
+    speaks HTTP/1.0, so one connection per request too).
+    """
+    from http.server import HTTPServer
+
+    import logger
+    import logger_service
+
+    httpd = HTTPServer(("127.0.0.1", 0), logger_service.TradeEventHandler)
+    httpd.writer = logger.TradeLogWriter(work_dir / "trades_log.jsonl")
+    _serve_in_thread(httpd)
+    host, port = httpd.server_address[:2]
+    bodies = datasets.read_lines(dataset, args.ingest_events)
+
+    samples = []
+    start = time.perf_counter()
+    try:
+        for body in bodies:
+            t0 = time.perf_counter()
+            conn = http.client.HTTPConnection(host, port)
+            conn.request("POST", "/trade_event", body, {"Content-Type": "application/json"})
+            resp = conn.getresponse()
+            resp.read()
+            conn.close()
+            samples.append(time.perf_counter() - t0)
+            if resp.status != 200:
+                raise RuntimeError(f"POST /trade_event returned {resp.status}")
+        total = time.perf_counter() - start
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+        httpd.writer.close()
+
+    return {
+        "service_trade_event_events_per_s": len(bodies) / total,
+        **latency_summary("service_trade_event", samples),
+    }
+
+
+def bench_metrics(
+    dataset: Path, size: int, args: argparse.Namespace, work_dir: Path
+) -> Dict[str, float]:
+    """
+    metrics_core over the whole dataset: load_events, compute_metrics,
+    group_by_key and compute_grouped_metrics (median of --repeat runs).
+    """
+    from metrics_core import compute_grouped_metrics, compute_metrics, group_by_key, load_events
+
+    load_s, events = timed(lambda: load_events(dataset), args.repeat)
+    metrics_s, _ = timed(lambda: compute_metrics(events), args.repeat)
+    by_strategy_s, _ = timed(lambda: group_by_key(events, "strategy_id"), args.repeat)
+    by_account_s, _ = timed(lambda: group_by_key(events, "account_id"), args.repeat)
+    grouped_s, _ = timed(lambda: compute_grouped_metrics(events), args.repeat)
+
+    return {
+        "load_events_ms": load_s * 1000.0,
+        "load_events_events_per_s": len(events) / load_s,
+        "compute_metrics_ms": metrics_s * 1000.0,
+        "group_by_strategy_ms": by_strategy_s * 1000.0,
+        "group_by_account_ms": by_account_s * 1000.0,
+        "compute_grouped_metrics_ms": grouped_s * 1000.0,
+    }
+
+
+def bench_backend(
+    dataset: Path, size: int, args: argparse.Namespace, work_dir: Path
+) -> Dict[str, float]:
+    """
+    Backend server over HTTP (one keep-alive connection):
+    - POST /trade_event, one event per request,
+    - POST /trade_events with the rest of the dataset (NDJSON batches),
+    - GET /metrics/* and /report with the response cache off, then on.
+    """
+    import db
+    import server
+    from response_cache import ResponseCache
+
+    db.configure(db_path=work_dir / "trueedge_bench.db")
+    db.init_db()
+    httpd = server.create_server("127.0.0.1", 0, mode="pooled")
+    _serve_in_thread(httpd)
+    host, port = httpd.server_address[:2]
+    conn = http.client.HTTPConnection(host, port)
+
+    def request(method: str, path: str, body: Optional[bytes] = None) -> int:
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        conn.request(method, path, body, headers)
+        resp = conn.getresponse()
+        resp.read()
+        if resp.status != 200:
+            raise RuntimeError(f"{method} {path} returned {resp.status}")
+        return resp.status
+
+    result: Dict[str, float] = {}
+    try:
+        single = datasets.read_lines(dataset, args.ingest_events)
+        samples = []
+        start = time.perf_counter()
+        for body in single:
+            t0 = time.perf_counter()
+            request("POST", "/trade_event", body)
+            samples.append(time.perf_counter() - t0)
+        result["trade_event_events_per_s"] = len(single) / (time.perf_counter() - start)
+        result.update(latency_summary("trade_event", samples))
+
+        bulk_events = 0
+        skip = len(single)
+        start = time.perf_counter()
+        for batch in datasets.iter_lines(dataset, BULK_BATCH_EVENTS):
+            if skip:
+                dropped = min(skip, len(batch))
+                batch = batch[dropped:]
+                skip -= dropped
+                if not batch:
+                    continue
+            request("POST", "/trade_events", b"\n".join(batch))
+            bulk_events += len(batch)
+        if bulk_events:
+            result["trade_events_bulk_events_per_s"] = bulk_events / (time.perf_counter() - start)
+
+        for cached in (False, True):
+            httpd.response_cache = ResponseCache() if cached else None
+            suffix = "_cached" if cached else ""
+            for name, path in BACKEND_GET_PATHS:
+                if cached:
+                    request("GET", path)  # fill the cache
+                seconds, _ = timed(lambda: request("GET", path), args.repeat)
+                result[f"get_{name}{suffix}_ms"] = seconds * 1000.0
+    finally:
+        conn.close()
+        httpd.shutdown()
+        httpd.server_close()
+        db.close_connections()
+    return result
+
+
+SUITE_FUNCTIONS = {
+    "logger": bench_logger,
+    "logger_service": bench_logger_service,
+    "metrics": bench_metrics,
+    "backend": bench_backend,
+}
+
+
+# ----------------------------------------------------------------------
+# Running
+# ----------------------------------------------------------------------
+
+def run_case(suite: str, size: int, dataset: Path, args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Run one suite at one size in a fresh interpreter, so peak RSS and
+    module-level state (connection pools, default writers) are per case.
+    """
+    with tempfile.TemporaryDirectory(prefix="trueedge_bench_") as tmp:
+        result_file = Path(tmp) / "result.json"
+        cmd = [
+            sys.executable,
+            str(Path(__file__).resolve()),
+            "case",
+            "--suite", suite,
+            "--size", str(size),
+            "--dataset", str(dataset),
+            "--ingest-events", str(args.ingest_events),
+            "--repeat", str(args.repeat),
+            "--result-file", str(result_file),
+        ]
+        # Output is captured (the backend logs every request) and only shown on failure.
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0 or not result_file.exists():
+            error = (proc.stderr.strip().splitlines() or ["no output"])[-1]
+            print(f"[WARN] {suite} n={size} failed: {error}")
+            return {"suite": suite, "size": size, "error": error}
+        return json.loads(result_file.read_text(encoding="utf-8"))
+
+
+def run_case_in_process(args: argparse.Namespace) -> None:
+    """
+    The "case" command run by run_case: one suite, result written as JSON.
+    """
+    size = args.size
+    with tempfile.TemporaryDirectory(prefix="trueedge_bench_") as tmp:
+        args.ingest_events = min(args.ingest_events, size)
+        start = time.perf_counter()
+        metrics = SUITE_FUNCTIONS[args.suite](Path(args.dataset), size, args, Path(tmp))
+        elapsed = time.perf_counter() - start
+    rss = peak_rss_mb()
+    if rss is not None:
+        metrics["peak_rss_mb"] = rss
+    result = {
+        "suite": args.suite,
+        "size": size,
+        "elapsed_s": round(elapsed, 3),
+        "metrics": {name: round(value, 4) for name, value in metrics.items()},
+    }
+    Path(args.result_file).write_text(json.dumps(result, indent=2), encoding="utf-8")
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        proc = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT_DIR, capture_output=True, text=True, timeout=10,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return proc.stdout.strip() or None
+
+
+def environment_info(args: argparse.Namespace) -> Dict[str, Any]:
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "json_codec": json_codec.CODEC,
+        "numpy": numpy_version,
+        "seed": args.seed,
+        "accounts": args.accounts,
+        "strategies": args.strategies,
+        "ingest_events": args.ingest_events,
+        "repeat": args.repeat,
+    }
+
+
+def run(args: argparse.Namespace) -> int:
+    results = []
+    for size in args.sizes:
+        dataset = datasets.ensure_dataset(size, args.seed, args.accounts, args.strategies)
+        for suite in args.suites:
+            result = run_case(suite, size, dataset, args)
+            results.append(result)
+            if "metrics" in result:
+                rss = result["metrics"].get("peak_rss_mb")
+                rss_text = f", peak RSS {rss:.0f} MB" if rss is not None else ""
+                print(f"[INFO] {suite} n={size}: {result['elapsed_s']:.1f} s{rss_text}")
+
+    report = {"environment": environment_info(args), "results": results}
+    output = Path(args.output) if args.output else (
+        RESULTS_DIR / f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"[INFO] Results written to {output}")
+    print_results(report)
+
+    failed = any("error" in result for result in results)
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        if compare_reports(baseline, report, args.threshold):
+            return 1
+    return 1 if failed else 0
+
+
+# ----------------------------------------------------------------------
+# Reporting and comparison
+# ----------------------------------------------------------------------
+
+def higher_is_better(metric: str) -> bool:
+    # Throughputs end in _per_s; everything else (ms, MB) is better lower.
+    return metric.endswith("_per_s")
+
+
+def flatten(report: Dict[str, Any]) -> Dict[str, float]:
+    """
+    {"suite/size/metric": value} for every measured metric of a report.
+    """
+    values = {}
+    for result in report.get("results", []):
+        for name, value in result.get("metrics", {}).items():
+            values[f"{result['suite']}/{result['size']}/{name}"] = value
+    return values
+
+
+def print_results(report: Dict[str, Any]) -> None:
+    for key, value in flatten(report).items():
+        print(f"  {key:<60} {value:>14.4g}")
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> int:
+    """
+    Print current vs baseline per metric and return the number of
+    regressions (worse by more than threshold, as a fraction).
+    """
+    old = flatten(baseline)
+    new = flatten(current)
+    regressions = 0
+    print(f"Comparison against baseline ({baseline.get('environment', {}).get('git_commit')}), "
+          f"threshold {threshold:.0%}:")
+    for key in sorted(set(old) & set(new)):
+        before, after = old[key], new[key]
+        change = (after - before) / before if before else 0.0
+        worse = -change if higher_is_better(key) else change
+        flag = ""
+        if worse > threshold:
+            flag = "REGRESSION"
+            regressions += 1
+        elif worse < -threshold:
+            flag = "improved"
+        print(f"  {key:<60} {before:>12.4g} {after:>12.4g} {change:>+8.1%}  {flag}")
+    missing = set(old) - set(new)
+    if missing:
+        print(f"  ({len(missing)} baseline metric(s) not measured in this run)")
+    if regressions:
+        print(f"[WARN] {regressions} metric(s) regressed by more than {threshold:.0%}")
+    else:
+        print("OK: no regressions.")
+    return regressions
+
+
+def compare(args: argparse.Namespace) -> int:
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+    current = json.loads(Path(args.current).read_text(encoding="utf-8"))
+    return 1 if compare_reports(baseline, current, args.threshold) else 0
+
+
+# ----------------------------------------------------------------------
+# Command line
+# ----------------------------------------------------------------------
+
+def _sizes(value: str) -> List[int]:
+    # "1e3,10000,1e5" -> [1000, 10000, 100000]
+    try:
+        sizes = [int(float(part)) for part in value.split(",") if part.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid sizes: {value!r}")
+    if not sizes or min(sizes) <= 0:
+        raise argparse.ArgumentTypeError(f"Invalid sizes: {value!r}")
+    return sizes
+
+
+def _suites(value: str) -> List[str]:
+    suites = [part.strip() for part in value.split(",") if part.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown or not suites:
+        raise argparse.ArgumentTypeError(
+            f"Unknown suites {sorted(unknown)}. Expected some of {SUITES}"
+        )
+    return suites
+
+
+def _add_dataset_args(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--sizes",
+        type=_sizes,
+        default=list(DEFAULT_SIZES),
+        help="comma-separated dataset sizes, e.g. 1e3,1e4,1e5 (default: %(default)s)",
+    )
+    parser.add_argument("--seed", type=int, default=datasets.DEFAULT_SEED)
+    parser.add_argument("--accounts", type=int, default=datasets.DEFAULT_ACCOUNTS)
+    parser.add_argument("--strategies", type=int, default=datasets.DEFAULT_STRATEGIES)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="TRUEEDGE benchmark suite")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate = commands.add_parser("generate", help="generate (and cache) the datasets only")
+    _add_dataset_args(generate)
+
+    run_parser = commands.add_parser("run", help="run benchmarks and write a JSON report")
+    _add_dataset_args(run_parser)
+    run_parser.add_argument(
+        "--suites",
+        type=_suites,
+        default=list(SUITES),
+        help=f"comma-separated subset of {','.join(SUITES)}",
+    )
+    run_parser.add_argument(
+        "--ingest-events",
+        type=int,
+        default=DEFAULT_INGEST_EVENTS,
+        help="events sent one per request by the ingest benchmarks",
+    )
+    run_parser.add_argument(
+        "--repeat", type=int, default=DEFAULT_REPEAT, help="runs per latency measurement (median)"
+    )
+    run_parser.add_argument("--output", help="report path (default: results/bench_<time>.json)")
+    run_parser.add_argument("--baseline", help="compare against this report; exit 1 on regression")
+    run_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    compare_parser = commands.add_parser("compare", help="compare two JSON reports")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="relative change counted as a regression (default: %(default)s)",
+    )
+
+    # Internal: one suite at one size (started by run_case).
+    case = commands.add_parser("case")
+    case.add_argument("--suite", choices=SUITES, required=True)
+    case.add_argument("--size", type=int, required=True)
+    case.add_argument("--dataset", required=True)
+    case.add_argument("--ingest-events", type=int, default=DEFAULT_INGEST_EVENTS)
+    case.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    case.add_argument("--result-file", required=True)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.command == "generate":
+        for size in args.sizes:
+            path = datasets.ensure_dataset(size, args.seed, args.accounts, args.strategies)
+            print(f"[INFO] {path}")
+        return
+    if args.command == "case":
+        run_case_in_process(args)
+        return
+    if args.command == "compare":
+        sys.exit(compare(args))
+    sys.exit(run(args))
+
+
+if __name__ == "__main__":
+    main()
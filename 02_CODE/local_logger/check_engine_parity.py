@@ -0,0 +1,128 @@
+import argparse
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+import metrics_core
+from metrics_core import compute_grouped_metrics, compute_metrics
+
+# Metrics are rounded to cents (build_metrics), and a different summation
+# order can move a value across a rounding boundary: allow one cent.
+METRIC_TOLERANCE = 0.01
+
+DEFAULT_SEED = 11
+DEFAULT_EVENTS = 5000
+BASE_TIME = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+def build_random_events(num_events: int, seed: int) -> List[Dict[str, Any]]:
+    """
+    Seeded events in no particular time order: many timestamp ties, UTC
+    offsets, zero / negative / tiny pnl, a missing group value and a group
+    with a single trade.
+    """
+    rng = random.Random(seed)
+    events: List[Dict[str, Any]] = []
+    for index in range(num_events):
+        ts = BASE_TIME + timedelta(seconds=rng.randint(0, 86400 * 5) // 30 * 30)
+        if rng.random() < 0.1:
+            timestamp = ts.astimezone(timezone(timedelta(hours=2))).isoformat()
+        else:
+            timestamp = ts.isoformat().replace("+00:00", "Z")
+        events.append(
+            {
+                "event_id": f"evt_engine_{index:06d}",
+                "account_id": f"acc_{rng.randint(0, 6)}",
+                "strategy_id": f"strat_{rng.randint(0, 12)}",
+                "timestamp": timestamp,
+                "pnl": rng.choice([0.0, round(rng.gauss(0.0, 40.0), 2), rng.uniform(-1e-6, 1e-6)]),
+            }
+        )
+    if events:
+        del events[0]["account_id"]  # grouped as "<UNKNOWN>"
+        events[-1]["strategy_id"] = "strat_single"
+    return events
+
+
+def _close(expected: Any, actual: Any) -> bool:
+    if isinstance(expected, float) or isinstance(actual, float):
+        return abs(float(expected) - float(actual)) <= METRIC_TOLERANCE + 1e-9
+    return expected == actual
+
+
+def compare(label: str, expected: dict, actual: dict) -> bool:
+    """
+    Print and return whether two metrics dicts agree (floats within
+    METRIC_TOLERANCE, everything else exactly).
+    """
+    if expected.keys() == actual.keys() and all(_close(expected[k], actual[k]) for k in expected):
+        return True
+    print(f"[MISMATCH] {label}")
+    print(f"  python: {expected}")
+    print(f"  numpy : {actual}")
+    return False
+
+
+def check_parity(events: List[Dict[str, Any]]) -> bool:
+    """
+    Compare the pure-Python engine with the NumPy engine on the single-curve
+    path (compute_metrics) and the grouped path (compute_grouped_metrics),
+    including the order the groups are reported in.
+    """
+    ok = compare(
+        "compute_metrics",
+        compute_metrics(events, engine="python"),
+        compute_metrics(events, engine="numpy"),
+    )
+    group_keys = metrics_core.DEFAULT_GROUP_KEYS
+    expected = compute_grouped_metrics(events, group_keys, engine="python")
+    actual = compute_grouped_metrics(events, group_keys, engine="numpy")
+    ok &= compare("grouped overall", expected["overall"], actual["overall"])
+    for key_name in group_keys:
+        if list(expected["groups"][key_name]) != list(actual["groups"][key_name]):
+            print(f"[MISMATCH] {key_name}: groups or their order differ")
+            ok = False
+            continue
+        for value, metrics in expected["groups"][key_name].items():
+            ok &= compare(f"{key_name} = {value}", metrics, actual["groups"][key_name][value])
+    return ok
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Check that the NumPy and pure-Python metrics engines agree"
+    )
+    parser.add_argument("--events", type=int, default=DEFAULT_EVENTS, help="events per run")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="first seed")
+    parser.add_argument("--runs", type=int, default=5, help="seeds to try (seed, seed + 1, ...)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    Engine parity check for metrics_core.
+
+    For several seeds (and sizes from empty to --events), computes overall
+    and grouped metrics with engine="python" and engine="numpy" and reports
+    any difference. Exits with status 1 on mismatch. Without NumPy only the
+    pure-Python engine exists, so there is nothing to compare.
+    """
+    args = parse_args(argv)
+    if metrics_core.np is None:
+        print("[INFO] NumPy is not installed: only the pure-Python engine is available.")
+        return
+
+    ok = True
+    sizes = [0, 1, 2, 17, args.events]
+    for run in range(args.runs):
+        seed = args.seed + run
+        for size in sizes:
+            ok &= check_parity(build_random_events(size, seed))
+    if not ok:
+        sys.exit(1)
+    print(f"OK: engines agree ({args.runs} seeds x sizes {sizes}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,510 @@
+import argparse
+import json
+import math
+import mmap
+import os
+import sqlite3
+import sys
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from metrics_core import (
+    DEFAULT_GROUP_KEYS,
+    LOG_BLOCK_EVENTS,
+    TIMESTAMP_MIN_US,
+    GroupedMetricsAggregator,
+    LogCheckpoint,
+    compute_grouped_metrics,
+    compute_grouped_metrics_columns,
+    format_timestamp_us,
+    group_value,
+    keys_are_sorted,
+    np,
+    parse_timestamp_us,
+    sort_events,
+    timestamp_keys,
+    use_numpy_engine,
+)
+
+
+DATA_DIR = Path(__file__).resolve().parent / "data"
+LOG_FILE = DATA_DIR / "trades_log.jsonl"
+
+SNAPSHOT_MAGIC = b"TESNAP01"
+SNAPSHOT_VERSION = 1
+
+# Fixed-width columns: (name, array typecode). Rows are stored in time order.
+NUMERIC_COLUMNS = (
+    ("timestamp_us", "q"),
+    ("pnl", "d"),
+    ("fees", "d"),
+    ("quantity", "d"),
+    ("price_open", "d"),
+    ("price_close", "d"),
+)
+
+# Dictionary-encoded string columns: uint32 codes into a per-column value list.
+DICTIONARY_COLUMNS = ("account_id", "strategy_id", "symbol", "venue")
+CODE_TYPECODE = "I"
+
+_ALIGN = 8
+
+
+def snapshot_path_for(log_path: Path) -> Path:
+    """
+    Snapshot kept next to the log: trades_log.jsonl -> trades_log.jsonl.snap
+    """
+    return log_path.with_name(log_path.name + ".snap")
+
+
+def _padding(size: int) -> bytes:
+    return b"\0" * (-size % _ALIGN)
+
+
+def _to_float(value: Any) -> float:
+    """
+    Numeric column value; missing or non-numeric values are stored as NaN.
+    """
+    if value is None:
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+class SnapshotBuilder:
+    """
+    Collects rows into typed arrays (no per-event dicts are kept) and writes
+    them as a snapshot file in time order.
+    """
+
+    def __init__(self) -> None:
+        self.columns: Dict[str, array] = {
+            name: array(typecode) for name, typecode in NUMERIC_COLUMNS
+        }
+        for name in DICTIONARY_COLUMNS:
+            self.columns[name] = array(CODE_TYPECODE)
+        self.dictionaries: Dict[str, List[Optional[str]]] = {
+            name: [] for name in DICTIONARY_COLUMNS
+        }
+        self._codes: Dict[str, Dict[Optional[str], int]] = {
+            name: {} for name in DICTIONARY_COLUMNS
+        }
+
+    def __len__(self) -> int:
+        return len(self.columns["timestamp_us"])
+
+    def _encode(self, name: str, values: Iterable[Any]) -> List[int]:
+        codes = self._codes[name]
+        dictionary = self.dictionaries[name]
+        encoded = []
+        for value in values:
+            if value is not None:
+                value = str(value)
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(dictionary)
+                dictionary.append(value)
+            encoded.append(code)
+        return encoded
+
+    def add_columns(
+        self,
+        timestamps_us: List[int],
+        pnl: List[float],
+        numbers: Dict[str, List[Any]],
+        strings: Dict[str, List[Any]],
+    ) -> None:
+        """
+        Append a block of rows given column-wise. numbers: fees, quantity,
+        price_open, price_close; strings: DICTIONARY_COLUMNS (None = missing).
+        """
+        columns = self.columns
+        columns["timestamp_us"].extend(timestamps_us)
+        columns["pnl"].extend(pnl)
+        for name, _ in NUMERIC_COLUMNS[2:]:
+            columns[name].extend([_to_float(value) for value in numbers[name]])
+        for name in DICTIONARY_COLUMNS:
+            columns[name].extend(self._encode(name, strings[name]))
+
+    def add_events(self, events: List[Dict[str, Any]]) -> None:
+        self.add_columns(
+            timestamp_keys(events),
+            [float(ev.get("pnl", 0.0)) for ev in events],
+            {name: [ev.get(name) for ev in events] for name, _ in NUMERIC_COLUMNS[2:]},
+            {name: [ev.get(name) for ev in events] for name in DICTIONARY_COLUMNS},
+        )
+
+    def write(self, path: Path, source: Dict[str, Any]) -> None:
+        """
+        Write atomically (temp file + rename). Layout: magic, u64 header
+        length, JSON header, then each column's raw array, 8-byte aligned.
+        """
+        timestamps = self.columns["timestamp_us"]
+        if not keys_are_sorted(timestamps):
+            order = sorted(range(len(timestamps)), key=timestamps.__getitem__)
+            for name, column in self.columns.items():
+                self.columns[name] = array(column.typecode, (column[i] for i in order))
+
+        layout: Dict[str, Dict[str, Any]] = {}
+        position = 0
+        for name, column in self.columns.items():
+            size = len(column) * column.itemsize
+            layout[name] = {
+                "type": column.typecode,
+                "itemsize": column.itemsize,
+                "offset": position,
+            }
+            position += size + len(_padding(size))
+
+        header = json.dumps(
+            {
+                "version": SNAPSHOT_VERSION,
+                "rows": len(self),
+                "byteorder": sys.byteorder,
+                "columns": layout,
+                "dictionaries": self.dictionaries,
+                "source": source,
+            }
+        ).encode("utf-8")
+
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("wb") as f:
+            f.write(SNAPSHOT_MAGIC)
+            f.write(len(header).to_bytes(8, "little"))
+            f.write(header + _padding(len(header)))
+            for column in self.columns.values():
+                data = column.tobytes()
+                f.write(data + _padding(len(data)))
+        os.replace(tmp_path, path)
+
+
+class TradeSnapshot:
+    """
+    Read-only, memory-mapped columnar snapshot.
+
+    column() returns zero-copy memoryviews over the mapped file (array()
+    NumPy views when NumPy is installed); values() decodes a dictionary
+    column. Views must not be used after close().
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._file = self.path.open("rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            self._file.close()
+            raise ValueError(f"Not a trade snapshot: {self.path}")
+        self._views: List[memoryview] = []
+        try:
+            self._read_header()
+        except Exception:
+            self.close()
+            raise
+
+    def __enter__(self) -> "TradeSnapshot":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _read_header(self) -> None:
+        magic_size = len(SNAPSHOT_MAGIC)
+        if self._map[:magic_size] != SNAPSHOT_MAGIC:
+            raise ValueError(f"Not a trade snapshot: {self.path}")
+        header_size = int.from_bytes(self._map[magic_size:magic_size + 8], "little")
+        header_start = magic_size + 8
+        header = json.loads(self._map[header_start:header_start + header_size])
+        if header.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version in {self.path}")
+        if header["byteorder"] != sys.byteorder:
+            raise ValueError(f"Snapshot {self.path} was written with another byte order")
+        for name, info in header["columns"].items():
+            if array(info["type"]).itemsize != info["itemsize"]:
+                raise ValueError(f"Snapshot column {name} has an unsupported item size")
+
+        self.rows: int = header["rows"]
+        self.source: Dict[str, Any] = header["source"]
+        self.dictionaries: Dict[str, List[Optional[str]]] = header["dictionaries"]
+        self._columns: Dict[str, Dict[str, Any]] = header["columns"]
+        data_start = header_start + header_size + len(_padding(header_size))
+        for info in self._columns.values():
+            info["offset"] += data_start
+
+    def close(self) -> None:
+        for view in self._views:
+            view.release()
+        self._views = []
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def column(self, name: str) -> memoryview:
+        """
+        Zero-copy view of a column: numbers, or codes for dictionary columns.
+        """
+        info = self._columns[name]
+        start = info["offset"]
+        view = memoryview(self._map)[start:start + self.rows * info["itemsize"]].cast(info["type"])
+        self._views.append(view)
+        return view
+
+    def array(self, name: str):
+        """
+        Zero-copy NumPy array over a column (requires NumPy).
+        """
+        info = self._columns[name]
+        return np.frombuffer(
+            self._map, dtype=np.dtype(info["type"]), count=self.rows, offset=info["offset"]
+        )
+
+    def values(self, name: str) -> List[Optional[str]]:
+        """
+        Decoded values of a dictionary column (None = missing in the source).
+        """
+        dictionary = self.dictionaries[name]
+        return [dictionary[code] for code in self.column(name)]
+
+    def fold_into(self, aggregator: GroupedMetricsAggregator) -> None:
+        """
+        Add every row, in time order, to a GroupedMetricsAggregator whose
+        group_keys are dictionary columns.
+        """
+        group_values = [
+            [group_value(value) for value in self.dictionaries[key_name]]
+            for key_name in aggregator.group_keys
+        ]
+        code_columns = [self.column(key_name) for key_name in aggregator.group_keys]
+        add_values = aggregator.add_values
+        for pnl, *codes in zip(self.column("pnl"), *code_columns):
+            add_values(pnl, [values[code] for values, code in zip(group_values, codes)])
+
+    def events(self) -> List[Dict[str, Any]]:
+        """
+        Slim TRADE_EVENT dicts with only the snapshot fields, in time order
+        (timestamps re-rendered as ISO 8601 UTC; missing values omitted).
+        """
+        names = [name for name, _ in NUMERIC_COLUMNS[1:]] + list(DICTIONARY_COLUMNS)
+        columns = [self.column(name) for name, _ in NUMERIC_COLUMNS[1:]]
+        columns += [self.values(name) for name in DICTIONARY_COLUMNS]
+        events = []
+        for ts_us, *values in zip(self.column("timestamp_us"), *columns):
+            event = {name: value for name, value in zip(names, values) if value is not None and value == value}
+            event["timestamp"] = format_timestamp_us(ts_us)
+            events.append(event)
+        return events
+
+
+# ----------------------------------------------------------------------
+# Compaction
+# ----------------------------------------------------------------------
+
+def compact_jsonl(log_path: Path = LOG_FILE, snapshot_path: Optional[Path] = None) -> Tuple[Path, int]:
+    """
+    Convert a .jsonl log into a snapshot. The snapshot records the log
+    checkpoint it covers, so readers only parse lines appended afterwards.
+    Returns (snapshot path, rows).
+    """
+    log_path = Path(log_path)
+    snapshot_path = Path(snapshot_path) if snapshot_path else snapshot_path_for(log_path)
+    builder = SnapshotBuilder()
+    checkpoint = LogCheckpoint.start_of(os.stat(log_path))
+    with log_path.open("rb") as f:
+        for events, *position in checkpoint.read_blocks(f, LOG_BLOCK_EVENTS, log_path.name):
+            builder.add_events(events)
+            checkpoint.advance(*position)
+    checkpoint.size = os.stat(log_path).st_size
+
+    builder.write(
+        snapshot_path,
+        {"kind": "jsonl", "file": log_path.name, "checkpoint": checkpoint.to_dict()},
+    )
+    return snapshot_path, len(builder)
+
+
+def compact_sqlite(db_path: Path, snapshot_path: Path) -> Tuple[Path, int]:
+    """
+    Convert the backend trades table (api_backend/trueedge_backend.db) into a
+    snapshot. The source records the highest trade id included.
+    """
+    builder = SnapshotBuilder()
+    max_id = 0
+    conn = sqlite3.connect(f"file:{Path(db_path).as_posix()}?mode=ro", uri=True)
+    try:
+        cursor = conn.execute(
+            """
+            SELECT id, ts_us, pnl, fees, quantity, price_open, price_close,
+                   account_id, strategy_id, symbol, venue
+            FROM trades
+            ORDER BY ts_us, id
+            """
+        )
+        while True:
+            rows = cursor.fetchmany(LOG_BLOCK_EVENTS)
+            if not rows:
+                break
+            ids, ts_us, pnl, *rest = zip(*rows)
+            max_id = max(max_id, *ids)
+            builder.add_columns(
+                [TIMESTAMP_MIN_US if ts is None else ts for ts in ts_us],
+                [float(value or 0.0) for value in pnl],
+                dict(zip((name for name, _ in NUMERIC_COLUMNS[2:]), rest[:4])),
+                dict(zip(DICTIONARY_COLUMNS, rest[4:])),
+            )
+    finally:
+        conn.close()
+
+    builder.write(
+        Path(snapshot_path),
+        {"kind": "sqlite", "file": Path(db_path).name, "max_id": max_id},
+    )
+    return Path(snapshot_path), len(builder)
+
+
+# ----------------------------------------------------------------------
+# Snapshot + JSONL tail
+# ----------------------------------------------------------------------
+
+def open_log_snapshot(log_path: Path, snapshot_path: Optional[Path] = None) -> Optional[TradeSnapshot]:
+    """
+    The snapshot of log_path if it exists and still matches the log (same
+    file, covered part unchanged); None otherwise.
+    """
+    log_path = Path(log_path)
+    snapshot_path = Path(snapshot_path) if snapshot_path else snapshot_path_for(log_path)
+    if not snapshot_path.exists():
+        return None
+    try:
+        snapshot = TradeSnapshot(snapshot_path)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"[WARN] Ignoring unreadable snapshot {snapshot_path.name}: {e}")
+        return None
+
+    try:
+        checkpoint = LogCheckpoint.from_dict(snapshot.source["checkpoint"])
+        valid = snapshot.source.get("kind") == "jsonl" and checkpoint.matches(
+            log_path, os.stat(log_path)
+        )
+    except (OSError, KeyError):
+        valid = False
+    if not valid:
+        print(f"[INFO] Snapshot {snapshot_path.name} does not match {log_path.name}; re-run compaction")
+        snapshot.close()
+        return None
+    return snapshot
+
+
+def read_log_tail(log_path: Path, snapshot: Optional[TradeSnapshot]) -> List[Dict[str, Any]]:
+    """
+    Events of the log not covered by the snapshot (the whole log if None).
+    """
+    if snapshot is not None:
+        checkpoint = LogCheckpoint.from_dict(snapshot.source["checkpoint"])
+    else:
+        checkpoint = LogCheckpoint()
+    events: List[Dict[str, Any]] = []
+    with Path(log_path).open("rb") as f:
+        for block, *_ in checkpoint.read_blocks(f, LOG_BLOCK_EVENTS, Path(log_path).name):
+            events.extend(block)
+    return events
+
+
+def load_snapshot_events(log_path: Path = LOG_FILE, snapshot_path: Optional[Path] = None) -> List[Dict[str, Any]]:
+    """
+    Events covered by the snapshot as slim dicts (snapshot fields only),
+    then the JSONL tail decoded; the whole log is decoded when the snapshot
+    is missing or stale. For metrics only: unlike load_events, covered events
+    lack event_id, side, tags, metadata, ... and come back in time order.
+    """
+    log_path = Path(log_path)
+    if not log_path.exists():
+        print(f"[INFO] No file found at {log_path}")
+        return []
+    snapshot = open_log_snapshot(log_path, snapshot_path)
+    if snapshot is None:
+        return read_log_tail(log_path, None)
+    with snapshot:
+        return snapshot.events() + read_log_tail(log_path, snapshot)
+
+
+def compute_snapshot_metrics(
+    log_path: Path = LOG_FILE,
+    group_keys=DEFAULT_GROUP_KEYS,
+    starting_balance: float = 0.0,
+    snapshot_path: Optional[Path] = None,
+    engine: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    compute_grouped_metrics over the log, reading covered events from the
+    snapshot columns and decoding only the JSONL tail. group_keys must be
+    dictionary columns (DICTIONARY_COLUMNS).
+    """
+    for key_name in group_keys:
+        if key_name not in DICTIONARY_COLUMNS:
+            raise ValueError(f"Cannot group snapshot metrics by {key_name!r}")
+
+    log_path = Path(log_path)
+    if not log_path.exists():
+        print(f"[INFO] No file found at {log_path}")
+        return compute_grouped_metrics([], group_keys, starting_balance)
+    snapshot = open_log_snapshot(log_path, snapshot_path)
+    tail = read_log_tail(log_path, snapshot)
+    if snapshot is None:
+        return compute_grouped_metrics(tail, group_keys, starting_balance, engine)
+
+    with snapshot:
+        if use_numpy_engine(engine, snapshot.rows + len(tail)):
+            pnl = np.concatenate(
+                (snapshot.array("pnl"), np.array([float(ev.get("pnl", 0.0)) for ev in tail]))
+            )
+            ts = np.concatenate(
+                (snapshot.array("timestamp_us"), np.array(timestamp_keys(tail), dtype=np.int64))
+            )
+            group_columns = {
+                key_name: [group_value(v) for v in snapshot.values(key_name)]
+                + [group_value(ev.get(key_name)) for ev in tail]
+                for key_name in group_keys
+            }
+            return compute_grouped_metrics_columns(pnl, ts, group_columns, starting_balance)
+
+        tail = sort_events(tail)
+        timestamps = snapshot.column("timestamp_us")
+        if tail and snapshot.rows and timestamps[-1] > parse_timestamp_us(tail[0].get("timestamp")):
+            # The tail reaches back before the snapshot's last trade: sort everything.
+            return compute_grouped_metrics(snapshot.events() + tail, group_keys, starting_balance, "python")
+
+        aggregator = GroupedMetricsAggregator(group_keys)
+        snapshot.fold_into(aggregator)
+        aggregator.add_many(tail)
+        return aggregator.results(starting_balance)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Compact trades_log.jsonl (or the backend trades table) into a columnar snapshot"
+    )
+    parser.add_argument("--log", type=Path, default=LOG_FILE, help="JSONL log to compact")
+    parser.add_argument("--db", type=Path, help="compact this backend SQLite database instead")
+    parser.add_argument("--out", type=Path, help="snapshot path (default: <log>.snap / <db>.snap)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.db is not None:
+        out = args.out or args.db.with_name(args.db.name + ".snap")
+        path, rows = compact_sqlite(args.db, out)
+    else:
+        if not args.log.exists():
+            print(f"[INFO] No file found at {args.log}")
+            return
+        path, rows = compact_jsonl(args.log, args.out)
+    print(f"Wrote snapshot with {rows} trades: {path} ({path.stat().st_size} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+import bisect
+import json
+import mmap
+import os
+import re
+import sys
+from array import array
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from log_segments import next_segment_number, segment_path
+from metrics_core import LogCheckpoint, index_key_hash, is_segment_summary
+
+
+IDS_MAGIC = b"TEIDS001"
+IDS_VERSION = 1
+
+# A logged line is located by segment number << LOCATION_SHIFT | byte offset.
+# The open log uses the number it will get when sealed (next_segment_number),
+# so locations stay valid across rotation.
+LOCATION_SHIFT = 40
+LOCATION_OFFSET_MASK = (1 << LOCATION_SHIFT) - 1
+
+# Ids logged after the persisted file are kept in a dict; beyond this many
+# they are merged into the file (memory vs. rewrite cost).
+TAIL_MAX_IDS = 500_000
+
+_ALIGN = 8
+_NO_IDS = memoryview(b"").cast("Q")
+_EVENT_ID_KEY = b'"event_id"'
+_EVENT_ID_RE = re.compile(rb'"event_id"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+def ids_path_for(log_path: Path) -> Path:
+    """
+    Persisted id index kept next to the log: trades_log.jsonl -> trades_log.jsonl.ids
+    """
+    return log_path.with_name(log_path.name + ".ids")
+
+
+def line_event_id(line: bytes) -> Optional[str]:
+    """
+    str(event["event_id"]) of a log line; None for blank lines, summary
+    records and lines that do not parse. A line with a single "event_id" key
+    holding a plain string is not decoded as a whole.
+    """
+    if line.count(_EVENT_ID_KEY) == 1:
+        match = _EVENT_ID_RE.search(line)
+        if match:
+            value = match.group(1)
+            if b"\\" in value:
+                return json.loads(b'"' + value + b'"')
+            return value.decode("utf-8")
+    if not line.strip():
+        return None
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(record, dict) or is_segment_summary(record) or "event_id" not in record:
+        return None
+    return str(record["event_id"])
+
+
+class EventIdIndex:
+    """
+    Exact set of the event_ids in a segmented .jsonl log (log_segments.py).
+
+    - Persisted part (trades_log.jsonl.ids): sorted 64-bit hashes of the ids
+      with the location of each line, memory-mapped and binary-searched, plus
+      a LogCheckpoint of how far into the log it goes.
+    - Tail: ids logged since then, in a dict from hash to location.
+
+    A hash hit is confirmed by reading the line at its location, so hash
+    collisions never reject a new event. A hit in a segment that is no
+    longer on disk (archived) counts as a duplicate.
+
+    load() opens the persisted part and indexes the rest of the log;
+    catch_up() indexes lines appended since (e.g. by other processes).
+    If the log was truncated or rewritten the index is rebuilt from all
+    segments.
+    """
+
+    def __init__(self, log_path: Path, ids_path: Optional[Path] = None) -> None:
+        self.log_path = Path(log_path)
+        self.ids_path = Path(ids_path) if ids_path else ids_path_for(self.log_path)
+        self.loaded = False
+        self._map = None
+        self._hashes = self._locations = _NO_IDS
+        self._reset()
+
+    def _reset(self) -> None:
+        self._tail: Dict[int, int] = {}
+        self._tail_collisions: Dict[int, List[int]] = {}
+        self.tail_ids = 0
+        self.segment = 1
+        self.checkpoint = LogCheckpoint()
+
+    def __len__(self) -> int:
+        return len(self._hashes) + self.tail_ids
+
+    # ------------------------------------------------------------------
+    # Persisted part
+    # ------------------------------------------------------------------
+
+    def _open_persisted(self) -> bool:
+        try:
+            f = self.ids_path.open("rb")
+        except FileNotFoundError:
+            return False
+        with f:
+            try:
+                if f.read(len(IDS_MAGIC)) != IDS_MAGIC:
+                    raise ValueError("bad magic")
+                header_length = int.from_bytes(f.read(8), "little")
+                header = json.loads(f.read(header_length))
+                if header["version"] != IDS_VERSION or header["byteorder"] != sys.byteorder:
+                    raise ValueError("other version or byte order")
+                count = header["count"]
+                start = len(IDS_MAGIC) + 8 + header_length + (-header_length % _ALIGN)
+                if os.fstat(f.fileno()).st_size < start + 16 * count:
+                    raise ValueError("truncated")
+                checkpoint = LogCheckpoint.from_dict(header["checkpoint"])
+            except (ValueError, KeyError, TypeError) as e:
+                print(f"[WARN] Ignoring unreadable id index {self.ids_path.name}: {e}")
+                return False
+            if count:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                data = memoryview(self._map)
+                self._hashes = data[start:start + 8 * count].cast("Q")
+                self._locations = data[start + 8 * count:start + 16 * count].cast("Q")
+        self.segment = header["segment"]
+        self.checkpoint = checkpoint
+        return True
+
+    def _close_persisted(self) -> None:
+        if self._map is not None:
+            self._hashes.release()
+            self._locations.release()
+            self._map.close()
+            self._map = None
+        self._hashes = self._locations = _NO_IDS
+
+    def close(self) -> None:
+        self._close_persisted()
+        self._reset()
+        self.loaded = False
+
+    def save(self) -> None:
+        """
+        Merge the tail into the persisted file (temp file + rename).
+        """
+        tail = sorted(self._tail_items())
+        hashes, locations = array("Q"), array("Q")
+        old_hashes, old_locations = self._hashes, self._locations
+        position = 0
+        for key, location in tail:
+            end = bisect.bisect_right(old_hashes, key, position)
+            hashes.frombytes(old_hashes[position:end].cast("B"))
+            locations.frombytes(old_locations[position:end].cast("B"))
+            hashes.append(key)
+            locations.append(location)
+            position = end
+        hashes.frombytes(old_hashes[position:].cast("B"))
+        locations.frombytes(old_locations[position:].cast("B"))
+        self._close_persisted()  # an mmapped file cannot be replaced on Windows
+
+        header = json.dumps(
+            {
+                "version": IDS_VERSION,
+                "count": len(hashes),
+                "byteorder": sys.byteorder,
+                "segment": self.segment,
+                "checkpoint": self.checkpoint.to_dict(),
+            }
+        ).encode("utf-8")
+        tmp_path = self.ids_path.with_name(f"{self.ids_path.name}.{os.getpid()}.tmp")
+        with tmp_path.open("wb") as f:
+            f.write(IDS_MAGIC)
+            f.write(len(header).to_bytes(8, "little"))
+            f.write(header + b"\0" * (-len(header) % _ALIGN))
+            f.write(hashes.tobytes())
+            f.write(locations.tobytes())
+        os.replace(tmp_path, self.ids_path)
+
+        segment, checkpoint = self.segment, self.checkpoint
+        self._reset()
+        self._open_persisted()
+        self.segment, self.checkpoint = segment, checkpoint
+
+    def maybe_save(self, min_tail_ids: int = TAIL_MAX_IDS) -> None:
+        if self.tail_ids >= min_tail_ids:
+            self.save()
+
+    # ------------------------------------------------------------------
+    # Tail
+    # ------------------------------------------------------------------
+
+    def _add(self, event_id: str, segment: int, offset: int) -> None:
+        key = index_key_hash(event_id)
+        location = (segment << LOCATION_SHIFT) | offset
+        if key in self._tail:
+            self._tail_collisions.setdefault(key, []).append(location)
+        else:
+            self._tail[key] = location
+        self.tail_ids += 1
+
+    def _tail_items(self) -> Iterator:
+        yield from self._tail.items()
+        for key, locations in self._tail_collisions.items():
+            for location in locations:
+                yield key, location
+
+    # ------------------------------------------------------------------
+    # Reading the log
+    # ------------------------------------------------------------------
+
+    def _scan(self, path: Path, segment: int, checkpoint: LogCheckpoint) -> None:
+        """
+        Index the complete lines of path after checkpoint and advance it.
+        """
+        with path.open("rb") as f:
+            position = f.seek(checkpoint.offset)
+            last_line = None
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # still being written
+                event_id = line_event_id(line)
+                if event_id is not None:
+                    self._add(event_id, segment, position)
+                last_line = line
+                position += len(line)
+        if last_line is not None:
+            checkpoint.advance(position, position - len(last_line), last_line)
+
+    def _scan_sealed(self, number: int, checkpoint: LogCheckpoint) -> bool:
+        """
+        Finish reading sealed segment number. False if it is not the file
+        the checkpoint was taken from.
+        """
+        path = segment_path(self.log_path, number)
+        if not path.exists():
+            return True  # archived
+        if checkpoint.device is not None and not checkpoint.matches(path, os.stat(path)):
+            return False
+        self._scan(path, number, checkpoint)
+        return True
+
+    def load(self) -> None:
+        """
+        Open the persisted part and index everything logged after it.
+        """
+        self._close_persisted()
+        self._reset()
+        self._open_persisted()
+        self.catch_up()
+        self.loaded = True
+
+    def rebuild(self) -> None:
+        """
+        Drop everything and index all segments and the open log.
+        """
+        print(f"[INFO] Rebuilding the event_id index of {self.log_path.name}")
+        self._close_persisted()
+        self._reset()
+        try:
+            self.ids_path.unlink()
+        except FileNotFoundError:
+            pass
+        self.segment = 1
+        self.catch_up()
+
+    def catch_up(self) -> None:
+        """
+        Index lines logged since the last call (by any writer).
+        """
+        try:
+            st = os.stat(self.log_path)
+        except FileNotFoundError:
+            st = None
+        checkpoint = self.checkpoint
+        if st is not None and (st.st_dev, st.st_ino) == (checkpoint.device, checkpoint.inode):
+            # Still the same open segment: the common case.
+            if st.st_size == checkpoint.offset:
+                return
+            if not checkpoint.matches(self.log_path, st):
+                self.rebuild()
+                return
+            self._scan(self.log_path, self.segment, checkpoint)
+            return
+
+        open_number = next_segment_number(self.log_path)
+        if self.segment > open_number:
+            self.rebuild()  # segments were removed and numbering restarted
+            return
+        while self.segment < open_number:
+            # The segment we were reading has been sealed (rotation).
+            if not self._scan_sealed(self.segment, self.checkpoint):
+                self.rebuild()
+                return
+            self.segment += 1
+            self.checkpoint = LogCheckpoint()
+            self.maybe_save()
+
+        if st is None:
+            return
+        if self.checkpoint.device is None:
+            self.checkpoint = LogCheckpoint.start_of(st)
+        elif not self.checkpoint.matches(self.log_path, st):
+            self.rebuild()
+            return
+        self._scan(self.log_path, self.segment, self.checkpoint)
+
+    def appended(self, f, offset: int, lines: List[bytes], event_ids: List[str]) -> None:
+        """
+        Record lines the caller has just written back to back at offset of the
+        open log f, right after catch_up() with the log locked.
+        """
+        if not lines:
+            return
+        if self.checkpoint.device is None:
+            self.checkpoint = LogCheckpoint.start_of(os.fstat(f.fileno()))
+        position = offset
+        for line, event_id in zip(lines, event_ids):
+            self._add(event_id, self.segment, position)
+            position += len(line)
+        self.checkpoint.advance(position, position - len(lines[-1]), lines[-1])
+
+    # ------------------------------------------------------------------
+    # Lookup
+    # ------------------------------------------------------------------
+
+    def _candidates(self, key: int) -> Iterator[int]:
+        location = self._tail.get(key)
+        if location is not None:
+            yield location
+            yield from self._tail_collisions.get(key, ())
+        hashes = self._hashes
+        i = bisect.bisect_left(hashes, key)
+        while i < len(hashes) and hashes[i] == key:
+            yield self._locations[i]
+            i += 1
+
+    def _confirm(self, location: int, event_id: str) -> bool:
+        segment = location >> LOCATION_SHIFT
+        path = segment_path(self.log_path, segment)
+        if not path.exists():
+            if segment != self.segment:
+                return True  # archived segment: trust the hash
+            path = self.log_path
+        try:
+            with path.open("rb") as f:
+                f.seek(location & LOCATION_OFFSET_MASK)
+                line = f.readline()
+        except FileNotFoundError:
+            return True
+        return line_event_id(line) == event_id
+
+    def contains(self, event_id: str) -> bool:
+        return any(
+            self._confirm(location, event_id)
+            for location in self._candidates(index_key_hash(event_id))
+        )
@@ -1,7 +1,7 @@
 from pathlib import Path
 from collections import defaultdict
 
-from metrics_core import load_events, compute_metrics, group_by_key
+from log_segments import compute_history_metrics
 
 
 DATA_DIR = Path(__file__).resolve().parent / "data"
@@ -30,30 +30,26 @@ def metrics_table_html(title: str, metrics: dict) -> str:
 def main():
     print("Generating TRUEEDGE HTML report...")
 
-    events = load_events(LOG_FILE)
-    if not events:
+    # Overall, by strategy_id and by account_id; sealed segments contribute
+    # their summary record, the open one is read incrementally (see log_segments)
+    results = compute_history_metrics(
+        LOG_FILE, group_keys=("strategy_id", "account_id"), starting_balance=0.0
+    )
+    if results["overall"]["total_trades"] == 0:
         print(f"[INFO] No events found in {LOG_FILE}")
         print("[HINT] Run logger.py, simulate_trades.py, or send_test_trade.py first.")
         return
 
     # Ensure reports directory exists
     REPORTS_DIR.mkdir(exist_ok=True)
+    overall_metrics = results["overall"]
 
-    # Overall metrics
-    overall_metrics = compute_metrics(events, starting_balance=0.0)
-
-    # By strategy_id
-    by_strategy = group_by_key(events, "strategy_id")
     strategy_blocks = []
-    for strat_id, strat_events in by_strategy.items():
-        m = compute_metrics(strat_events, starting_balance=0.0)
+    for strat_id, m in results["groups"]["strategy_id"].items():
         strategy_blocks.append(metrics_table_html(f"strategy_id = {strat_id}", m))
 
-    # By account_id
-    by_account = group_by_key(events, "account_id")
     account_blocks = []
-    for acc_id, acc_events in by_account.items():
-        m = compute_metrics(acc_events, starting_balance=0.0)
+    for acc_id, m in results["groups"]["account_id"].items():
         account_blocks.append(metrics_table_html(f"account_id = {acc_id}", m))
 
     # Build full HTML
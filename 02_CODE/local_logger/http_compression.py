@@ -0,0 +1,186 @@
+import gzip
+import io
+import zlib
+from typing import Any, BinaryIO, Dict, Optional, Tuple
+
+
+# Bodies smaller than this are sent uncompressed (gzip framing and CPU are
+# not worth it for a packet or two).
+GZIP_MIN_BYTES = 512
+
+# zlib level 6 is gzip's default; TRADE_EVENT JSON already shrinks 5-10x there.
+GZIP_LEVEL = 6
+
+# Content types worth compressing.
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+_READ_CHUNK = 64 * 1024
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+class BodyDecodeError(ValueError):
+    """A request or response body could not be decoded (HTTP 400)."""
+    pass
+
+
+class UnsupportedEncoding(BodyDecodeError):
+    """Content-Encoding other than gzip / identity (HTTP 415)."""
+    pass
+
+
+class BodyTooLarge(BodyDecodeError):
+    """The (decoded) body is larger than allowed (HTTP 413)."""
+    pass
+
+
+def _encoding(content_encoding: Optional[str]) -> str:
+    encoding = (content_encoding or "identity").strip().lower()
+    if encoding == "x-gzip":
+        encoding = "gzip"
+    if encoding not in ("gzip", "identity"):
+        raise UnsupportedEncoding(f"Unsupported Content-Encoding: {content_encoding!r}")
+    return encoding
+
+
+def read_body(
+    rfile: BinaryIO,
+    length: int,
+    content_encoding: Optional[str],
+    max_bytes: int,
+) -> bytes:
+    """
+    Read length bytes from rfile and decode them according to
+    content_encoding ("gzip" or "identity").
+
+    gzip is decompressed while reading, and never to more than max_bytes:
+    a small body that expands into a huge one (decompression bomb) raises
+    BodyTooLarge without ever being held in memory. Raises BodyDecodeError
+    for corrupt or truncated data. On error the rest of the body may be left
+    unread, so the caller should close the connection.
+    """
+    encoding = _encoding(content_encoding)
+    if encoding == "identity":
+        if length > max_bytes:
+            raise BodyTooLarge(f"Body too large: {length} bytes (max {max_bytes})")
+        return rfile.read(length)
+    if length == 0:
+        return b""
+
+    parts = []
+    total = 0
+    decompressor = zlib.decompressobj(_GZIP_WBITS)
+    remaining = length
+    try:
+        while remaining > 0:
+            data = rfile.read(min(_READ_CHUNK, remaining))
+            if not data:
+                raise BodyDecodeError("Body ended early")
+            remaining -= len(data)
+            while data:
+                if decompressor.eof:
+                    # Concatenated gzip members are one stream (as with gzip.decompress).
+                    decompressor = zlib.decompressobj(_GZIP_WBITS)
+                piece = decompressor.decompress(data, max_bytes - total + 1)
+                total += len(piece)
+                if total > max_bytes:
+                    raise BodyTooLarge(f"Decompressed body exceeds {max_bytes} bytes")
+                parts.append(piece)
+                data = decompressor.unused_data if decompressor.eof else decompressor.unconsumed_tail
+    except zlib.error as e:
+        raise BodyDecodeError(f"Invalid gzip body: {e}")
+    if not decompressor.eof:
+        raise BodyDecodeError("Invalid gzip body: truncated")
+    return b"".join(parts)
+
+
+def decode_body(data: bytes, content_encoding: Optional[str], max_bytes: int) -> bytes:
+    """
+    read_body for a body that is already in memory (e.g. a client response).
+    """
+    return read_body(io.BytesIO(data), len(data), content_encoding, max_bytes)
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """
+    True if an Accept-Encoding header allows gzip (q-values respected,
+    "*" counts unless gzip is listed explicitly).
+    """
+    if not accept_encoding:
+        return False
+    allowed: Dict[str, bool] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        allowed[name.strip().lower()] = q > 0
+    for name in ("gzip", "x-gzip"):
+        if name in allowed:
+            return allowed[name]
+    return allowed.get("*", False)
+
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+def gzip_bytes(body: bytes, level: int = GZIP_LEVEL) -> bytes:
+    # mtime=0: the same body always compresses to the same bytes.
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def gzip_stream(level: int = GZIP_LEVEL) -> Any:
+    """
+    Compressor for a streamed gzip body: send compress(data) +
+    flush(zlib.Z_SYNC_FLUSH) per chunk, and flush() at the end.
+    """
+    return zlib.compressobj(level, zlib.DEFLATED, _GZIP_WBITS)
+
+
+def compress_response(
+    body: bytes,
+    content_type: str,
+    accept_encoding: Optional[str],
+    min_bytes: int = GZIP_MIN_BYTES,
+) -> Tuple[bytes, Dict[str, str]]:
+    """
+    gzip body if the client accepts it and it is large and compressible
+    enough. Returns (body, extra headers).
+    """
+    if not is_compressible(content_type):
+        return body, {}
+    headers = {"Vary": "Accept-Encoding"}
+    if len(body) < min_bytes or not accepts_gzip(accept_encoding):
+        return body, headers
+    headers["Content-Encoding"] = "gzip"
+    return gzip_bytes(body), headers
+
+
+# ----------------------------------------------------------------------
+# Client side
+# ----------------------------------------------------------------------
+
+def encode_request_body(
+    body: bytes, min_bytes: int = GZIP_MIN_BYTES
+) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Request body and headers for a client: gzip with Content-Encoding when
+    the body is at least min_bytes, and always ask for gzip responses.
+    """
+    headers = {"Accept-Encoding": "gzip"}
+    if len(body) >= min_bytes:
+        headers["Content-Encoding"] = "gzip"
+        body = gzip_bytes(body)
+    return body, headers
+
+
+def read_response(resp, max_bytes: int = 256 * 1024 * 1024) -> bytes:
+    """
+    Read and decode a urllib / http.client response body.
+    """
+    return decode_body(resp.read(), resp.headers.get("Content-Encoding"), max_bytes)
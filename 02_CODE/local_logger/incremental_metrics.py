@@ -0,0 +1,240 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from columnar_snapshot import DICTIONARY_COLUMNS, open_log_snapshot
+from metrics_core import (
+    DEFAULT_GROUP_KEYS,
+    LOG_BLOCK_EVENTS,
+    TIMESTAMP_MIN_US,
+    GroupedMetricsAggregator,
+    LogCheckpoint,
+    keys_are_sorted,
+    sort_events,
+    timestamp_keys,
+)
+
+
+STATE_VERSION = 2
+
+
+def default_state_path(log_path: Path) -> Path:
+    """
+    Checkpoint file kept next to the log: trades_log.jsonl -> trades_log.jsonl.state.json
+    """
+    return log_path.with_name(log_path.name + ".state.json")
+
+
+class IncrementalMetrics:
+    """
+    Metrics for an append-only .jsonl log that only parse what was appended.
+
+    A LogCheckpoint is stored together with the GroupedMetricsAggregator
+    state in a JSON file next to the log. update() then:
+
+    - resumes from the checkpoint and folds in only the new lines, or
+    - rebuilds from scratch when the checkpoint no longer matches the file
+      (truncated, rotated/replaced, last line rewritten, other group keys), or
+      when new events are older than ones already folded in (the accumulators
+      need time order; the rebuild sorts the whole file like sort_events).
+
+    results() returns the same dict as compute_grouped_metrics over
+    load_events(log_path).
+    """
+
+    def __init__(
+        self,
+        log_path: Path,
+        state_path: Optional[Path] = None,
+        group_keys=DEFAULT_GROUP_KEYS,
+    ) -> None:
+        self.log_path = Path(log_path)
+        self.state_path = Path(state_path) if state_path else default_state_path(self.log_path)
+        self.group_keys = tuple(group_keys)
+        self._reset()
+
+    def _reset(self, st: Optional[os.stat_result] = None) -> None:
+        self.aggregator = GroupedMetricsAggregator(self.group_keys)
+        self.checkpoint = LogCheckpoint.start_of(st) if st else LogCheckpoint()
+        self.first_ts_us: Optional[int] = None
+        self.last_ts_us = TIMESTAMP_MIN_US
+
+    # ------------------------------------------------------------------
+    # Checkpoint persistence
+    # ------------------------------------------------------------------
+
+    def load_state(self) -> bool:
+        """
+        Load the persisted checkpoint. Returns False (and keeps an empty state)
+        if there is none or it is unreadable / from another version.
+        """
+        try:
+            with self.state_path.open("r", encoding="utf-8") as f:
+                state = json.load(f)
+            if state.get("version") != STATE_VERSION:
+                return False
+            if tuple(state["aggregator"]["group_keys"]) != self.group_keys:
+                return False
+            aggregator = GroupedMetricsAggregator.from_state(state["aggregator"])
+            checkpoint = LogCheckpoint.from_dict(state["checkpoint"])
+            first_ts_us = state["checkpoint"]["first_ts_us"]
+            last_ts_us = state["checkpoint"]["last_ts_us"]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            if self.state_path.exists():
+                print(f"[WARN] Ignoring unreadable checkpoint {self.state_path.name}: {e}")
+            return False
+
+        self.aggregator = aggregator
+        self.checkpoint = checkpoint
+        self.first_ts_us = first_ts_us
+        self.last_ts_us = last_ts_us
+        return True
+
+    def save_state(self) -> None:
+        """
+        Write the checkpoint atomically (temp file + rename).
+        """
+        checkpoint = self.checkpoint.to_dict()
+        checkpoint["first_ts_us"] = self.first_ts_us
+        checkpoint["last_ts_us"] = self.last_ts_us
+        state = {
+            "version": STATE_VERSION,
+            "log_file": self.log_path.name,
+            "checkpoint": checkpoint,
+            "aggregator": self.aggregator.to_state(),
+        }
+        tmp_path = self.state_path.with_name(self.state_path.name + ".tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def _fold_new_lines(self) -> Optional[int]:
+        """
+        Fold all lines after the checkpoint into the aggregator.
+        Returns the number of events added, or None if an event is older than
+        what is already aggregated (the caller then rebuilds).
+        """
+        added = 0
+        checkpoint = self.checkpoint
+        with self.log_path.open("rb") as f:
+            for events, *position in checkpoint.read_blocks(f, LOG_BLOCK_EVENTS, self.log_path.name):
+                keys = timestamp_keys(events)
+                if not keys_are_sorted(keys):
+                    order = sorted(range(len(events)), key=keys.__getitem__)
+                    events = [events[i] for i in order]
+                    keys = [keys[i] for i in order]
+                if keys and keys[0] < self.last_ts_us:
+                    return None
+
+                self.aggregator.add_many(events)
+                added += len(events)
+                if keys:
+                    if self.first_ts_us is None:
+                        self.first_ts_us = keys[0]
+                    self.last_ts_us = keys[-1]
+                checkpoint.advance(*position)
+        return added
+
+    def _seed_from_snapshot(self) -> Optional[int]:
+        """
+        Start from the columnar snapshot of the log (columnar_snapshot.py) if
+        one matches it: fold its rows and continue at its checkpoint.
+        Returns the number of rows folded, or None without a usable snapshot.
+        """
+        if not all(key_name in DICTIONARY_COLUMNS for key_name in self.group_keys):
+            return None
+        snapshot = open_log_snapshot(self.log_path)
+        if snapshot is None:
+            return None
+        with snapshot:
+            snapshot.fold_into(self.aggregator)
+            self.checkpoint = LogCheckpoint.from_dict(snapshot.source["checkpoint"])
+            if snapshot.rows:
+                timestamps = snapshot.column("timestamp_us")
+                self.first_ts_us, self.last_ts_us = timestamps[0], timestamps[-1]
+            return snapshot.rows
+
+    def _rebuild(self, st: os.stat_result) -> int:
+        """
+        Full pass over the log (after the snapshot, if there is one). Streams
+        block by block while the file is in time order; otherwise loads all
+        events and sorts them once, like compute_grouped_metrics.
+        """
+        self._reset(st)
+        seeded = self._seed_from_snapshot()
+        if seeded is not None:
+            added = self._fold_new_lines()
+            if added is not None:
+                return seeded + added
+            self._reset(st)
+
+        added = self._fold_new_lines()
+        if added is not None:
+            return added
+
+        self._reset(st)
+        events: List[Dict[str, Any]] = []
+        with self.log_path.open("rb") as f:
+            for block, *position in self.checkpoint.read_blocks(f, LOG_BLOCK_EVENTS, self.log_path.name):
+                events.extend(block)
+                self.checkpoint.advance(*position)
+        events = sort_events(events)
+        self.aggregator.add_many(events)
+        if events:
+            # Later appends must not sort before anything already aggregated.
+            keys = timestamp_keys(events)
+            self.first_ts_us, self.last_ts_us = keys[0], max(keys)
+        return len(events)
+
+    def update(self, save: bool = True) -> int:
+        """
+        Bring the aggregate state up to date with the log file.
+        Returns the number of events read in this call.
+        """
+        try:
+            st = os.stat(self.log_path)
+        except FileNotFoundError:
+            self._reset()
+            return 0
+
+        if not self.load_state() or not self.checkpoint.matches(self.log_path, st):
+            added = self._rebuild(st)
+        else:
+            added = self._fold_new_lines()
+            if added is None:
+                print(f"[INFO] Out-of-order events in {self.log_path.name}, rebuilding metrics")
+                added = self._rebuild(st)
+
+        self.checkpoint.size = os.stat(self.log_path).st_size
+        if save:
+            self.save_state()
+        return added
+
+    def results(self, starting_balance: float = 0.0) -> Dict[str, Any]:
+        """
+        Same shape as compute_grouped_metrics: {"overall": ..., "groups": ...}.
+        """
+        return self.aggregator.results(starting_balance)
+
+
+def compute_log_metrics(
+    log_path: Path,
+    group_keys=DEFAULT_GROUP_KEYS,
+    starting_balance: float = 0.0,
+    state_path: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """
+    compute_grouped_metrics(load_events(log_path), ...) backed by a persisted
+    checkpoint, so repeated runs only parse newly appended events.
+    If the log does not exist, all metrics are zero.
+    """
+    incremental = IncrementalMetrics(log_path, state_path=state_path, group_keys=group_keys)
+    if not incremental.log_path.exists():
+        print(f"[INFO] No file found at {incremental.log_path}")
+    incremental.update()
+    return incremental.results(starting_balance)
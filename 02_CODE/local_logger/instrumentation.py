@@ -0,0 +1,309 @@
+import bisect
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+# Latency buckets: upper bounds from 10 us to ~80 s, four per doubling, so a
+# percentile read from the buckets is within ~19% of the true value.
+LATENCY_BOUNDS = tuple(1e-5 * 2 ** (i / 4) for i in range(93))
+
+# Row-count buckets (rows scanned per request): powers of two up to 2^30.
+COUNT_BOUNDS = tuple(float(2 ** i) for i in range(31))
+
+# Prometheus output lists every 8th latency bucket (10 us, 40 us, 160 us, ...,
+# ~84 s), which keeps a scrape small with one series per endpoint and
+# phase; JSON percentiles use all of them.
+PROMETHEUS_BUCKET_STEP = 8
+
+PERCENTILES = (50, 95, 99)
+
+# A collector returns {metric name: value} at export time, e.g. DB pool sizes.
+# Names ending in _total are exported as counters, everything else as gauges.
+Collector = Callable[[], Dict[str, float]]
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram: count, sum, max and a count per bucket.
+    Not thread-safe by itself; StatsRegistry serializes updates.
+    """
+
+    __slots__ = ("bounds", "buckets", "count", "sum", "max")
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BOUNDS) -> None:
+        self.bounds = bounds
+        self.buckets = [0] * (len(bounds) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "Histogram") -> None:
+        """
+        Add other's samples (same bounds) into this histogram.
+        """
+        for i, n in enumerate(other.buckets):
+            self.buckets[i] += n
+        self.count += other.count
+        self.sum += other.sum
+        if other.max > self.max:
+            self.max = other.max
+
+    def percentile(self, p: float) -> float:
+        """
+        Upper bound of the bucket holding the p-th percentile (capped at the
+        largest value seen); 0.0 when empty.
+        """
+        if not self.count:
+            return 0.0
+        rank = p / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    def summary(self, scale: float = 1.0) -> Dict[str, float]:
+        result = {"count": self.count, "sum": round(self.sum * scale, 6)}
+        if self.count:
+            result["mean"] = round(self.sum / self.count * scale, 6)
+        for p in PERCENTILES:
+            result[f"p{p}"] = round(self.percentile(p) * scale, 6)
+        result["max"] = round(self.max * scale, 6)
+        return result
+
+
+def _label_text(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for name, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{name}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class StatsRegistry:
+    """
+    In-process request telemetry for the HTTP services.
+
+    - Counters and histograms keyed by metric name and a tuple of label pairs,
+      updated under one lock (a request costs one lock round-trip plus a few
+      bisects).
+    - Collectors are called only when the stats are exported.
+    - to_dict() gives counts and p50/p95/p99 in milliseconds;
+      to_prometheus() the Prometheus text exposition format (version 0.0.4).
+    """
+
+    def __init__(self, prefix: str = "trueedge") -> None:
+        self.prefix = prefix
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Tuple, float]] = {}
+        self._histograms: Dict[str, Dict[Tuple, Histogram]] = {}
+        self._bounds: Dict[str, Sequence[float]] = {}
+        self._help: Dict[str, str] = {}
+        self._collectors: List[Collector] = []
+
+    # ------------------------------------------------------------------
+    # Definition
+    # ------------------------------------------------------------------
+
+    def counter(self, name: str, help_text: str) -> None:
+        self._counters.setdefault(name, {})
+        self._help[name] = help_text
+
+    def histogram(self, name: str, help_text: str, bounds: Sequence[float] = LATENCY_BOUNDS) -> None:
+        self._histograms.setdefault(name, {})
+        self._bounds[name] = bounds
+        self._help[name] = help_text
+
+    def add_collector(self, collector: Collector) -> None:
+        self._collectors.append(collector)
+
+    # ------------------------------------------------------------------
+    # Recording
+    # ------------------------------------------------------------------
+
+    def record(
+        self,
+        counters: Sequence[Tuple[str, Tuple, float]] = (),
+        observations: Sequence[Tuple[str, Tuple, float]] = (),
+    ) -> None:
+        """
+        Apply several (name, labels, value) counter increments and histogram
+        observations at once. labels is a tuple of (label, value) pairs.
+        """
+        with self._lock:
+            for name, labels, value in counters:
+                series = self._counters[name]
+                series[labels] = series.get(labels, 0) + value
+            for name, labels, value in observations:
+                series = self._histograms[name]
+                histogram = series.get(labels)
+                if histogram is None:
+                    histogram = series[labels] = Histogram(self._bounds[name])
+                histogram.observe(value)
+
+    # ------------------------------------------------------------------
+    # Export
+    # ------------------------------------------------------------------
+
+    def _collect(self) -> Dict[str, float]:
+        values: Dict[str, float] = {}
+        for collector in self._collectors:
+            try:
+                values.update(collector())
+            except Exception as e:  # stats must not take the endpoint down
+                values[f"collector_error:{getattr(collector, '__name__', 'collector')}"] = str(e)
+        return values
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        JSON-friendly snapshot. Latency histograms (names ending in _seconds)
+        are summarized in milliseconds.
+        """
+        with self._lock:
+            counters = {
+                name: [
+                    {**dict(labels), "value": value} for labels, value in sorted(series.items())
+                ]
+                for name, series in self._counters.items()
+            }
+            histograms = {}
+            for name, series in self._histograms.items():
+                scale = 1000.0 if name.endswith("_seconds") else 1.0
+                key = name[: -len("_seconds")] + "_ms" if scale != 1.0 else name
+                histograms[key] = [
+                    {**dict(labels), **histogram.summary(scale)}
+                    for labels, histogram in sorted(series.items())
+                ]
+        return {
+            "uptime_seconds": round(time.time() - self.started, 3),
+            "counters": counters,
+            "histograms": histograms,
+            "gauges": self._collect(),
+        }
+
+    def to_prometheus(self) -> str:
+        lines: List[str] = []
+        prefix = self.prefix
+        with self._lock:
+            for name, series in self._counters.items():
+                full = f"{prefix}_{name}"
+                lines.append(f"# HELP {full} {self._help[name]}")
+                lines.append(f"# TYPE {full} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{full}{_label_text(labels)} {_number(value)}")
+            for name, series in self._histograms.items():
+                full = f"{prefix}_{name}"
+                bounds = self._bounds[name]
+                step = PROMETHEUS_BUCKET_STEP if bounds is LATENCY_BOUNDS else 1
+                lines.append(f"# HELP {full} {self._help[name]}")
+                lines.append(f"# TYPE {full} histogram")
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for i, n in enumerate(histogram.buckets[:-1]):
+                        cumulative += n
+                        if i % step == 0 or i == len(bounds) - 1:
+                            le = labels + (("le", f"{bounds[i]:.6g}"),)
+                            lines.append(f"{full}_bucket{_label_text(le)} {cumulative}")
+                    le = labels + (("le", "+Inf"),)
+                    lines.append(f"{full}_bucket{_label_text(le)} {histogram.count}")
+                    lines.append(f"{full}_sum{_label_text(labels)} {_number(histogram.sum)}")
+                    lines.append(f"{full}_count{_label_text(labels)} {histogram.count}")
+        lines.append(f"# TYPE {prefix}_uptime_seconds gauge")
+        lines.append(f"{prefix}_uptime_seconds {_number(time.time() - self.started)}")
+        for name, value in sorted(self._collect().items()):
+            if not isinstance(value, (int, float)):
+                continue
+            full = f"{prefix}_{name}"
+            lines.append(f"# TYPE {full} {'counter' if name.endswith('_total') else 'gauge'}")
+            lines.append(f"{full} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class RequestTimer:
+    """
+    Phase timing for one request: with timer.phase("db"): ...
+    Phases add up if entered more than once.
+    """
+
+    __slots__ = ("start", "phases")
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+
+    def phase(self, name: str) -> "_Phase":
+        return _Phase(self, name)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+
+class _Phase:
+    __slots__ = ("timer", "name", "start")
+
+    def __init__(self, timer: RequestTimer, name: str) -> None:
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc: Any) -> None:
+        phases = self.timer.phases
+        phases[self.name] = phases.get(self.name, 0.0) + time.perf_counter() - self.start
+
+
+def http_stats_registry() -> StatsRegistry:
+    """
+    Registry with the metrics both HTTP services record per request
+    (see record_request).
+    """
+    stats = StatsRegistry()
+    stats.counter("http_requests_total", "HTTP requests by method, endpoint and status.")
+    stats.histogram("http_request_duration_seconds", "Request handling time by endpoint.")
+    stats.histogram(
+        "http_request_phase_seconds",
+        "Time per request phase (parse, validate, db, serialize, ...) by endpoint.",
+    )
+    stats.histogram(
+        "rows_scanned", "Rows read from the database per request, by endpoint.", COUNT_BOUNDS
+    )
+    return stats
+
+
+def record_request(
+    stats: StatsRegistry,
+    method: str,
+    endpoint: str,
+    status: Optional[int],
+    timer: RequestTimer,
+    rows_scanned: Optional[int] = None,
+) -> None:
+    endpoint_labels = (("method", method), ("endpoint", endpoint))
+    observations = [("http_request_duration_seconds", endpoint_labels, timer.elapsed())]
+    for phase, seconds in timer.phases.items():
+        observations.append(("http_request_phase_seconds", endpoint_labels + (("phase", phase),), seconds))
+    if rows_scanned is not None:
+        observations.append(("rows_scanned", endpoint_labels, float(rows_scanned)))
+    stats.record(
+        counters=[("http_requests_total", endpoint_labels + (("status", str(status or 0)),), 1)],
+        observations=observations,
+    )
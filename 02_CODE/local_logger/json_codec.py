@@ -0,0 +1,91 @@
+import json
+import os
+from typing import Any, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+
+# Force a codec with TRUEEDGE_JSON_CODEC=json (or =orjson); by default the
+# fastest installed one is used.
+CODEC_ENV = "TRUEEDGE_JSON_CODEC"
+CODECS = ("orjson", "json")
+
+# Errors raised by loads() for malformed input, whatever the codec
+# (orjson.JSONDecodeError subclasses json.JSONDecodeError; invalid UTF-8
+# raises UnicodeDecodeError, also a ValueError).
+DecodeError = ValueError
+
+_std_decoder = json.JSONDecoder()
+
+
+def _default_codec() -> str:
+    name = os.environ.get(CODEC_ENV, "").strip().lower()
+    if name:
+        if name not in CODECS:
+            raise ValueError(f"Unknown {CODEC_ENV} {name!r}. Expected one of {CODECS}")
+        if name == "orjson" and orjson is None:
+            raise ValueError(f"{CODEC_ENV}=orjson but orjson is not installed")
+        return name
+    return "orjson" if orjson is not None else "json"
+
+
+CODEC = _default_codec()
+
+
+def set_codec(name: str) -> None:
+    """
+    Switch codec at runtime ("orjson" or "json").
+    """
+    global CODEC
+    if name not in CODECS:
+        raise ValueError(f"Unknown JSON codec {name!r}. Expected one of {CODECS}")
+    if name == "orjson" and orjson is None:
+        raise ValueError("orjson is not installed")
+    CODEC = name
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    Decode one JSON document. orjson is stricter than the json module: it
+    rejects NaN / Infinity literals and integers beyond 64 bits.
+    """
+    if CODEC == "orjson":
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> str:
+    """
+    Encode obj on a single line (the shape raw_json / .jsonl lines need).
+    """
+    if CODEC == "orjson":
+        return orjson.dumps(obj).decode("utf-8")
+    return json.dumps(obj)
+
+
+def raw_decode(text: str, index: int = 0):
+    """
+    (value, end) for the JSON value starting at text[index], like
+    json.JSONDecoder.raw_decode; text[index:end] is its exact source text.
+    """
+    return _std_decoder.raw_decode(text, index)
+
+
+def single_line(raw: Union[bytes, str]) -> Optional[str]:
+    """
+    raw (one JSON document as received) as the text to store verbatim, or
+    None if it cannot be: not UTF-8, or spread over several lines (stored
+    lines must stay one per event).
+    """
+    if isinstance(raw, bytes):
+        try:
+            raw = raw.decode("utf-8")
+        except UnicodeDecodeError:
+            return None
+    raw = raw.strip().lstrip("\ufeff")
+    if "\n" in raw or "\r" in raw:
+        return None
+    return raw
@@ -0,0 +1,336 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from columnar_snapshot import load_snapshot_events, snapshot_path_for
+from incremental_metrics import IncrementalMetrics, default_state_path
+from metrics_core import (
+    DEFAULT_GROUP_KEYS,
+    SEGMENT_SUMMARY_RECORD,
+    GroupedMetricsAggregator,
+    MetricsAccumulator,
+    compute_grouped_metrics,
+    group_value,
+    index_keys_path_for,
+    index_path_for,
+    is_segment_summary,
+    load_events,
+    sort_events,
+    timestamp_keys,
+)
+
+
+SUMMARY_VERSION = 1
+
+# Group keys that can be answered from segment summaries.
+SUMMARY_GROUP_KEYS = {"account_id": "account", "strategy_id": "strategy"}
+
+
+def segments_dir_for(log_path: Path) -> Path:
+    """
+    Sealed segments live next to the log: data/trades_log.jsonl -> data/segments/
+    """
+    return log_path.parent / "segments"
+
+
+def segment_paths(log_path: Path) -> List[Path]:
+    """
+    Sealed segments of log_path, oldest first
+    (trades_log.000001.jsonl, trades_log.000002.jsonl, ...).
+    """
+    segments_dir = segments_dir_for(log_path)
+    if not segments_dir.is_dir():
+        return []
+    paths = [
+        path
+        for path in segments_dir.glob(f"{log_path.stem}.*{log_path.suffix}")
+        if _segment_number(path) is not None
+    ]
+    return sorted(paths, key=_segment_number)
+
+
+def _segment_number(path: Path) -> Optional[int]:
+    number = path.name.split(".")[-2]
+    return int(number) if number.isdigit() else None
+
+
+def segment_path(log_path: Path, number: int) -> Path:
+    return segments_dir_for(log_path) / f"{log_path.stem}.{number:06d}{log_path.suffix}"
+
+
+def next_segment_number(log_path: Path) -> int:
+    """
+    Number the open log will get when it is sealed.
+    """
+    sealed = segment_paths(log_path)
+    return (_segment_number(sealed[-1]) + 1) if sealed else 1
+
+
+# ----------------------------------------------------------------------
+# Summaries
+# ----------------------------------------------------------------------
+
+def build_summary(events: List[Dict[str, Any]], segment: int) -> Dict[str, Any]:
+    """
+    Summary record for one segment. For every scope/group it keeps the
+    MetricsAccumulator fields (trade count, pnl sum, wins, losses, equity
+    peak and trough relative to the segment start, internal max drawdown)
+    plus the first and last timestamp, which is what MetricsAccumulator.merge
+    needs to chain segments. Groups are listed in order of first appearance.
+    Scopes are those of the backend trade_aggregates table (all, account,
+    strategy, account_strategy); a dimension outside the scope is "".
+    """
+    events = sort_events(events)
+    keys = timestamp_keys(events)
+    groups: Dict[Tuple[str, str, str], List[Any]] = {}
+
+    for ts_us, ev in zip(keys, events):
+        pnl = float(ev.get("pnl", 0.0))
+        account_id = group_value(ev.get("account_id"))
+        strategy_id = group_value(ev.get("strategy_id"))
+        for group in (
+            ("all", "", ""),
+            ("account", account_id, ""),
+            ("strategy", "", strategy_id),
+            ("account_strategy", account_id, strategy_id),
+        ):
+            entry = groups.get(group)
+            if entry is None:
+                entry = groups[group] = [MetricsAccumulator(), ts_us, ts_us]
+            entry[0].add(pnl)
+            entry[2] = ts_us
+
+    return {
+        "record_type": SEGMENT_SUMMARY_RECORD,
+        "version": SUMMARY_VERSION,
+        "segment": segment,
+        "events": len(events),
+        "first_ts_us": keys[0] if keys else None,
+        "last_ts_us": keys[-1] if keys else None,
+        "groups": [
+            dict(
+                scope=scope,
+                account_id=account_id,
+                strategy_id=strategy_id,
+                first_ts_us=first_ts_us,
+                last_ts_us=last_ts_us,
+                **{name: getattr(acc, name) for name in MetricsAccumulator.__slots__},
+            )
+            for (scope, account_id, strategy_id), (acc, first_ts_us, last_ts_us) in groups.items()
+        ],
+    }
+
+
+def _summary_accumulator(entry: Dict[str, Any]) -> MetricsAccumulator:
+    acc = MetricsAccumulator()
+    for name in MetricsAccumulator.__slots__:
+        setattr(acc, name, entry[name])
+    return acc
+
+
+def read_segment_summary(path: Path) -> Optional[Dict[str, Any]]:
+    """
+    The summary record at the end of a sealed segment, read backwards from
+    the end of the file; None if the last line is not a summary.
+    """
+    with path.open("rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        tail = b""
+        position = end
+        while position > 0:
+            step = min(65536, position)
+            position -= step
+            f.seek(position)
+            tail = f.read(step) + tail
+            newline = tail.rstrip(b"\n").rfind(b"\n")
+            if newline >= 0:
+                tail = tail[newline + 1:]
+                break
+    try:
+        record = json.loads(tail)
+    except ValueError:
+        return None
+    if not is_segment_summary(record) or record.get("version") != SUMMARY_VERSION:
+        return None
+    return record
+
+
+# ----------------------------------------------------------------------
+# Rotation
+# ----------------------------------------------------------------------
+
+def rotate_segment(log_path: Path) -> Optional[Path]:
+    """
+    Move the open segment to segments/ as the next numbered segment, without
+    its summary yet (see summarize_segment). Sidecar files of the open log
+    (offset index, metrics checkpoint, snapshot) are removed, since they
+    describe the file that was moved. Only renames and unlinks, so it is
+    cheap enough to run with the log locked. Returns the sealed path, or
+    None if the log is missing or empty.
+    """
+    try:
+        if os.stat(log_path).st_size == 0:
+            return None
+    except FileNotFoundError:
+        return None
+
+    target = segment_path(log_path, next_segment_number(log_path))
+    target.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(log_path, target)
+
+    sidecars = (
+        index_path_for(log_path),
+        index_keys_path_for(log_path),
+        default_state_path(log_path),
+        snapshot_path_for(log_path),
+    )
+    for sidecar in sidecars:
+        try:
+            sidecar.unlink()
+        except FileNotFoundError:
+            pass
+    return target
+
+
+def summarize_segment(path: Path) -> bool:
+    """
+    Append the summary record to a sealed segment that does not end with one
+    yet. No writer appends to a sealed segment, so this needs no log lock.
+    Returns True if a summary was written.
+    """
+    if read_segment_summary(path) is not None:
+        return False
+    events = load_events(path)
+    summary = build_summary(events, _segment_number(path))
+
+    with path.open("rb+") as f:
+        # A crash could have left a partial last line; start the summary on its own line.
+        if f.seek(0, os.SEEK_END) > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+        f.write((json.dumps(summary) + "\n").encode("utf-8"))
+        f.flush()
+        os.fsync(f.fileno())
+    return True
+
+
+def seal_segment(log_path: Path) -> Optional[Path]:
+    """
+    Close the open segment: rotate_segment, then summarize_segment.
+    Returns the sealed path, or None if the log is missing or empty.
+    """
+    target = rotate_segment(log_path)
+    if target is not None:
+        summarize_segment(target)
+    return target
+
+
+def rotation_due(
+    log_path: Path,
+    max_bytes: Optional[int],
+    period_seconds: Optional[float],
+    now: Optional[float] = None,
+    st: Optional[os.stat_result] = None,
+) -> bool:
+    """
+    True if the open segment has reached max_bytes, or was last written in an
+    earlier period_seconds-long interval (UTC-aligned, e.g. 86400 = daily).
+    st: os.stat of the log if the caller already has it.
+    """
+    if st is None:
+        try:
+            st = os.stat(log_path)
+        except FileNotFoundError:
+            return False
+    if st.st_size == 0:
+        return False
+    if max_bytes and st.st_size >= max_bytes:
+        return True
+    if period_seconds:
+        now = time.time() if now is None else now
+        return int(st.st_mtime // period_seconds) != int(now // period_seconds)
+    return False
+
+
+def rotate_if_due(
+    log_path: Path,
+    max_bytes: Optional[int],
+    period_seconds: Optional[float],
+    now: Optional[float] = None,
+) -> Optional[Path]:
+    if rotation_due(log_path, max_bytes, period_seconds, now):
+        return seal_segment(log_path)
+    return None
+
+
+# ----------------------------------------------------------------------
+# Metrics over the full history
+# ----------------------------------------------------------------------
+
+def compute_history_metrics(
+    log_path: Path,
+    group_keys=DEFAULT_GROUP_KEYS,
+    starting_balance: float = 0.0,
+) -> Dict[str, Any]:
+    """
+    compute_grouped_metrics over all sealed segments plus the open log.
+
+    Sealed segments contribute only their summary record; the open segment is
+    read incrementally (IncrementalMetrics). If segments overlap in time the
+    summaries cannot be chained, and all segments are scanned instead.
+    group_keys may only contain account_id and strategy_id.
+    """
+    for key_name in group_keys:
+        if key_name not in SUMMARY_GROUP_KEYS:
+            raise ValueError(f"Cannot compute history metrics by {key_name!r}")
+
+    paths = segment_paths(log_path)
+    summaries = []
+    for path in paths:
+        summary = read_segment_summary(path)
+        if summary is None:
+            # Summary not written yet (still being built, interrupted
+            # rotation, copied in by hand).
+            summary = build_summary(load_events(path), _segment_number(path))
+        summaries.append(summary)
+
+    if not log_path.exists() and not summaries:
+        print(f"[INFO] No file found at {log_path}")
+    open_segment = IncrementalMetrics(log_path, group_keys=group_keys)
+    open_segment.update()
+
+    bounds = [(s["first_ts_us"], s["last_ts_us"]) for s in summaries if s["events"]]
+    if open_segment.aggregator.overall.total_trades:
+        bounds.append((open_segment.first_ts_us, open_segment.last_ts_us))
+    if any(prev[1] > nxt[0] for prev, nxt in zip(bounds, bounds[1:])):
+        print("[INFO] Log segments overlap in time, scanning all segments")
+        events: List[Dict[str, Any]] = []
+        for path in paths:
+            events.extend(load_events(path))
+        if log_path.exists():
+            # Only metrics are needed: read the open log's snapshot, if any.
+            events.extend(load_snapshot_events(log_path))
+        return compute_grouped_metrics(events, group_keys, starting_balance)
+
+    aggregator = GroupedMetricsAggregator(group_keys)
+    scopes = {SUMMARY_GROUP_KEYS[key_name]: key_name for key_name in group_keys}
+    for summary in summaries:
+        for entry in summary["groups"]:
+            scope = entry["scope"]
+            if scope == "all":
+                aggregator.overall.merge(_summary_accumulator(entry))
+            elif scope in scopes:
+                key_name = scopes[scope]
+                value = entry["account_id"] if scope == "account" else entry["strategy_id"]
+                groups = aggregator.groups[key_name]
+                groups.setdefault(value, MetricsAccumulator()).merge(_summary_accumulator(entry))
+
+    aggregator.overall.merge(open_segment.aggregator.overall)
+    for key_name, open_groups in open_segment.aggregator.groups.items():
+        groups = aggregator.groups[key_name]
+        for value, acc in open_groups.items():
+            groups.setdefault(value, MetricsAccumulator()).merge(acc)
+    return aggregator.results(starting_balance)
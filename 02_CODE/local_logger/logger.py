@@ -1,8 +1,22 @@
 import json
+import os
+import threading
+import time
 from pathlib import Path
 from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Sequence
 
-from trade_event_validator import validate_trade_event, TradeEventValidationError
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from event_dedup import EventIdIndex
+from json_codec import single_line
+from log_segments import rotate_segment, rotation_due, summarize_segment
+from metrics_core import append_index_records
+from trade_event_validator import check_trade_event, validate_many
 
 # Path to the "data" folder inside this local_logger directory
 DATA_DIR = Path(__file__).resolve().parent / "data"
@@ -10,28 +24,459 @@ DATA_DIR = Path(__file__).resolve().parent / "data"
 # Log file where new TRADE_EVENTs will be appended
 LOG_FILE = DATA_DIR / "trades_log.jsonl"
 
+# LOG_FILE is the open segment. Once it reaches SEGMENT_MAX_BYTES, or on the
+# first append of a new UTC day (SEGMENT_PERIOD_SECONDS), it is sealed with a
+# summary record and moved to data/segments/ (see log_segments.py).
+# Set either one to None to disable that trigger.
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+SEGMENT_PERIOD_SECONDS = 24 * 60 * 60
+
+# Durability policies of TradeLogWriter:
+#   FSYNC_NONE     - leave flushing to disk to the OS (fastest; a power loss
+#                    can lose the last writes, a process crash cannot)
+#   FSYNC_BATCH    - fsync after every write (every append / append_many)
+#   FSYNC_INTERVAL - fsync written data once fsync_interval_ms has passed
+#                    since the last fsync (on that write, or from a timer
+#                    when writes stop), and on flush() / close()
+FSYNC_NONE = "none"
+FSYNC_BATCH = "batch"
+FSYNC_INTERVAL = "interval"
+FSYNC_POLICIES = (FSYNC_NONE, FSYNC_BATCH, FSYNC_INTERVAL)
+
+# Per-event results of TradeLogWriter.append_many
+ACCEPTED = "accepted"
+DUPLICATE = "duplicate"
+
+# On close(), the writer persists its in-memory event_id tail
+# (trades_log.jsonl.ids) once it holds at least this many ids.
+DEDUP_SAVE_MIN_IDS = 10_000
 
-def append_trade_event(event: dict) -> None:
+
+def validate_for_log(event: dict) -> None:
     """
-    Append a single TRADE_EVENT object to the log file as one JSON line.
+    validate_trade_event, raising a generic ValueError instead so callers
+    (and the HTTP layer) can handle it simply.
+    """
+    error, _ = check_trade_event(event)
+    if error is not None:
+        raise ValueError(f"Invalid TRADE_EVENT: {error}")
 
-    This function assumes the event follows the TRADE_EVENT_SPEC core fields.
-    It validates the event and then appends it to LOG_FILE.
+
+def lock_path_for(log_path: Path) -> Path:
+    """
+    Lock file shared by all writers of a log: trades_log.jsonl -> trades_log.jsonl.lock
+    (a separate file, so the lock survives rotation of the log itself).
+    """
+    return log_path.with_name(log_path.name + ".lock")
+
+
+class TradeLogWriter:
+    """
+    Long-lived appender for a .jsonl trade log.
+
+    The log stays open between writes. Each write (append, append_many or a
+    buffer flush) is serialized into one buffer and written with the log
+    locked (fcntl.flock, msvcrt.locking on Windows), so concurrent writers -
+    threads or processes - never interleave partial lines. Under the same
+    lock the writer rolls the log over to a new segment when due and appends
+    the offset index records of the new lines.
+
+    buffer_events > 1 turns on buffered mode: events are validated and
+    serialized at append time but only written once buffer_events are queued,
+    or on flush() / close(). Buffered events are lost if the process dies
+    before that. If a write fails, events queued by earlier calls stay
+    queued for the next one; the failing call's own events are dropped (its
+    caller gets the exception).
+
+    With dedup=True (default) an event whose event_id is already in the log
+    (any segment, any writer) is not written and reported as DUPLICATE; see
+    event_dedup.EventIdIndex. In buffered mode an event reported ACCEPTED is
+    still dropped if another writer logs the same event_id before the batch
+    is written.
     """
-    # Validate the event according to our central validator
-    try:
-        validate_trade_event(event)
-    except TradeEventValidationError as e:
-        # Re-raise as a generic ValueError so callers (and HTTP layer) can handle it simply
-        raise ValueError(f"Invalid TRADE_EVENT: {e}") from e
 
-    # Make sure the data directory exists
-    DATA_DIR.mkdir(exist_ok=True)
+    def __init__(
+        self,
+        log_path: Optional[Path] = None,
+        fsync: str = FSYNC_NONE,
+        fsync_interval_ms: int = 1000,
+        buffer_events: int = 1,
+        dedup: bool = True,
+    ) -> None:
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy {fsync!r}. Expected one of {FSYNC_POLICIES}")
+        self.log_path = Path(log_path) if log_path else LOG_FILE
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval_ms / 1000.0
+        self.buffer_events = max(1, buffer_events)
+        self._pending: List[bytes] = []
+        self._pending_events: List[dict] = []
+        self._pending_ids = set()
+        self._dedup = EventIdIndex(self.log_path) if dedup else None
+        self._last_sync = time.monotonic()
+        self._dirty = False  # written since the last fsync
+        self._sync_timer: Optional[threading.Timer] = None
+        self._mutex = threading.Lock()
+        self._file = None
+        self._file_id = None
+        self._lock_file = None
+        self._summarizers: List[threading.Thread] = []
+
+        # Counters for the logger service's /internal/stats (see stats()).
+        self.writes = 0
+        self.events_written = 0
+        self.fsyncs = 0
+
+    def __enter__(self) -> "TradeLogWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    # ------------------------------------------------------------------
+    # Files and locking
+    # ------------------------------------------------------------------
+
+    def _open_log(self) -> None:
+        self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self.log_path.open("ab", buffering=0)
+        st = os.fstat(self._file.fileno())
+        self._file_id = (st.st_dev, st.st_ino)
+
+    def _close_log(self) -> None:
+        if self._file is not None:
+            try:
+                if self._dirty:
+                    self._sync()
+            finally:
+                self._file.close()
+                self._file = None
+                self._dirty = False
+
+    def _lock(self) -> None:
+        if self._lock_file is None:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            self._lock_file = lock_path_for(self.log_path).open("a+b")
+        fd = self._lock_file.fileno()
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            return
+        self._lock_file.seek(0)
+        while True:
+            try:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue  # LK_LOCK gives up after ~10s; keep waiting
+
+    def _unlock(self) -> None:
+        fd = self._lock_file.fileno()
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        else:
+            self._lock_file.seek(0)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+    def _current_log(self) -> None:
+        """
+        (Re)open the log if another writer rotated or removed it since we
+        opened it, and roll it over ourselves if a rotation is due (one stat
+        call answers both). Called with the lock held.
+        """
+        try:
+            current = os.stat(self.log_path)
+        except FileNotFoundError:
+            current = None
+        if self._file is not None and (
+            current is None or (current.st_dev, current.st_ino) != self._file_id
+        ):
+            self._close_log()
+        if current is not None and rotation_due(
+            self.log_path, SEGMENT_MAX_BYTES, SEGMENT_PERIOD_SECONDS, st=current
+        ):
+            # Closed first: an open file cannot be renamed on Windows.
+            self._close_log()
+            sealed = rotate_segment(self.log_path)
+            if sealed is not None:
+                self._summarize_later(sealed)
+        if self._file is None:
+            self._open_log()
+
+    def _summarize_later(self, path: Path) -> None:
+        """
+        Append the summary of a segment we just sealed from a background
+        thread: it reads the whole segment (up to SEGMENT_MAX_BYTES), which
+        must not happen inside an append or with the log locked. Until it is
+        written, compute_history_metrics scans the segment instead.
+        """
+        self._summarizers = [t for t in self._summarizers if t.is_alive()]
+        thread = threading.Thread(
+            target=self._summarize, args=(path,), name="trueedge-summarize"
+        )
+        thread.start()
+        self._summarizers.append(thread)
+
+    @staticmethod
+    def _summarize(path: Path) -> None:
+        try:
+            summarize_segment(path)
+        except OSError as e:
+            print(f"[WARN] Could not write the summary of {path.name}: {e}")
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def append(self, event: dict, raw: Optional[bytes] = None) -> str:
+        """
+        Validate and append one TRADE_EVENT. Returns ACCEPTED or DUPLICATE.
+        raw: the event's JSON as received, logged verbatim (see append_many).
+        """
+        return self.append_many([event], None if raw is None else [raw])[0]
 
-    # Open the log file in append mode and write one JSON object per line
-    with LOG_FILE.open("a", encoding="utf-8") as f:
-        json.dump(event, f, ensure_ascii=False)
-        f.write("\n")
+    def append_many(
+        self, events: Iterable[dict], raws: Optional[Sequence[Optional[bytes]]] = None
+    ) -> List[str]:
+        """
+        Validate and append several TRADE_EVENTs with a single write.
+        If any event is invalid, none of them are appended (ValueError).
+        Returns ACCEPTED or DUPLICATE for each event (a repeated event_id
+        within the call counts as a duplicate too).
+
+        raws, if given, holds each event's JSON exactly as received (e.g. an
+        HTTP body); it is logged as is instead of re-serializing the event,
+        unless it spans several lines.
+        """
+        events = list(events)
+        errors, _ = validate_many(events)
+        for error in errors:
+            if error is not None:
+                raise ValueError(f"Invalid TRADE_EVENT: {error}")
+        if raws is None:
+            raws = [None] * len(events)
+        lines = []
+        for event, raw in zip(events, raws):
+            text = single_line(raw) if raw is not None else None
+            if text is None:
+                text = json.dumps(event, ensure_ascii=False)
+            lines.append((text + "\n").encode("utf-8"))
+
+        with self._mutex:
+            dedup = self._dedup
+            if dedup is not None and not dedup.loaded:
+                dedup.load()
+            # Unbuffered writes are only checked with the log locked, below.
+            check_index = dedup is not None and self.buffer_events > 1
+            first = len(self._pending)
+            statuses = []
+            for event, line in zip(events, lines):
+                if dedup is not None:
+                    event_id = str(event.get("event_id"))
+                    if event_id in self._pending_ids or (check_index and dedup.contains(event_id)):
+                        statuses.append(DUPLICATE)
+                        continue
+                    self._pending_ids.add(event_id)
+                statuses.append(ACCEPTED)
+                self._pending.append(line)
+                self._pending_events.append(event)
+
+            if len(self._pending) >= self.buffer_events:
+                # Checked again with the log locked: another writer may have
+                # logged the same event_id in the meantime.
+                try:
+                    written = iter(self._write_pending()[first:])
+                except BaseException:
+                    self._drop_pending(first)
+                    raise
+                statuses = [next(written) if status == ACCEPTED else status for status in statuses]
+        return statuses
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Buffered events and write counters (flat names, *_total are counters).
+        """
+        return {
+            "log_buffered_events": len(self._pending),
+            "log_writes_total": self.writes,
+            "log_events_written_total": self.events_written,
+            "log_fsyncs_total": self.fsyncs,
+        }
+
+    def flush(self) -> None:
+        """
+        Write out buffered events and fsync (unless the policy is FSYNC_NONE).
+        """
+        with self._mutex:
+            self._write_pending(force_sync=True)
+
+    def _drop_pending(self, first: int) -> None:
+        """
+        Unqueue the events queued from index first on.
+        """
+        for event in self._pending_events[first:]:
+            self._pending_ids.discard(str(event.get("event_id")))
+        del self._pending[first:]
+        del self._pending_events[first:]
+
+    def _sync(self) -> None:
+        os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+        self._dirty = False
+        self.fsyncs += 1
+
+    def _schedule_sync(self) -> None:
+        """
+        FSYNC_INTERVAL: make sure a timer fsyncs the data just written once
+        fsync_interval_ms has passed since the last fsync, even if no further
+        write comes to do it.
+        """
+        if self._sync_timer is not None and self._sync_timer.is_alive():
+            return  # armed; it syncs whatever is dirty when it fires
+        delay = max(0.0, self._last_sync + self.fsync_interval - time.monotonic())
+        self._sync_timer = threading.Timer(delay, self._sync_if_dirty)
+        self._sync_timer.daemon = True
+        self._sync_timer.start()
+
+    def _sync_if_dirty(self) -> None:
+        with self._mutex:
+            if not self._dirty or self._file is None:
+                return
+            try:
+                self._sync()
+            except OSError as e:
+                print(f"[WARN] fsync of {self.log_path.name} failed: {e}")
+
+    def _write_pending(self, force_sync: bool = False) -> List[str]:
+        """
+        Write the queued events; returns ACCEPTED or DUPLICATE for each.
+        They are unqueued once written (or found to be duplicates); if
+        anything before that raises, they stay queued.
+        """
+        lines, events = self._pending, self._pending_events
+        if not lines:
+            if force_sync and self._file is not None and self.fsync != FSYNC_NONE:
+                self._sync()
+            return []
+        statuses = [ACCEPTED] * len(lines)
+
+        if self._dedup is not None:
+            # Read what other writers logged before taking the lock, so only
+            # the last few lines are left to read while holding it.
+            try:
+                self._dedup.catch_up()
+            except OSError:
+                pass  # log being rotated; done again below
+
+        self._lock()
+        try:
+            self._current_log()
+            if self._dedup is not None:
+                self._dedup.catch_up()
+                event_ids = [str(event.get("event_id")) for event in events]
+                for i, event_id in enumerate(event_ids):
+                    if self._dedup.contains(event_id):
+                        statuses[i] = DUPLICATE
+                if DUPLICATE in statuses:
+                    keep = [i for i, status in enumerate(statuses) if status == ACCEPTED]
+                    lines = [lines[i] for i in keep]
+                    events = [events[i] for i in keep]
+                    event_ids = [event_ids[i] for i in keep]
+                if not lines:
+                    self._pending, self._pending_events, self._pending_ids = [], [], set()
+                    return statuses
+            data = b"".join(lines)
+
+            # The file is unbuffered and in append mode; a short write is
+            # continued, and the lock keeps other writers out meanwhile.
+            view = memoryview(data)
+            while view:
+                written = self._file.write(view)
+                view = view[written:]
+            self._pending, self._pending_events, self._pending_ids = [], [], set()
+            end_offset = self._file.tell()
+            self.writes += 1
+            self.events_written += len(lines)
+            if self.fsync == FSYNC_BATCH or (
+                self.fsync == FSYNC_INTERVAL
+                and (force_sync or time.monotonic() - self._last_sync >= self.fsync_interval)
+            ):
+                self._sync()
+            elif self.fsync == FSYNC_INTERVAL:
+                self._dirty = True
+                self._schedule_sync()
+
+            # Keep the sidecar offset index (trades_log.jsonl.idx) up to date
+            append_index_records(
+                self.log_path,
+                end_offset - len(data),
+                [(len(line), event) for line, event in zip(lines, events)],
+            )
+            if self._dedup is not None:
+                self._dedup.appended(self._file, end_offset - len(data), lines, event_ids)
+                self._dedup.maybe_save()
+        finally:
+            self._unlock()
+        return statuses
+
+    def close(self) -> None:
+        """
+        Flush buffered events, close the log and wait for segment summaries
+        still being written.
+        """
+        with self._mutex:
+            try:
+                self._write_pending(force_sync=True)
+                if self._dedup is not None and self._dedup.tail_ids >= DEDUP_SAVE_MIN_IDS:
+                    self._lock()
+                    try:
+                        self._dedup.catch_up()
+                        self._dedup.save()
+                    finally:
+                        self._unlock()
+            finally:
+                if self._sync_timer is not None:
+                    self._sync_timer.cancel()
+                    self._sync_timer = None
+                if self._dedup is not None:
+                    self._dedup.close()
+                self._close_log()
+                if self._lock_file is not None:
+                    self._lock_file.close()
+                    self._lock_file = None
+                for thread in self._summarizers:
+                    thread.join()
+                self._summarizers = []
+
+
+_default_writer: Optional[TradeLogWriter] = None
+_default_writer_mutex = threading.Lock()
+
+
+def default_writer() -> TradeLogWriter:
+    """
+    Process-wide unbuffered TradeLogWriter for LOG_FILE.
+    """
+    global _default_writer
+    with _default_writer_mutex:
+        if _default_writer is None or _default_writer.log_path != LOG_FILE:
+            if _default_writer is not None:
+                _default_writer.close()
+            _default_writer = TradeLogWriter(LOG_FILE)
+        return _default_writer
+
+
+def append_trade_event(event: dict) -> str:
+    """
+    Append a single TRADE_EVENT object to the log file as one JSON line.
+
+    This function assumes the event follows the TRADE_EVENT_SPEC core fields.
+    It validates the event and then appends it to LOG_FILE through the shared
+    default_writer(). Use a TradeLogWriter directly to append many events.
+
+    Returns ACCEPTED, or DUPLICATE (nothing written) if an event with the
+    same event_id is already in the log.
+    """
+    return default_writer().append(event)
 
 
 def build_demo_event() -> dict:
@@ -78,8 +523,10 @@ def main() -> None:
     - Prints basic info to the console.
     """
     event = build_demo_event()
-    append_trade_event(event)
-    print(f"Appended trade event: {event['event_id']}")
+    if append_trade_event(event) == DUPLICATE:
+        print(f"Duplicate trade event, not appended: {event['event_id']}")
+    else:
+        print(f"Appended trade event: {event['event_id']}")
     print(f"Log file location: {LOG_FILE}")
 
 
@@ -1,46 +1,120 @@
 import json
 from http.server import HTTPServer, BaseHTTPRequestHandler
+from typing import Callable, Optional
+from urllib.parse import parse_qs, urlparse
 
-from logger import append_trade_event
+from http_compression import BodyDecodeError, BodyTooLarge, UnsupportedEncoding, read_body
+from instrumentation import RequestTimer, http_stats_registry, record_request
+import json_codec
+from logger import DUPLICATE, FSYNC_NONE, TradeLogWriter
+
+
+# Largest accepted request body after decoding (one TRADE_EVENT is ~0.5 KB).
+MAX_BODY_BYTES = 1024 * 1024
+
+# Paths reported by name in /internal/stats (anything else is "other").
+STATS_ENDPOINTS = {"/trade_event", "/internal/stats"}
 
 
 class TradeEventHandler(BaseHTTPRequestHandler):
     """
     Simple HTTP handler for receiving TRADE_EVENT objects via POST.
 
-    - Accepts POST /trade_event with JSON body.
-    - Validates and appends the event using append_trade_event.
-    - Returns a JSON response with status.
+    - Accepts POST /trade_event with JSON body (optionally Content-Encoding: gzip).
+    - Validates and appends the event using the server's TradeLogWriter.
+    - Returns a JSON response with status ("ok", "duplicate" or "error").
+    - GET /internal/stats reports request counts, latency percentiles and
+      time per phase (format=json or format=prometheus).
     """
 
-    def _set_headers(self, status_code: int = 200):
+    def _set_headers(
+        self, status_code: int = 200, content_type: str = "application/json; charset=utf-8"
+    ):
         self.send_response(status_code)
-        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Type", content_type)
         self.end_headers()
 
+    def send_response(self, code: int, message: Optional[str] = None) -> None:
+        self._status = code  # for the request stats
+        super().send_response(code, message)
+
+    def _instrumented(self, method: str, handle: Callable[[], None]) -> None:
+        self.timer = RequestTimer()
+        self._status = None
+        try:
+            handle()
+        finally:
+            stats = getattr(self.server, "stats", None)
+            if stats is not None:
+                endpoint = urlparse(self.path).path
+                endpoint = endpoint if endpoint in STATS_ENDPOINTS else "other"
+                record_request(stats, method, endpoint, self._status, self.timer)
+
+    def do_GET(self):
+        self._instrumented("GET", self._handle_get)
+
+    def _handle_get(self):
+        parsed = urlparse(self.path)
+        stats = getattr(self.server, "stats", None)
+        if parsed.path != "/internal/stats" or stats is None:
+            self._set_headers(404)
+            resp = {"status": "error", "message": "Not found"}
+            self.wfile.write(json.dumps(resp).encode("utf-8"))
+            return
+
+        fmt = parse_qs(parsed.query).get("format", ["json"])[0]
+        if fmt == "prometheus":
+            self._set_headers(200, "text/plain; version=0.0.4; charset=utf-8")
+            self.wfile.write(stats.to_prometheus().encode("utf-8"))
+            return
+        self._set_headers(200)
+        resp = {"status": "ok", "service": "trueedge_logger", **stats.to_dict()}
+        self.wfile.write(json.dumps(resp).encode("utf-8"))
+
     def do_POST(self):
+        self._instrumented("POST", self._handle_post)
+
+    def _handle_post(self):
         if self.path != "/trade_event":
             self._set_headers(404)
             resp = {"status": "error", "message": "Not found"}
             self.wfile.write(json.dumps(resp).encode("utf-8"))
             return
 
-        # Read request body
-        content_length = int(self.headers.get("Content-Length", 0))
-        body = self.rfile.read(content_length)
+        # Read request body (decompressed with a size limit if gzipped)
+        try:
+            content_length = int(self.headers.get("Content-Length", 0))
+            with self.timer.phase("read"):
+                body = read_body(
+                    self.rfile, content_length, self.headers.get("Content-Encoding"), MAX_BODY_BYTES
+                )
+        except (ValueError, BodyDecodeError) as e:
+            if isinstance(e, BodyTooLarge):
+                status_code = 413
+            elif isinstance(e, UnsupportedEncoding):
+                status_code = 415
+            else:
+                status_code = 400
+            self._set_headers(status_code)
+            resp = {"status": "error", "message": str(e)}
+            self.wfile.write(json.dumps(resp).encode("utf-8"))
+            return
 
-        # Parse JSON
+        # Parse JSON (once; the body itself is what gets logged)
         try:
-            event = json.loads(body.decode("utf-8"))
-        except json.JSONDecodeError:
+            with self.timer.phase("parse"):
+                event = json_codec.loads(body)
+        except json_codec.DecodeError:
             self._set_headers(400)
             resp = {"status": "error", "message": "Invalid JSON"}
             self.wfile.write(json.dumps(resp).encode("utf-8"))
             return
 
-        # Try to append the trade event using our existing logger
+        # Try to append the trade event through the long-lived log writer
         try:
-            append_trade_event(event)
+            # Validation happens inside append (TradeLogWriter.append_many).
+            with self.timer.phase("append"):
+                status = self.server.writer.append(event, raw=body)
         except Exception as e:
             # Any validation or logging error becomes a 400 response
             self._set_headers(400)
@@ -48,6 +122,17 @@ class TradeEventHandler(BaseHTTPRequestHandler):
             self.wfile.write(json.dumps(resp).encode("utf-8"))
             return
 
+        # Already logged (e.g. a connector retry): nothing was written
+        if status == DUPLICATE:
+            self._set_headers(409)
+            resp = {
+                "status": "duplicate",
+                "message": "Event with this event_id already exists in the log",
+                "event_id": event.get("event_id"),
+            }
+            self.wfile.write(json.dumps(resp).encode("utf-8"))
+            return
+
         # Success
         self._set_headers(200)
         resp = {"status": "ok"}
@@ -58,11 +143,19 @@ class TradeEventHandler(BaseHTTPRequestHandler):
         return  # comment this out if you want default access logs
 
 
-def run_server(host: str = "127.0.0.1", port: int = 8080):
+def run_server(host: str = "127.0.0.1", port: int = 8080, fsync: str = FSYNC_NONE):
+    """
+    fsync is the durability policy of the log writer (see logger.FSYNC_*);
+    with FSYNC_BATCH an event is on disk before its "ok" response.
+    """
     server_address = (host, port)
     httpd = HTTPServer(server_address, TradeEventHandler)
+    httpd.writer = TradeLogWriter(fsync=fsync)
+    httpd.stats = http_stats_registry()
+    httpd.stats.add_collector(httpd.writer.stats)
     print(f"TRUEEDGE logger service running on http://{host}:{port}")
     print("POST TRADE_EVENT JSON to /trade_event to log an event.")
+    print("GET /internal/stats (?format=prometheus) for request stats.")
     print("Press Ctrl+C in this window to stop the server.")
 
     try:
@@ -71,6 +164,7 @@ def run_server(host: str = "127.0.0.1", port: int = 8080):
         print("\nStopping server...")
     finally:
         httpd.server_close()
+        httpd.writer.close()
         print("Server stopped.")
 
 
@@ -1,6 +1,9 @@
+import argparse
 from pathlib import Path
+from typing import List, Optional
 
-from metrics_core import load_events, compute_metrics, group_by_key
+from log_segments import compute_history_metrics, segment_paths
+from metrics_core import compute_metrics, query_events
 
 
 DATA_DIR = Path(__file__).resolve().parent / "data"
@@ -18,34 +21,65 @@ def print_metrics_block(title: str, metrics: dict):
     print()
 
 
-def main():
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="TRUEEDGE metrics by strategy/account")
+    parser.add_argument("--strategy-id", help="only report this strategy_id")
+    parser.add_argument("--account-id", help="only report this account_id")
+    return parser.parse_args(argv)
+
+
+def print_filtered_metrics(strategy_id: Optional[str], account_id: Optional[str]):
+    """
+    Metrics for one strategy and/or account, reading only the matching lines
+    of each segment through its sidecar offset index (trades_log.jsonl.idx).
+    """
+    events = []
+    for path in segment_paths(LOG_FILE) + [LOG_FILE]:
+        if path.exists():
+            events.extend(query_events(path, strategy_id=strategy_id, account_id=account_id))
+    filters = ", ".join(
+        f"{name} = {value}"
+        for name, value in (("strategy_id", strategy_id), ("account_id", account_id))
+        if value is not None
+    )
+    if not events:
+        print(f"[INFO] No events found in {LOG_FILE} for {filters}")
+        return
+    print_metrics_block(filters, compute_metrics(events, starting_balance=0.0))
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
     print("TRUEEDGE metrics by strategy/account")
     print("=" * 40)
 
-    events = load_events(LOG_FILE)
-    if not events:
+    if args.strategy_id is not None or args.account_id is not None:
+        print_filtered_metrics(args.strategy_id, args.account_id)
+        return
+
+    # Overall, by strategy_id and by account_id; sealed segments contribute
+    # their summary record, the open one is read incrementally (see log_segments)
+    results = compute_history_metrics(
+        LOG_FILE, group_keys=("strategy_id", "account_id"), starting_balance=0.0
+    )
+    if results["overall"]["total_trades"] == 0:
         print(f"[INFO] No events found in {LOG_FILE}")
         print("[HINT] Run logger.py, simulate_trades.py, or send_test_trade.py first.")
         return
 
     # Overall metrics
-    overall_metrics = compute_metrics(events, starting_balance=0.0)
-    print_metrics_block(f"OVERALL metrics for {LOG_FILE.name}", overall_metrics)
+    print_metrics_block(f"OVERALL metrics for {LOG_FILE.name}", results["overall"])
 
     # Metrics by strategy_id
     print("Metrics by strategy_id")
     print("----------------------")
-    by_strategy = group_by_key(events, "strategy_id")
-    for strat_id, strat_events in by_strategy.items():
-        m = compute_metrics(strat_events, starting_balance=0.0)
+    for strat_id, m in results["groups"]["strategy_id"].items():
         print_metrics_block(f"strategy_id = {strat_id}", m)
 
     # Metrics by account_id
     print("Metrics by account_id")
     print("---------------------")
-    by_account = group_by_key(events, "account_id")
-    for acc_id, acc_events in by_account.items():
-        m = compute_metrics(acc_events, starting_balance=0.0)
+    for acc_id, m in results["groups"]["account_id"].items():
         print_metrics_block(f"account_id = {acc_id}", m)
 
 
@@ -1,7 +1,40 @@
+import bisect
+import hashlib
 import json
+import mmap
+import os
+import struct
+import sys
+from array import array
 from pathlib import Path
-from datetime import datetime
-from typing import List, Dict, Any
+from datetime import datetime, timedelta, timezone
+from itertools import chain, islice
+from typing import List, Dict, Any, Iterator, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the pure-Python engine always works
+    np = None
+
+
+# Metrics engine: "python", "numpy", or "auto" (NumPy when installed and the
+# input has at least NUMPY_MIN_EVENTS events; below that, conversion to arrays
+# costs more than it saves).
+METRICS_ENGINE = "auto"
+NUMPY_MIN_EVENTS = 2000
+
+# Logs are read in blocks of this many events (LogCheckpoint.read_blocks), so
+# memory stays bounded however much was appended since the last run.
+LOG_BLOCK_EVENTS = 50_000
+
+# record_type of the summary record that ends a sealed log segment
+# (log_segments.py); it is not a trade and is skipped by every reader.
+SEGMENT_SUMMARY_RECORD = "SEGMENT_SUMMARY"
+
+# Sort key used for missing/unparseable timestamps (sorts before any real one).
+TIMESTAMP_MIN_US = -(2 ** 62)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
 
 
 def load_events(path: Path) -> List[Dict[str, Any]]:
@@ -20,34 +53,294 @@ def load_events(path: Path) -> List[Dict[str, Any]]:
             if not line:
                 continue
             try:
-                events.append(json.loads(line))
+                event = json.loads(line)
             except json.JSONDecodeError as e:
                 print(f"[WARN] Skipping invalid line in {path.name}: {e}")
+                continue
+            if not is_segment_summary(event):
+                events.append(event)
     return events
 
 
+def is_segment_summary(record: Any) -> bool:
+    """
+    True for the summary record closing a sealed log segment.
+    """
+    return isinstance(record, dict) and record.get("record_type") == SEGMENT_SUMMARY_RECORD
+
+
+def line_hash(line: bytes) -> str:
+    return hashlib.sha256(line).hexdigest()
+
+
+class LogCheckpoint:
+    """
+    Position in an append-only .jsonl log: file identity, byte offset of the
+    first unread line, file size when taken, and the start and hash of the
+    last line read (to detect truncation, rotation or rewrites).
+    """
+
+    FIELDS = ("device", "inode", "offset", "size", "last_line_start", "last_line_hash")
+
+    def __init__(self) -> None:
+        self.device = None
+        self.inode = None
+        self.offset = 0
+        self.size = 0
+        self.last_line_start = 0
+        self.last_line_hash = ""
+
+    @classmethod
+    def start_of(cls, st: os.stat_result) -> "LogCheckpoint":
+        """
+        Checkpoint at offset 0 of the file described by st.
+        """
+        checkpoint = cls()
+        checkpoint.device, checkpoint.inode = st.st_dev, st.st_ino
+        return checkpoint
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LogCheckpoint":
+        checkpoint = cls()
+        for name in cls.FIELDS:
+            setattr(checkpoint, name, data[name])
+        return checkpoint
+
+    def matches(self, log_path: Path, st: os.stat_result) -> bool:
+        """
+        True if the log is still the file the checkpoint was taken from: same
+        identity, not shorter than the offset, and the last line read unchanged.
+        """
+        if (st.st_dev, st.st_ino) != (self.device, self.inode):
+            return False  # rotated or replaced
+        if st.st_size < self.offset:
+            return False  # truncated
+        if self.offset == 0:
+            return True
+        with log_path.open("rb") as f:
+            f.seek(self.last_line_start)
+            last_line = f.read(self.offset - self.last_line_start)
+        return line_hash(last_line) == self.last_line_hash
+
+    def read_blocks(
+        self, f, block_events: int = LOG_BLOCK_EVENTS, log_name: str = ""
+    ) -> Iterator[Tuple[List[Dict[str, Any]], int, int, bytes]]:
+        """
+        Yield (events, end_offset, last_line_start, last_line) for blocks of
+        complete lines of the binary file f, starting at self.offset. A final
+        line without a newline is only consumed if it parses (otherwise it is
+        probably still being written and is picked up by the next run).
+        Pass a block's last three values to advance() once it is consumed.
+        """
+        f.seek(self.offset)
+        position = block_start = self.offset
+        last_line_start = self.last_line_start
+        last_line = b""
+        events: List[Dict[str, Any]] = []
+
+        for line in f:
+            if not line.endswith(b"\n"):
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    break
+                if not is_segment_summary(event):
+                    events.append(event)
+            else:
+                stripped = line.strip()
+                if stripped:
+                    try:
+                        event = json.loads(stripped)
+                    except ValueError as e:
+                        print(f"[WARN] Skipping invalid line in {log_name}: {e}")
+                    else:
+                        if not is_segment_summary(event):
+                            events.append(event)
+            last_line_start = position
+            last_line = line
+            position += len(line)
+
+            if len(events) >= block_events:
+                yield events, position, last_line_start, last_line
+                events = []
+                block_start = position
+
+        if position != block_start:
+            yield events, position, last_line_start, last_line
+
+    def advance(self, end_offset: int, last_line_start: int, last_line: bytes) -> None:
+        self.offset = end_offset
+        self.last_line_start = last_line_start
+        self.last_line_hash = line_hash(last_line)
+
+
 def sort_events(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
     Sort events by their timestamp field (ISO 8601 expected).
-    If parsing fails, those events fall back to minimal datetime.
+    If parsing fails, those events sort first (TIMESTAMP_MIN_US).
+
+    Each timestamp is parsed once (timestamp_keys). Input that is already in
+    time order - the normal case for an append-only log - is returned as a
+    copy without sorting; otherwise the sort is stable, so events with equal
+    timestamps keep their file order.
+    """
+    keys = timestamp_keys(events)
+    if keys_are_sorted(keys):
+        return list(events)
+    order = sorted(range(len(events)), key=keys.__getitem__)
+    return [events[i] for i in order]
+
+
+def timestamp_keys(events: List[Dict[str, Any]]) -> List[int]:
+    """
+    parse_timestamp_us of every event's "timestamp", in input order.
+    """
+    parse = parse_timestamp_us
+    return [parse(ev.get("timestamp")) for ev in events]
+
+
+def keys_are_sorted(keys: List[int]) -> bool:
+    """
+    O(n) check that keys are non-decreasing.
+    """
+    return all(a <= b for a, b in zip(keys, islice(keys, 1, None)))
+
+
+# Memo for parse_timestamp_us: events written in one batch often share a
+# timestamp, and the same log is parsed by several reports. Cleared when full.
+TIMESTAMP_CACHE_SIZE = 65536
+_timestamp_cache: Dict[str, int] = {}
+_ONE_US = timedelta(microseconds=1)
+_fromisoformat = datetime.fromisoformat
+
+
+def parse_timestamp_us(ts: Any) -> int:
     """
+    Convert an ISO 8601 timestamp into integer microseconds since the Unix epoch.
 
-    def parse_ts(ev: Dict[str, Any]) -> datetime:
-        ts = ev.get("timestamp")
-        if not ts:
-            return datetime.min
+    Timestamps without a timezone are treated as UTC. Missing or unparseable
+    values return TIMESTAMP_MIN_US, so they sort first (like sort_events).
+    """
+    if not ts:
+        return TIMESTAMP_MIN_US
+    if isinstance(ts, str):
+        us = _timestamp_cache.get(ts)
+        if us is not None:
+            return us
+    try:
+        # datetime.fromisoformat (C) is the fast path for the canonical
+        # YYYY-MM-DDTHH:MM:SS[.fff]Z shape; a "Z" suffix is only accepted
+        # natively from Python 3.11 on.
+        dt = _fromisoformat(ts)
+    except (TypeError, ValueError):
+        if not (isinstance(ts, str) and ts.endswith("Z")):
+            return TIMESTAMP_MIN_US
         try:
-            if isinstance(ts, str) and ts.endswith("Z"):
-                ts = ts.replace("Z", "+00:00")
-            return datetime.fromisoformat(ts)
-        except Exception:
-            return datetime.min
+            dt = _fromisoformat(ts[:-1] + "+00:00")
+        except ValueError:
+            return TIMESTAMP_MIN_US
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    us = (dt - _EPOCH) // _ONE_US
+
+    if len(_timestamp_cache) >= TIMESTAMP_CACHE_SIZE:
+        _timestamp_cache.clear()
+    _timestamp_cache[ts] = us
+    return us
 
-    return sorted(events, key=parse_ts)
+
+def format_timestamp_us(ts_us: int) -> Optional[str]:
+    """
+    Inverse of parse_timestamp_us: ISO 8601 UTC with a "Z" suffix, or None
+    for TIMESTAMP_MIN_US.
+    """
+    if ts_us == TIMESTAMP_MIN_US:
+        return None
+    return (_EPOCH + timedelta(microseconds=ts_us)).isoformat().replace("+00:00", "Z")
+
+
+def build_metrics(
+    total_trades: int,
+    total_pnl: float,
+    max_drawdown: float,
+    wins: int,
+    losses: int,
+    starting_balance: float = 0.0,
+) -> Dict[str, Any]:
+    """
+    Build the metrics dict returned by compute_metrics from precomputed totals.
+    Used wherever metrics come from aggregates instead of an event list.
+    """
+    win_rate = (wins / total_trades * 100.0) if total_trades > 0 else 0.0
+    return {
+        "total_trades": total_trades,
+        "total_pnl": round(total_pnl, 2),
+        "ending_equity": round(starting_balance + total_pnl, 2),
+        "max_drawdown": round(max_drawdown, 2),
+        "wins": wins,
+        "losses": losses,
+        "win_rate": round(win_rate, 2),
+    }
+
+
+def use_numpy_engine(engine: Optional[str], num_events: int) -> bool:
+    engine = engine or METRICS_ENGINE
+    if engine not in ("auto", "python", "numpy"):
+        raise ValueError(f"Unknown metrics engine: {engine!r}")
+    if np is None or engine == "python":
+        return False
+    return engine == "numpy" or num_events >= NUMPY_MIN_EVENTS
+
+
+def events_to_columns(events: List[Dict[str, Any]]):
+    """
+    Convert events once into NumPy columns: (pnl float64, timestamp_us int64).
+    Requires NumPy.
+    """
+    n = len(events)
+    pnl = np.fromiter((float(ev.get("pnl", 0.0)) for ev in events), dtype=np.float64, count=n)
+    ts = np.fromiter(timestamp_keys(events), dtype=np.int64, count=n)
+    return pnl, ts
+
+
+def _curve_drawdown(pnl_sorted) -> tuple:
+    """
+    (total_pnl, max_drawdown) of one time-ordered pnl array, vectorized.
+    """
+    equity = np.cumsum(pnl_sorted)
+    peak = np.maximum.accumulate(equity)
+    return float(equity[-1]), float((peak - equity).max())
+
+
+def compute_metrics_columns(
+    pnl, timestamps_us, starting_balance: float = 0.0
+) -> Dict[str, Any]:
+    """
+    compute_metrics over columnar input (NumPy arrays of pnl and epoch-us
+    timestamps, in any order). Equity is a cumsum, the running peak a
+    maximum.accumulate, wins/losses/drawdown vectorized reductions.
+    """
+    total_trades = int(pnl.shape[0])
+    if total_trades == 0:
+        return build_metrics(0, 0.0, 0.0, 0, 0, starting_balance)
+
+    if total_trades > 1 and not (np.diff(timestamps_us) >= 0).all():
+        pnl = pnl[np.argsort(timestamps_us, kind="stable")]
+    total_pnl, max_drawdown = _curve_drawdown(pnl)
+    wins = int(np.count_nonzero(pnl > 0))
+    losses = int(np.count_nonzero(pnl < 0))
+    return build_metrics(
+        total_trades, total_pnl, max_drawdown, wins, losses, starting_balance
+    )
 
 
 def compute_metrics(
-    events: List[Dict[str, Any]], starting_balance: float = 0.0
+    events: List[Dict[str, Any]],
+    starting_balance: float = 0.0,
+    engine: Optional[str] = None,
 ) -> Dict[str, Any]:
     """
     Compute simple metrics from a list of TRADE_EVENT dicts:
@@ -56,7 +349,14 @@ def compute_metrics(
     - ending_equity
     - max_drawdown (simple peak-to-trough)
     - wins, losses, win_rate
+
+    engine: "python", "numpy" or "auto" (default: METRICS_ENGINE). Both
+    engines agree up to float rounding; without NumPy "python" is used.
     """
+    if use_numpy_engine(engine, len(events)):
+        pnl, ts = events_to_columns(events)
+        return compute_metrics_columns(pnl, ts, starting_balance)
+
     total_trades = len(events)
     total_pnl = 0.0
     equity = starting_balance
@@ -80,17 +380,18 @@ def compute_metrics(
 
     wins = sum(1 for ev in events if float(ev.get("pnl", 0.0)) > 0)
     losses = sum(1 for ev in events if float(ev.get("pnl", 0.0)) < 0)
-    win_rate = (wins / total_trades * 100.0) if total_trades > 0 else 0.0
 
-    return {
-        "total_trades": total_trades,
-        "total_pnl": round(total_pnl, 2),
-        "ending_equity": round(starting_balance + total_pnl, 2),
-        "max_drawdown": round(max_drawdown, 2),
-        "wins": wins,
-        "losses": losses,
-        "win_rate": round(win_rate, 2),
-    }
+    return build_metrics(
+        total_trades, total_pnl, max_drawdown, wins, losses, starting_balance
+    )
+
+
+def group_value(value: Any) -> str:
+    """
+    Group key for a field value: missing and null both become "<UNKNOWN>"
+    (a columnar snapshot cannot tell them apart), anything else its str().
+    """
+    return "<UNKNOWN>" if value is None else str(value)
 
 
 def group_by_key(events: List[Dict[str, Any]], key_name: str) -> Dict[str, List[Dict[str, Any]]]:
@@ -100,6 +401,785 @@ def group_by_key(events: List[Dict[str, Any]], key_name: str) -> Dict[str, List[
     """
     groups: Dict[str, List[Dict[str, Any]]] = {}
     for ev in events:
-        key_value = ev.get(key_name, "<UNKNOWN>")
-        groups.setdefault(str(key_value), []).append(ev)
+        groups.setdefault(group_value(ev.get(key_name)), []).append(ev)
     return groups
+
+
+# Grouping keys used by the reports (overall metrics are always included).
+DEFAULT_GROUP_KEYS = ("strategy_id", "account_id")
+
+
+class MetricsAccumulator:
+    """
+    Running metrics for one group of trades, fed in timestamp order.
+
+    Keeps O(1) state (counts, equity, peak, trough, max drawdown) and
+    produces the same dict as compute_metrics for the trades it has seen.
+    Accumulators of consecutive stretches of trades can be combined with
+    merge (used for log segments).
+    """
+
+    __slots__ = ("total_trades", "total_pnl", "wins", "losses", "peak", "max_drawdown", "trough")
+
+    def __init__(self) -> None:
+        self.total_trades = 0
+        self.total_pnl = 0.0
+        self.wins = 0
+        self.losses = 0
+        self.peak = 0.0
+        self.max_drawdown = 0.0
+        self.trough = 0.0
+
+    def add(self, pnl: float) -> None:
+        # Equity starts at 0; the first equity point is the initial peak.
+        equity = self.total_pnl + pnl
+        if self.total_trades == 0:
+            self.peak = self.trough = equity
+        elif equity > self.peak:
+            self.peak = equity
+        elif equity < self.trough:
+            self.trough = equity
+        drawdown = self.peak - equity
+        if drawdown > self.max_drawdown:
+            self.max_drawdown = drawdown
+
+        self.total_trades += 1
+        self.total_pnl = equity
+        if pnl > 0:
+            self.wins += 1
+        elif pnl < 0:
+            self.losses += 1
+
+    def merge(self, later: "MetricsAccumulator") -> None:
+        """
+        Append the trades summarized by later, which all come after the
+        trades seen so far. later's equity is relative to its own start, so
+        it is shifted by this accumulator's total pnl:
+        max_drawdown = max(own, later's, peak - (total_pnl + later.trough)).
+        """
+        if later.total_trades == 0:
+            return
+        if self.total_trades == 0:
+            for name in self.__slots__:
+                setattr(self, name, getattr(later, name))
+            return
+
+        offset = self.total_pnl
+        self.max_drawdown = max(
+            self.max_drawdown, later.max_drawdown, self.peak - (offset + later.trough)
+        )
+        self.peak = max(self.peak, offset + later.peak)
+        self.trough = min(self.trough, offset + later.trough)
+        self.total_trades += later.total_trades
+        self.total_pnl = offset + later.total_pnl
+        self.wins += later.wins
+        self.losses += later.losses
+
+    def result(self, starting_balance: float = 0.0) -> Dict[str, Any]:
+        return build_metrics(
+            self.total_trades,
+            self.total_pnl,
+            self.max_drawdown,
+            self.wins,
+            self.losses,
+            starting_balance,
+        )
+
+    def to_state(self) -> List[Any]:
+        """
+        JSON-serializable snapshot of the running state (see from_state).
+        """
+        return [getattr(self, name) for name in self.__slots__]
+
+    @classmethod
+    def from_state(cls, state: List[Any]) -> "MetricsAccumulator":
+        acc = cls()
+        for name, value in zip(cls.__slots__, state):
+            setattr(acc, name, value)
+        return acc
+
+
+class GroupedMetricsAggregator:
+    """
+    Single-pass metrics for overall + several groupings at once.
+
+    Feed events in timestamp order (add / add_many, or compute_grouped_metrics
+    which sorts once); every event updates the overall accumulator and one
+    accumulator per grouping key. State is O(number of groups).
+    """
+
+    def __init__(self, group_keys=DEFAULT_GROUP_KEYS) -> None:
+        self.group_keys = tuple(group_keys)
+        self.overall = MetricsAccumulator()
+        self.groups: Dict[str, Dict[str, MetricsAccumulator]] = {
+            key_name: {} for key_name in self.group_keys
+        }
+
+    def add_values(self, pnl: float, group_values) -> None:
+        """
+        Add one trade given its pnl and its group values (aligned with group_keys).
+        """
+        self.overall.add(pnl)
+        for key_name, value in zip(self.group_keys, group_values):
+            groups = self.groups[key_name]
+            acc = groups.get(value)
+            if acc is None:
+                acc = groups[value] = MetricsAccumulator()
+            acc.add(pnl)
+
+    def add(self, event: Dict[str, Any]) -> None:
+        self.add_values(
+            float(event.get("pnl", 0.0)),
+            [group_value(event.get(key_name)) for key_name in self.group_keys],
+        )
+
+    def add_many(self, events) -> None:
+        for ev in events:
+            self.add(ev)
+
+    def to_state(self) -> Dict[str, Any]:
+        """
+        JSON-serializable snapshot of all accumulators, so aggregation can be
+        persisted and resumed later with from_state.
+        """
+        return {
+            "group_keys": list(self.group_keys),
+            "overall": self.overall.to_state(),
+            "groups": {
+                key_name: {value: acc.to_state() for value, acc in groups.items()}
+                for key_name, groups in self.groups.items()
+            },
+        }
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "GroupedMetricsAggregator":
+        aggregator = cls(state["group_keys"])
+        aggregator.overall = MetricsAccumulator.from_state(state["overall"])
+        for key_name, groups in state["groups"].items():
+            aggregator.groups[key_name] = {
+                value: MetricsAccumulator.from_state(acc_state)
+                for value, acc_state in groups.items()
+            }
+        return aggregator
+
+    def results(self, starting_balance: float = 0.0) -> Dict[str, Any]:
+        """
+        Returns:
+            {
+              "overall": metrics,
+              "groups": {key_name: {key_value: metrics, ...}, ...},
+            }
+        where every metrics dict has the compute_metrics shape.
+        """
+        return {
+            "overall": self.overall.result(starting_balance),
+            "groups": {
+                key_name: {
+                    value: acc.result(starting_balance)
+                    for value, acc in groups.items()
+                }
+                for key_name, groups in self.groups.items()
+            },
+        }
+
+
+def compute_grouped_metrics_columns(
+    pnl,
+    timestamps_us,
+    group_columns: Dict[str, List[Any]],
+    starting_balance: float = 0.0,
+) -> Dict[str, Any]:
+    """
+    Vectorized grouped metrics over columnar input.
+
+    group_columns maps a key name to the per-event group values (aligned with
+    pnl). For each key:
+    - np.unique(return_inverse=True) turns the values into group codes,
+    - one stable sort orders the events by (group, timestamp),
+    - equity is a single cumsum minus each group's starting offset,
+    - the per-group running peak is one maximum.accumulate over the curves
+      lifted onto disjoint ranges (group g sits above every earlier group),
+    - counts, wins, losses and drawdowns are reduceat over group boundaries.
+    Same result shape and group order (first appearance in time) as
+    compute_grouped_metrics; values agree with it up to float rounding.
+    """
+    n = int(pnl.shape[0])
+    time_order = np.argsort(timestamps_us, kind="stable")
+    results: Dict[str, Any] = {
+        "overall": compute_metrics_columns(pnl, timestamps_us, starting_balance),
+        "groups": {},
+    }
+    if n == 0:
+        results["groups"] = {key_name: {} for key_name in group_columns}
+        return results
+
+    for key_name, values in group_columns.items():
+        names, inverse = np.unique(np.asarray(values), return_inverse=True)
+        codes_in_time = inverse.reshape(-1)[time_order]
+
+        # Stable sort by group keeps time order inside each group.
+        by_group = np.argsort(codes_in_time, kind="stable")
+        codes = codes_in_time[by_group]
+        pnl_sorted = pnl[time_order[by_group]]
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(codes)) + 1))
+        counts = np.diff(np.append(starts, n))
+
+        wins = np.add.reduceat((pnl_sorted > 0).astype(np.int64), starts)
+        losses = np.add.reduceat((pnl_sorted < 0).astype(np.int64), starts)
+
+        cumulative = np.cumsum(pnl_sorted)
+        offsets = np.concatenate(([0.0], cumulative))[starts]
+        equity = cumulative - np.repeat(offsets, counts)
+        totals = equity[starts + counts - 1]
+
+        # Shift group g's curve to start above the maximum of group g - 1, so
+        # one global running maximum never carries a peak across groups.
+        lows = np.minimum.reduceat(equity, starts)
+        highs = np.maximum.reduceat(equity, starts)
+        lift = np.concatenate(([0.0], np.cumsum(highs - lows + 1.0)[:-1])) - lows
+        group_lift = np.repeat(lift, counts)
+        peak = np.maximum.accumulate(equity + group_lift) - group_lift
+        max_drawdowns = np.maximum.reduceat(peak - equity, starts)
+
+        # Every code occurs, so segment g is group code g. Report groups in
+        # order of first appearance in time.
+        _, first_seen = np.unique(codes_in_time, return_index=True)
+        results["groups"][key_name] = {
+            str(names[g]): build_metrics(
+                int(counts[g]),
+                float(totals[g]),
+                max(float(max_drawdowns[g]), 0.0),
+                int(wins[g]),
+                int(losses[g]),
+                starting_balance,
+            )
+            for g in np.argsort(first_seen, kind="stable").tolist()
+        }
+
+    return results
+
+
+def compute_grouped_metrics(
+    events: List[Dict[str, Any]],
+    group_keys=DEFAULT_GROUP_KEYS,
+    starting_balance: float = 0.0,
+    engine: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Overall metrics plus metrics per value of each grouping key, from one sort
+    and one pass over the events (instead of compute_metrics per group).
+    See GroupedMetricsAggregator.results for the returned shape.
+
+    engine: as for compute_metrics; the NumPy engine uses
+    compute_grouped_metrics_columns.
+    """
+    if use_numpy_engine(engine, len(events)):
+        pnl, ts = events_to_columns(events)
+        group_columns = {
+            key_name: [group_value(ev.get(key_name)) for ev in events]
+            for key_name in group_keys
+        }
+        return compute_grouped_metrics_columns(pnl, ts, group_columns, starting_balance)
+
+    aggregator = GroupedMetricsAggregator(group_keys)
+    aggregator.add_many(sort_events(events))
+    return aggregator.results(starting_balance)
+
+
+# ----------------------------------------------------------------------
+# Sidecar offset index (trades_log.jsonl -> trades_log.jsonl.idx)
+# ----------------------------------------------------------------------
+#
+# Header INDEX_MAGIC, then one fixed-width record per logged event:
+#   byte offset (u64), line length (u32), timestamp_us (i64),
+#   strategy_id hash (u64), account_id hash (u64)
+# logger.TradeLogWriter appends the records after every write; LogIndex
+# indexes any unindexed tail of the log before answering a query, and
+# rebuilds the index if it no longer matches the log.
+#
+# Key maps (trades_log.jsonl.idx.keys): INDEX_KEYS_MAGIC, a JSON header
+# (records covered, byte order, last record covered), then per
+# INDEX_KEY_DIMENSIONS entry the sorted keys and their record numbers
+# (native 64-bit integers), so a query binary-searches one slice.
+
+INDEX_MAGIC = b"TEIDX001"
+INDEX_RECORD = struct.Struct("<QIqQQ")
+
+INDEX_KEYS_MAGIC = b"TEIDK001"
+INDEX_KEYS_VERSION = 1
+
+# (name, INDEX_RECORD field, array typecode) of each key map section.
+INDEX_KEY_DIMENSIONS = (("strategy", 3, "Q"), ("account", 4, "Q"), ("time", 2, "q"))
+
+# Records appended after the key maps were saved are scanned one by one;
+# beyond this many, LogIndex.open() saves the key maps again.
+INDEX_KEYS_TAIL_RECORDS = 250_000
+
+if np is not None:
+    INDEX_RECORD_DTYPE = np.dtype(
+        [
+            ("offset", "<u8"),
+            ("length", "<u4"),
+            ("timestamp_us", "<i8"),
+            ("strategy", "<u8"),
+            ("account", "<u8"),
+        ]
+    )
+
+
+def index_path_for(log_path: Path) -> Path:
+    return log_path.with_name(log_path.name + ".idx")
+
+
+def index_keys_path_for(log_path: Path) -> Path:
+    return log_path.with_name(log_path.name + ".idx.keys")
+
+
+def index_key_hash(value: Any) -> int:
+    """
+    64-bit hash of a strategy_id / account_id as stored in the index
+    (missing and null values are hashed as "<UNKNOWN>", see group_value).
+    """
+    digest = hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def index_entry(offset: int, length: int, event: Dict[str, Any]) -> Tuple[int, int, int, int, int]:
+    return (
+        offset,
+        length,
+        parse_timestamp_us(event.get("timestamp")),
+        index_key_hash(group_value(event.get("strategy_id"))),
+        index_key_hash(group_value(event.get("account_id"))),
+    )
+
+
+def append_index_records(
+    log_path: Path, offset: int, lines: Sequence[Tuple[int, Dict[str, Any]]]
+) -> bool:
+    """
+    Append the records for lines just written back to back from offset, given
+    as (length, event) pairs, but only if the index covers the log exactly up
+    to that offset (otherwise the lines are picked up by the next LogIndex
+    catch-up). Returns True if written.
+    """
+    index_path = index_path_for(log_path)
+    records = []
+    position = offset
+    for length, event in lines:
+        records.append(INDEX_RECORD.pack(*index_entry(position, length, event)))
+        position += length
+    if not records:
+        return True
+    if offset == 0:
+        with index_path.open("wb") as f:
+            f.write(INDEX_MAGIC + b"".join(records))
+        return True
+    try:
+        fd = os.open(index_path, os.O_RDWR | os.O_APPEND | getattr(os, "O_BINARY", 0))
+    except FileNotFoundError:
+        return False
+    with os.fdopen(fd, "r+b", buffering=0) as f:
+        size = f.seek(0, os.SEEK_END)
+        body = size - len(INDEX_MAGIC)
+        if body <= 0 or body % INDEX_RECORD.size:
+            return False
+        f.seek(size - INDEX_RECORD.size)
+        last_offset, last_length = INDEX_RECORD.unpack(f.read(INDEX_RECORD.size))[:2]
+        if last_offset + last_length != offset:
+            return False
+        f.write(b"".join(records))  # O_APPEND: always lands at the end
+    return True
+
+
+def _iter_lines(buf, start: int) -> Iterator[Tuple[int, int, bytes]]:
+    """
+    (offset, length, line) for newline-terminated lines of buf from start.
+    """
+    end = len(buf)
+    position = start
+    while position < end:
+        newline = buf.find(b"\n", position)
+        if newline < 0:
+            break
+        yield position, newline + 1 - position, buf[position:newline + 1]
+        position = newline + 1
+
+
+class LogIndex:
+    """
+    Read side of the sidecar offset index of a .jsonl log.
+
+    - The record file (.idx) is memory-mapped, never decoded as a whole.
+    - The key maps (.idx.keys) hold, per dimension (strategy hash, account
+      hash, timestamp), the record numbers sorted by (key, record number);
+      a query binary-searches them and reads only the matching slice.
+    - Records appended after the key maps were saved (the tail) are checked
+      one by one; once there are more than INDEX_KEYS_TAIL_RECORDS of them
+      open() saves the key maps again.
+
+    open() validates the index against the log (rebuilding it if the log was
+    truncated or replaced) and indexes any unindexed tail of the log first.
+    """
+
+    def __init__(self, log_path: Path) -> None:
+        self.log_path = Path(log_path)
+        self.index_path = index_path_for(self.log_path)
+        self.keys_path = index_keys_path_for(self.log_path)
+        self.count = 0  # records in the .idx file
+        self.keys_count = 0  # records covered by the key maps
+        self._index_map = None
+        self._keys_map = None
+        self._sections: Dict[str, Tuple[memoryview, memoryview]] = {}
+        self._log_file = None
+        self._log_map = None
+
+    def __enter__(self) -> "LogIndex":
+        self.open()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def open(self) -> None:
+        self._log_file = self.log_path.open("rb")
+        size = os.fstat(self._log_file.fileno()).st_size
+        self._log_map = (
+            mmap.mmap(self._log_file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        )
+        self._open_records()
+        if not self._records_match_log():
+            self._close_records()
+            self._write_records([], rebuild=True)
+            self._open_records()
+        self._catch_up()
+        if not self._open_keys() or self.count - self.keys_count > INDEX_KEYS_TAIL_RECORDS:
+            self._save_keys()
+
+    def close(self) -> None:
+        self._close_keys()
+        self._close_records()
+        if isinstance(self._log_map, mmap.mmap):
+            self._log_map.close()
+        if self._log_file is not None:
+            self._log_file.close()
+        self._log_map = self._log_file = None
+
+    # ------------------------------------------------------------------
+    # Record file (.idx)
+    # ------------------------------------------------------------------
+
+    def record(self, number: int) -> Tuple[int, int, int, int, int]:
+        """
+        (offset, length, timestamp_us, strategy hash, account hash) of a record.
+        """
+        return INDEX_RECORD.unpack_from(
+            self._index_map, len(INDEX_MAGIC) + number * INDEX_RECORD.size
+        )
+
+    def _open_records(self) -> None:
+        self._index_map = None
+        self.count = 0
+        try:
+            f = self.index_path.open("rb")
+        except FileNotFoundError:
+            return
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            if size <= len(INDEX_MAGIC):
+                return
+            index_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        body = size - len(INDEX_MAGIC)
+        if index_map[:len(INDEX_MAGIC)] != INDEX_MAGIC or body % INDEX_RECORD.size:
+            index_map.close()  # foreign or torn file: rebuilt from the log
+            return
+        self._index_map = index_map
+        self.count = body // INDEX_RECORD.size
+
+    def _close_records(self) -> None:
+        if self._index_map is not None:
+            self._index_map.close()
+            self._index_map = None
+        self.count = 0
+
+    def _records_match_log(self) -> bool:
+        """
+        The last indexed line must still exist at the same place with the
+        same timestamp; otherwise the log was truncated, rotated or rewritten.
+        """
+        if not self.count:
+            return True
+        offset, length, ts_us = self.record(self.count - 1)[:3]
+        if offset + length > len(self._log_map):
+            return False
+        line = self._log_map[offset:offset + length]
+        if not line.endswith(b"\n"):
+            return False
+        try:
+            event = json.loads(line)
+        except ValueError:
+            return False
+        return parse_timestamp_us(event.get("timestamp")) == ts_us
+
+    def _catch_up(self) -> None:
+        """
+        Index lines appended without an index record (other writers, or
+        appends while the index was missing or behind).
+        """
+        start = 0
+        if self.count:
+            offset, length = self.record(self.count - 1)[:2]
+            start = offset + length
+        new_records = []
+        for offset, length, line in _iter_lines(self._log_map, start):
+            if not line.strip():
+                continue
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if not is_segment_summary(event):
+                new_records.append(index_entry(offset, length, event))
+        if new_records:
+            rebuild = self.count == 0
+            self._close_records()
+            self._write_records(new_records, rebuild)
+            self._open_records()
+
+    def _write_records(self, records, rebuild: bool) -> None:
+        if rebuild:
+            tmp_path = self.index_path.with_name(self.index_path.name + ".tmp")
+            with tmp_path.open("wb") as f:
+                f.write(INDEX_MAGIC)
+                f.writelines(INDEX_RECORD.pack(*record) for record in records)
+            os.replace(tmp_path, self.index_path)
+        else:
+            with self.index_path.open("ab") as f:
+                f.writelines(INDEX_RECORD.pack(*record) for record in records)
+
+    # ------------------------------------------------------------------
+    # Key maps (.idx.keys)
+    # ------------------------------------------------------------------
+
+    def _open_keys(self) -> bool:
+        """
+        Map the saved key maps; False if they are missing, unreadable or do
+        not belong to the current record file.
+        """
+        self._close_keys()
+        try:
+            f = self.keys_path.open("rb")
+        except FileNotFoundError:
+            return False
+        with f:
+            try:
+                if f.read(len(INDEX_KEYS_MAGIC)) != INDEX_KEYS_MAGIC:
+                    raise ValueError("bad magic")
+                header_length = int.from_bytes(f.read(8), "little")
+                header = json.loads(f.read(header_length))
+                if header["version"] != INDEX_KEYS_VERSION or header["byteorder"] != sys.byteorder:
+                    raise ValueError("other version or byte order")
+                count = header["count"]
+                if count > self.count or (count and header["last"] != list(self.record(count - 1))):
+                    raise ValueError("stale")
+                start = len(INDEX_KEYS_MAGIC) + 8 + header_length + (-header_length % 8)
+                if os.fstat(f.fileno()).st_size < start + 16 * count * len(INDEX_KEY_DIMENSIONS):
+                    raise ValueError("truncated")
+            except (ValueError, KeyError, TypeError):
+                return False
+            if count:
+                self._keys_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                data = memoryview(self._keys_map)
+                for i, (name, _column, typecode) in enumerate(INDEX_KEY_DIMENSIONS):
+                    base = start + 16 * count * i
+                    self._sections[name] = (
+                        data[base:base + 8 * count].cast(typecode),
+                        data[base + 8 * count:base + 16 * count].cast("Q"),
+                    )
+        self.keys_count = count
+        return True
+
+    def _close_keys(self) -> None:
+        for keys, numbers in self._sections.values():
+            keys.release()
+            numbers.release()
+        self._sections = {}
+        if self._keys_map is not None:
+            self._keys_map.close()
+            self._keys_map = None
+        self.keys_count = 0
+
+    def _save_keys(self) -> None:
+        """
+        Sort every record by each dimension and write the key maps
+        (temp file + rename).
+        """
+        count = self.count
+        sections = self._sorted_sections(count)
+        header = json.dumps(
+            {
+                "version": INDEX_KEYS_VERSION,
+                "count": count,
+                "byteorder": sys.byteorder,
+                "last": list(self.record(count - 1)) if count else None,
+            }
+        ).encode("utf-8")
+        self._close_keys()  # an mmapped file cannot be replaced on Windows
+        tmp_path = self.keys_path.with_name(f"{self.keys_path.name}.{os.getpid()}.tmp")
+        with tmp_path.open("wb") as f:
+            f.write(INDEX_KEYS_MAGIC)
+            f.write(len(header).to_bytes(8, "little"))
+            f.write(header + b"\0" * (-len(header) % 8))
+            for keys, numbers in sections:
+                f.write(keys)
+                f.write(numbers)
+        os.replace(tmp_path, self.keys_path)
+        self._open_keys()
+
+    def _sorted_sections(self, count: int) -> List[Tuple[bytes, bytes]]:
+        """
+        (sorted keys, record numbers) per INDEX_KEY_DIMENSIONS entry, as
+        native-endian bytes; a stable sort keeps equal keys in file order.
+        """
+        body = b""
+        if count:
+            end = len(INDEX_MAGIC) + count * INDEX_RECORD.size
+            body = memoryview(self._index_map)[len(INDEX_MAGIC):end]
+        sections = []
+        if np is not None:
+            table = np.frombuffer(body, dtype=INDEX_RECORD_DTYPE, count=count)
+            for _name, column, typecode in INDEX_KEY_DIMENSIONS:
+                keys = table[INDEX_RECORD_DTYPE.names[column]]
+                order = np.argsort(keys, kind="stable")
+                native = "=u8" if typecode == "Q" else "=i8"
+                sections.append(
+                    (keys[order].astype(native).tobytes(), order.astype("=u8").tobytes())
+                )
+            del table, keys, order
+        else:
+            columns = {column: array(typecode) for _name, column, typecode in INDEX_KEY_DIMENSIONS}
+            for record in INDEX_RECORD.iter_unpack(body):
+                for column, values in columns.items():
+                    values.append(record[column])
+            for _name, column, typecode in INDEX_KEY_DIMENSIONS:
+                values = columns[column]
+                order = sorted(range(count), key=values.__getitem__)
+                sorted_keys = array(typecode, (values[i] for i in order))
+                sections.append((sorted_keys.tobytes(), array("Q", order).tobytes()))
+        if isinstance(body, memoryview):
+            body.release()
+        return sections
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _key_range(self, name: str, low: Any, high: Any) -> Optional[Tuple[int, int]]:
+        """
+        [lo, hi) of the keys of section name in [low, high] (high None: no
+        upper bound; for the time section high is exclusive).
+        """
+        section = self._sections.get(name)
+        if section is None:
+            return None
+        keys = section[0]
+        lo = bisect.bisect_left(keys, low) if low is not None else 0
+        if high is None:
+            hi = len(keys)
+        elif name == "time":
+            hi = bisect.bisect_left(keys, high, lo)
+        else:
+            hi = bisect.bisect_right(keys, high, lo)
+        return lo, max(lo, hi)
+
+    def select(
+        self,
+        strategy_id: Optional[str] = None,
+        account_id: Optional[str] = None,
+        start_us: Optional[int] = None,
+        end_us: Optional[int] = None,
+    ) -> List[Tuple[int, int]]:
+        """
+        (offset, length) of every record matching all given filters, in file
+        order. The time window is half-open: start_us <= ts < end_us.
+
+        The narrowest key map slice (strategy, account or time range) gives
+        the candidate records; only those and the unsorted tail are read.
+        """
+        strategy_hash = index_key_hash(strategy_id) if strategy_id is not None else None
+        account_hash = index_key_hash(account_id) if account_id is not None else None
+
+        ranges = []
+        if strategy_hash is not None:
+            ranges.append(("strategy", self._key_range("strategy", strategy_hash, strategy_hash)))
+        if account_hash is not None:
+            ranges.append(("account", self._key_range("account", account_hash, account_hash)))
+        if start_us is not None or end_us is not None:
+            ranges.append(("time", self._key_range("time", start_us, end_us)))
+        ranges = [(hi - lo, name, lo, hi) for name, found in ranges if found for lo, hi in [found]]
+
+        if ranges:
+            _size, name, lo, hi = min(ranges)
+            numbers = self._sections[name][1][lo:hi].tolist()
+            if name == "time":
+                numbers.sort()  # back to file order
+        else:
+            numbers = range(self.keys_count)
+
+        matches = []
+        record = self.record
+        for number in chain(numbers, range(self.keys_count, self.count)):
+            offset, length, ts_us, strategy, account = record(number)
+            if strategy_hash is not None and strategy != strategy_hash:
+                continue
+            if account_hash is not None and account != account_hash:
+                continue
+            if start_us is not None and ts_us < start_us:
+                continue
+            if end_us is not None and ts_us >= end_us:
+                continue
+            matches.append((offset, length))
+        return matches
+
+    def query(
+        self,
+        strategy_id: Optional[str] = None,
+        account_id: Optional[str] = None,
+        start_us: Optional[int] = None,
+        end_us: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Decode the matching lines straight from the mapped log. Key filters
+        are re-checked on the decoded event, so hash collisions never leak in.
+        """
+        log_map = self._log_map
+        events = []
+        for offset, length in self.select(strategy_id, account_id, start_us, end_us):
+            event = json.loads(log_map[offset:offset + length])
+            if strategy_id is not None and group_value(event.get("strategy_id")) != str(strategy_id):
+                continue
+            if account_id is not None and group_value(event.get("account_id")) != str(account_id):
+                continue
+            events.append(event)
+        return events
+
+
+def query_events(
+    path: Path,
+    strategy_id: Optional[str] = None,
+    account_id: Optional[str] = None,
+    start_us: Optional[int] = None,
+    end_us: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Events of a .jsonl log matching the given filters (all optional; the time
+    window is half-open), in file order. Uses the sidecar offset index so only
+    matching lines are read and decoded. Returns an empty list if the file
+    does not exist.
+    """
+    path = Path(path)
+    if not path.exists():
+        print(f"[INFO] No file found at {path}")
+        return []
+    with LogIndex(path) as index:
+        return index.query(strategy_id, account_id, start_us, end_us)
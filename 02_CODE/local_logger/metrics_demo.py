@@ -1,6 +1,7 @@
 from pathlib import Path
 
 from metrics_core import load_events, compute_metrics
+from log_segments import compute_history_metrics
 
 
 DATA_DIR = Path(__file__).resolve().parent / "data"
@@ -24,7 +25,6 @@ def main():
     print("=" * 30)
 
     example_events = load_events(EXAMPLE_FILE)
-    log_events = load_events(LOG_FILE)
 
     if example_events:
         metrics_example = compute_metrics(example_events, starting_balance=0.0)
@@ -32,8 +32,10 @@ def main():
     else:
         print(f"[INFO] No events found in {EXAMPLE_FILE}")
 
-    if log_events:
-        metrics_log = compute_metrics(log_events, starting_balance=0.0)
+    # Sealed segments are merged from their summaries, the open one is read
+    # incrementally (see log_segments)
+    metrics_log = compute_history_metrics(LOG_FILE, starting_balance=0.0)["overall"]
+    if metrics_log["total_trades"] > 0:
         print_metrics(f"Metrics for {LOG_FILE.name}", metrics_log)
     else:
         print(f"[INFO] No events found in {LOG_FILE}")
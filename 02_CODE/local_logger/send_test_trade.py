@@ -2,6 +2,8 @@ import json
 from datetime import datetime, timezone
 from urllib import request, error
 
+from http_compression import encode_request_body, read_response
+
 
 def build_demo_event() -> dict:
     """
@@ -36,25 +38,26 @@ def build_demo_event() -> dict:
 
 def send_trade_event(event: dict, url: str = "http://127.0.0.1:8080/trade_event") -> None:
     """
-    Send a TRADE_EVENT as JSON via HTTP POST to the logger service.
+    Send a TRADE_EVENT as JSON via HTTP POST to the logger service
+    (gzip-compressed when it is large enough).
     """
-    data = json.dumps(event).encode("utf-8")
+    data, headers = encode_request_body(json.dumps(event).encode("utf-8"))
     req = request.Request(
         url,
         data=data,
-        headers={"Content-Type": "application/json"},
+        headers={"Content-Type": "application/json", **headers},
         method="POST",
     )
 
     try:
         with request.urlopen(req) as resp:
-            body = resp.read().decode("utf-8")
+            body = read_response(resp).decode("utf-8")
             print(f"Response status: {resp.status}")
             print(f"Response body: {body}")
     except error.HTTPError as e:
         print(f"HTTP error: {e.code} {e.reason}")
         try:
-            err_body = e.read().decode("utf-8")
+            err_body = read_response(e).decode("utf-8")
             print(f"Error body: {err_body}")
         except Exception:
             pass
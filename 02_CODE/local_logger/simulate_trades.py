@@ -1,11 +1,48 @@
+import argparse
+import heapq
+import http.client
+import json
+import math
 import random
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
 
-from logger import append_trade_event
+import json_codec
+from http_compression import encode_request_body, read_response
+from logger import DUPLICATE, TradeLogWriter
+from metrics_core import format_timestamp_us, parse_timestamp_us
 
 DATA_DIR = Path(__file__).resolve().parent / "data"
 
+# Events written per batch by simulate_trades
+SIMULATE_BATCH_EVENTS = 1000
+
+# Lines per write() in the JSONL file output.
+FILE_WRITE_LINES = 10_000
+
+# Instruments known to TradeSimulator: reference price, contract size (pnl
+# per 1.0 price move and 1.0 quantity), quantity_type, price decimals and
+# daily volatility. Symbols beyond this list are synthetic (SIM001, ...).
+INSTRUMENTS = {
+    "XAUUSD": (2380.0, 100.0, "lots", 2, 0.010),
+    "EURUSD": (1.0850, 100_000.0, "lots", 5, 0.005),
+    "GBPUSD": (1.2700, 100_000.0, "lots", 5, 0.006),
+    "US500": (5200.0, 1.0, "lots", 1, 0.010),
+    "NAS100": (18_000.0, 1.0, "lots", 1, 0.013),
+    "BTCUSD": (65_000.0, 1.0, "units", 2, 0.030),
+    "ETHUSD": (3400.0, 1.0, "units", 2, 0.040),
+    "AAPL": (190.0, 1.0, "units", 2, 0.015),
+    "TSLA": (180.0, 1.0, "units", 2, 0.030),
+    "WTI": (80.0, 1000.0, "lots", 2, 0.020),
+}
+SYNTHETIC_INSTRUMENT = (100.0, 1.0, "units", 2, 0.020)
+
+VENUES = ["DEMO-SIM", "SIM-PRIME", "SIM-ECN", "SIM-CRYPTO"]
+
 
 def build_simulated_event(index: int, base_time: datetime) -> dict:
     """
@@ -70,22 +107,492 @@ def build_simulated_event(index: int, base_time: datetime) -> dict:
 def simulate_trades(num_trades: int = 20) -> None:
     """
     Generate num_trades simulated TRADE_EVENTs and append them to trades_log.jsonl
-    using append_trade_event from logger.py.
+    using a buffered TradeLogWriter from logger.py (one write per batch).
     """
     base_time = datetime.now(timezone.utc) - timedelta(minutes=5 * num_trades)
 
-    for i in range(num_trades):
-        event = build_simulated_event(i, base_time)
-        append_trade_event(event)
+    with TradeLogWriter(buffer_events=SIMULATE_BATCH_EVENTS) as writer:
+        for i in range(num_trades):
+            writer.append(build_simulated_event(i, base_time))
     print(f"Simulated and logged {num_trades} trades.")
 
 
-def main() -> None:
+# ----------------------------------------------------------------------
+# Scalable simulator
+# ----------------------------------------------------------------------
+
+DEFAULT_START = datetime(2024, 1, 1, tzinfo=timezone.utc)
+DEFAULT_MEAN_INTERVAL_S = 600.0
+
+# Chance that a trade follows the previous one within seconds (a burst),
+# and that an outcome is a tail event (a gap or news move, 3-8x its size).
+BURST_PROBABILITY = 0.15
+TAIL_PROBABILITY = 0.01
+
+# Stop distance as a fraction of the instrument's daily move; positions are
+# sized so that hitting it loses the account's risk per trade (1R).
+STOP_DAILY_FRACTION = 0.5
+
+# Commission as a fraction of the notional (minimum 0.10).
+FEE_RATE = 0.00002
+
+
+def _split_counts(total: int, weights: List[float]) -> List[int]:
+    """
+    total split proportionally to weights (largest remainders get the rest).
+    """
+    scale = total / sum(weights)
+    shares = [w * scale for w in weights]
+    counts = [int(share) for share in shares]
+    by_remainder = sorted(range(len(shares)), key=lambda i: counts[i] - shares[i])
+    for i in by_remainder[: total - sum(counts)]:
+        counts[i] += 1
+    return counts
+
+
+def _round_quantity(quantity: float, quantity_type: str) -> float:
+    if quantity_type == "lots":
+        return max(0.01, round(quantity, 2))
+    if quantity >= 1:
+        return float(round(quantity))
+    return max(0.0001, round(quantity, 4))
+
+
+class TradeSimulator:
+    """
+    Seeded generator of realistic TRADE_EVENTs over many accounts,
+    strategies and symbols.
+
+    - Each account is an independent stream with its own random generator
+      (derived from the seed and the account number), so the events depend
+      only on the parameters, not on how the work is split into shards.
+    - Trades arrive as a Poisson process per account (exponential gaps
+      around the account's own mean interval), with occasional bursts a few
+      seconds apart. Busier accounts get proportionally more events, so all
+      accounts cover about the same time span.
+    - Each strategy has a win rate and an edge; outcomes are lognormal
+      multiples of the account's risk per trade (R), with rare tail moves.
+      Prices follow a random walk per account and symbol, and price_close is
+      derived from the outcome, so prices, fees and pnl are consistent.
+
+    start=None shifts the start so that the last trade is at the current
+    time, for appending to a live log (this costs an extra pass over the
+    events).
+    """
+
+    def __init__(
+        self,
+        num_events: int,
+        seed: int = 42,
+        accounts: int = 10,
+        strategies: int = 5,
+        symbols: int = 3,
+        start: Optional[datetime] = DEFAULT_START,
+        mean_interval_s: float = DEFAULT_MEAN_INTERVAL_S,
+        live_fraction: float = 0.3,
+    ) -> None:
+        if min(accounts, strategies, symbols) < 1:
+            raise ValueError("accounts, strategies and symbols must be at least 1")
+        if num_events < 0 or mean_interval_s <= 0:
+            raise ValueError("num_events must be >= 0 and mean_interval_s > 0")
+        self.num_events = num_events
+        self.seed = seed
+        self.mean_interval_s = mean_interval_s
+        self.live_fraction = live_fraction
+
+        names = list(INSTRUMENTS)[:symbols]
+        names += [f"SIM{i:03d}" for i in range(1, symbols - len(names) + 1)]
+        self.symbols = names
+        self.strategies = [self._strategy_profile(i) for i in range(strategies)]
+        self.accounts = [self._account_profile(i) for i in range(accounts)]
+        self.account_events = _split_counts(
+            num_events, [1.0 / account["mean_interval_s"] for account in self.accounts]
+        )
+        if start is not None:
+            self.start_us = parse_timestamp_us(start.isoformat())
+        else:
+            self.start_us = 0
+            end_us = 0
+            for index in range(len(self.accounts)):
+                for ts_us, _ in self.account_stream(index):
+                    end_us = max(end_us, ts_us)
+            now = datetime.now(timezone.utc)
+            self.start_us = parse_timestamp_us(now.isoformat()) - end_us
+
+    def _rng(self, *parts: Any) -> random.Random:
+        # String seeds are hashed with SHA-512: stable across runs and platforms.
+        return random.Random(":".join(str(part) for part in (self.seed,) + parts))
+
+    def _strategy_profile(self, index: int) -> Dict[str, Any]:
+        rng = self._rng("strategy", index)
+        win_rate = rng.uniform(0.35, 0.65)
+        # Expectancy between -0.15R and +0.35R per trade.
+        edge = rng.uniform(-0.15, 0.35)
+        avg_loss = rng.uniform(0.8, 1.2)
+        return {
+            "strategy_id": f"strat_sim_{index:03d}",
+            "style": rng.choice(["trend", "meanrev", "breakout", "scalp"]),
+            "win_rate": win_rate,
+            "avg_win": (edge + (1 - win_rate) * avg_loss) / win_rate,
+            "avg_loss": avg_loss,
+            "symbols": rng.sample(self.symbols, min(len(self.symbols), rng.randint(1, 3))),
+        }
+
+    def _account_profile(self, index: int) -> Dict[str, Any]:
+        rng = self._rng("account", index)
+        count = min(len(self.strategies), rng.randint(1, 3))
+        return {
+            "account_id": f"acc_sim_{index:05d}",
+            "environment": "live" if rng.random() < self.live_fraction else "demo",
+            "venue": rng.choice(VENUES),
+            # Activity and size vary a lot between accounts.
+            "mean_interval_s": self.mean_interval_s * rng.lognormvariate(0.0, 0.75),
+            "risk": rng.lognormvariate(math.log(50.0), 0.8),
+            "strategies": rng.sample(range(len(self.strategies)), count),
+        }
+
+    def account_stream(self, index: int) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """
+        (ts_us, event) for one account's trades, in time order.
+        """
+        account = self.accounts[index]
+        rng = self._rng("events", index)
+        mean_interval_us = account["mean_interval_s"] * 1e6
+        ts_us = self.start_us + int(rng.expovariate(1.0) * mean_interval_us)
+        prices: Dict[str, Tuple[float, int]] = {}
+        for n in range(self.account_events[index]):
+            strategy = self.strategies[rng.choice(account["strategies"])]
+            symbol = rng.choice(strategy["symbols"])
+            yield ts_us, self._trade(rng, index, n, account, strategy, symbol, ts_us, prices)
+            if rng.random() < BURST_PROBABILITY:
+                gap_us = rng.uniform(1.0, 30.0) * 1e6
+            else:
+                gap_us = rng.expovariate(1.0) * mean_interval_us
+            ts_us += max(1, int(gap_us))
+
+    def _trade(
+        self,
+        rng: random.Random,
+        account_index: int,
+        n: int,
+        account: Dict[str, Any],
+        strategy: Dict[str, Any],
+        symbol: str,
+        ts_us: int,
+        prices: Dict[str, Tuple[float, int]],
+    ) -> Dict[str, Any]:
+        reference, contract, quantity_type, decimals, volatility = INSTRUMENTS.get(
+            symbol, SYNTHETIC_INSTRUMENT
+        )
+        last = prices.get(symbol)
+        if last is None:
+            price = reference * math.exp(rng.gauss(0.0, 0.05))
+        else:
+            days = (ts_us - last[1]) / 86_400e6
+            price = last[0] * math.exp(volatility * math.sqrt(days) * rng.gauss(0.0, 1.0))
+        prices[symbol] = (price, ts_us)
+
+        # Outcome in R; the lognormal parameters keep the means at avg_win / avg_loss.
+        if rng.random() < strategy["win_rate"]:
+            r_multiple = rng.lognormvariate(math.log(strategy["avg_win"]) - 0.18, 0.6)
+        else:
+            r_multiple = -rng.lognormvariate(math.log(strategy["avg_loss"]) - 0.08, 0.4)
+        if rng.random() < TAIL_PROBABILITY:
+            r_multiple *= rng.uniform(3.0, 8.0)
+
+        stop_distance = price * volatility * STOP_DAILY_FRACTION
+        quantity = _round_quantity(account["risk"] / (stop_distance * contract), quantity_type)
+        side = "buy" if rng.random() < 0.5 else "sell"
+        direction = 1 if side == "buy" else -1
+        price_open = round(price, decimals)
+        price_close = round(price_open + direction * r_multiple * stop_distance, decimals)
+        gross_pnl = (price_close - price_open) * direction * quantity * contract
+        fees = -round(max(0.10, price_open * quantity * contract * FEE_RATE), 2)
+
+        key = f"{self.seed}_{account_index:05d}_{n:08d}"
+        return {
+            "event_id": f"evt_sim_{key}",
+            "account_id": account["account_id"],
+            "strategy_id": strategy["strategy_id"],
+            "environment": account["environment"],
+            "venue": account["venue"],
+            "timestamp": format_timestamp_us(ts_us),
+            "symbol": symbol,
+            "side": side,
+            "order_type": "market" if rng.random() < 0.8 else "limit",
+            "quantity": quantity,
+            "quantity_type": quantity_type,
+            "price_open": price_open,
+            "price_close": price_close,
+            "fees": fees,
+            "pnl": round(gross_pnl + fees, 2),
+            "state": "closed",
+            "linked_position_id": f"pos_sim_{key}",
+            "tags": ["sim", strategy["style"], symbol.lower()],
+            "metadata": {"r_multiple": round(r_multiple, 3)},
+        }
+
+    def events(self, shard: int = 0, shards: int = 1) -> Iterator[Dict[str, Any]]:
+        """
+        Events of the accounts in this shard (account index % shards ==
+        shard), merged in time order.
+        """
+        streams = [self.account_stream(i) for i in range(shard, len(self.accounts), shards)]
+        for _, event in heapq.merge(*streams, key=lambda item: item[0]):
+            yield event
+
+
+def shard_paths(path: Path, shards: int) -> List[Path]:
+    """
+    trades.jsonl -> [trades.jsonl], or trades.part000.jsonl, ... for shards > 1.
+    """
+    if shards <= 1:
+        return [path]
+    return [path.with_name(f"{path.stem}.part{i:03d}{path.suffix}") for i in range(shards)]
+
+
+def _write_shard(simulator: TradeSimulator, shard: int, shards: int, path: Path) -> int:
+    count = 0
+    with path.open("w", encoding="utf-8", newline="\n") as f:
+        lines: List[str] = []
+        for event in simulator.events(shard, shards):
+            lines.append(json_codec.dumps(event))
+            if len(lines) >= FILE_WRITE_LINES:
+                f.write("\n".join(lines) + "\n")
+                count += len(lines)
+                lines = []
+        if lines:
+            f.write("\n".join(lines) + "\n")
+            count += len(lines)
+    return count
+
+
+def write_jsonl(
+    simulator: TradeSimulator, path: Path, shards: int = 1, workers: int = 1
+) -> List[Tuple[Path, int]]:
+    """
+    Write the simulated events as JSONL, split by account into shards
+    (one file each, time-ordered), generated by up to workers processes.
+    Plain buffered file writes: no validation, dedup or offset index, so use
+    simulate_to_log to feed the local log itself. Returns (path, events) per shard.
+    """
+    shards = max(1, shards)
+    paths = shard_paths(Path(path), shards)
+    paths[0].parent.mkdir(parents=True, exist_ok=True)
+    workers = max(1, min(workers, shards))
+    if workers == 1:
+        counts = [_write_shard(simulator, i, shards, p) for i, p in enumerate(paths)]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(_write_shard, simulator, i, shards, shard_path)
+                for i, shard_path in enumerate(paths)
+            ]
+            counts = [future.result() for future in futures]
+    return list(zip(paths, counts))
+
+
+def simulate_to_log(simulator: TradeSimulator, log_path: Optional[Path] = None) -> Tuple[int, int]:
+    """
+    Append the simulated events to the local log (default trades_log.jsonl)
+    through a buffered TradeLogWriter. Returns (accepted, duplicates).
+    """
+    accepted = duplicates = 0
+    with TradeLogWriter(log_path, buffer_events=SIMULATE_BATCH_EVENTS) as writer:
+        batch: List[Dict[str, Any]] = []
+        for event in simulator.events():
+            batch.append(event)
+            if len(batch) >= SIMULATE_BATCH_EVENTS:
+                statuses = writer.append_many(batch)
+                duplicates += statuses.count(DUPLICATE)
+                accepted += len(statuses)
+                batch = []
+        if batch:
+            statuses = writer.append_many(batch)
+            duplicates += statuses.count(DUPLICATE)
+            accepted += len(statuses)
+    return accepted - duplicates, duplicates
+
+
+def send_http(
+    events: Iterator[Dict[str, Any]],
+    url: str,
+    rate: float = 0.0,
+    batch_size: int = 1,
+) -> Dict[str, Any]:
+    """
+    POST events to url over one keep-alive connection (reopened after
+    errors or when the server closes it).
+
+    - batch_size 1: one JSON event per request (/trade_event of the logger
+      service or the backend); more: NDJSON bodies for the backend's
+      POST /trade_events.
+    - rate: target events per second (0 = as fast as the server answers).
+      Request k is due at start + k * batch_size / rate; a request that is
+      late is sent at once, so the average rate holds after a stall.
+
+    Returns counts (accepted, duplicates, invalid, errors) and timings.
+    """
+    parsed = urlparse(url)
+    conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=30)
+    totals = {"requests": 0, "events": 0, "accepted": 0, "duplicates": 0, "invalid": 0, "errors": 0}
+    start = time.perf_counter()
+    batch: List[Dict[str, Any]] = []
+
+    def send(batch: List[Dict[str, Any]]) -> None:
+        if rate > 0:
+            delay = start + totals["events"] / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        if batch_size == 1:
+            body = json_codec.dumps(batch[0]).encode("utf-8")
+        else:
+            body = "\n".join(json_codec.dumps(event) for event in batch).encode("utf-8")
+        body, headers = encode_request_body(body)
+        headers["Content-Type"] = "application/json" if batch_size == 1 else "application/x-ndjson"
+        totals["requests"] += 1
+        totals["events"] += len(batch)
+        try:
+            conn.request("POST", parsed.path or "/", body, headers)
+            resp = conn.getresponse()
+            data = read_response(resp)
+        except (OSError, http.client.HTTPException, ValueError):
+            conn.close()
+            totals["errors"] += len(batch)
+            return
+        if batch_size > 1 and resp.status == 200:
+            result = json.loads(data)
+            totals["accepted"] += result.get("accepted", 0)
+            totals["duplicates"] += result.get("duplicates", 0)
+            totals["invalid"] += result.get("invalid", 0)
+        elif resp.status == 200:
+            totals["accepted"] += 1
+        elif resp.status == 409 or b"already exists" in data:
+            totals["duplicates"] += len(batch)
+        elif resp.status == 400:
+            totals["invalid"] += len(batch)
+        else:
+            totals["errors"] += len(batch)
+
+    try:
+        for event in events:
+            batch.append(event)
+            if len(batch) >= batch_size:
+                send(batch)
+                batch = []
+        if batch:
+            send(batch)
+    finally:
+        conn.close()
+    seconds = time.perf_counter() - start
+    totals["seconds"] = round(seconds, 3)
+    totals["events_per_s"] = round(totals["events"] / seconds, 1) if seconds > 0 else 0.0
+    return totals
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="TRUEEDGE trade simulator")
+    parser.add_argument("--events", type=int, default=20, help="number of events (default: 20)")
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="random seed; the same seed and parameters give the same events "
+        "(default: a new seed per run)",
+    )
+    parser.add_argument("--accounts", type=int, default=3)
+    parser.add_argument("--strategies", type=int, default=2)
+    parser.add_argument(
+        "--symbols",
+        type=int,
+        default=2,
+        help=f"taken in order from {', '.join(INSTRUMENTS)}, then SIM001, ...",
+    )
+    parser.add_argument(
+        "--start",
+        default=None,
+        help="timestamp of the simulation start (ISO 8601; default: log mode "
+        "ends the trades at the current time, the other modes start at "
+        f"{DEFAULT_START.isoformat().replace('+00:00', 'Z')})",
+    )
+    parser.add_argument(
+        "--mean-interval-s",
+        type=float,
+        default=DEFAULT_MEAN_INTERVAL_S,
+        help="typical seconds between two trades of one account",
+    )
+    parser.add_argument(
+        "--output",
+        choices=["log", "jsonl", "http"],
+        default="log",
+        help="log: append to trades_log.jsonl via TradeLogWriter; jsonl: write "
+        "(sharded) JSONL files; http: POST to --url",
+    )
+    parser.add_argument("--path", help="log mode: log file; jsonl mode: output file")
+    parser.add_argument(
+        "--shards", type=int, default=None, help="jsonl mode: output files (default: --workers)"
+    )
+    parser.add_argument("--workers", type=int, default=1, help="jsonl mode: worker processes")
+    parser.add_argument(
+        "--url", default="http://127.0.0.1:8080/trade_event", help="http mode: target URL"
+    )
+    parser.add_argument(
+        "--rate", type=float, default=100.0, help="http mode: events per second (0 = no limit)"
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=1,
+        help="http mode: events per request (> 1 needs the backend's /trade_events)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
     """
     Entry point:
-    - Simulate 20 trades by default.
+    - Simulate 20 trades into trades_log.jsonl by default; see --help for
+      production-scale datasets (JSONL shards) and HTTP load.
     """
-    simulate_trades(num_trades=20)
+    args = parse_args(argv)
+    seed = args.seed if args.seed is not None else random.randrange(1_000_000)
+    start = DEFAULT_START if args.output != "log" else None
+    if args.start is not None:
+        try:
+            start = datetime.fromisoformat(args.start.replace("Z", "+00:00"))
+        except ValueError:
+            raise SystemExit(f"Invalid --start: {args.start!r}")
+        if start.tzinfo is None:
+            start = start.replace(tzinfo=timezone.utc)
+    simulator = TradeSimulator(
+        args.events,
+        seed=seed,
+        accounts=args.accounts,
+        strategies=args.strategies,
+        symbols=args.symbols,
+        start=start,
+        mean_interval_s=args.mean_interval_s,
+    )
+    print(
+        f"[INFO] Simulating {args.events} events (seed {seed}, {args.accounts} accounts, "
+        f"{args.strategies} strategies, {len(simulator.symbols)} symbols)"
+    )
+
+    started = time.perf_counter()
+    if args.output == "jsonl":
+        path = Path(args.path) if args.path else DATA_DIR / "simulated" / f"trades_sim_{seed}.jsonl"
+        shards = args.shards or args.workers
+        for shard_path, count in write_jsonl(simulator, path, shards, args.workers):
+            print(f"[INFO] {count} events -> {shard_path}")
+    elif args.output == "http":
+        totals = send_http(simulator.events(), args.url, args.rate, max(1, args.batch_size))
+        print(f"[INFO] {args.url}: {totals}")
+    else:
+        accepted, duplicates = simulate_to_log(simulator, Path(args.path) if args.path else None)
+        print(f"Simulated and logged {accepted} trades ({duplicates} duplicates skipped).")
+    elapsed = time.perf_counter() - started
+    per_second = args.events / elapsed if elapsed else 0.0
+    print(f"[INFO] Done in {elapsed:.1f} s ({per_second:.0f} events/s)")
 
 
 if __name__ == "__main__":
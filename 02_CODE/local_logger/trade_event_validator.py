@@ -1,4 +1,4 @@
-from typing import Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
 
 REQUIRED_FIELDS = [
@@ -25,13 +25,86 @@ ALLOWED_SIDES = {"buy", "sell"}
 ALLOWED_QUANTITY_TYPES = {"lots", "units"}
 ALLOWED_STATES = {"open", "closed"}
 
+# Fields that must be interpretable as floats, in the order of the coerced
+# values returned by the validators.
+NUMERIC_FIELDS = ["quantity", "price_open", "price_close", "fees", "pnl"]
+
+# (field, allowed values) pairs, checked in this order.
+ENUM_FIELDS = [
+    ("environment", ALLOWED_ENVIRONMENTS),
+    ("side", ALLOWED_SIDES),
+    ("quantity_type", ALLOWED_QUANTITY_TYPES),
+    ("state", ALLOWED_STATES),
+]
+
 
 class TradeEventValidationError(Exception):
     """Custom exception for invalid TRADE_EVENT objects."""
     pass
 
 
-def validate_trade_event(event: Dict) -> None:
+# ----------------------------------------------------------------------
+# Checks
+# ----------------------------------------------------------------------
+
+# Per-field checks with their error message parts, precomputed once so the
+# per-event loop only does lookups and comparisons.
+_ENUM_CHECKS = tuple(
+    (field, frozenset(allowed), f"Invalid {field}: ", f". Expected one of {allowed}")
+    for field, allowed in ENUM_FIELDS
+)
+_NUMERIC_CHECKS = tuple(
+    (field, f"Field {field!r} must be numeric, got: ") for field in NUMERIC_FIELDS
+)
+
+
+def _check_trade_event(event: Any) -> Tuple[Optional[str], Optional[tuple]]:
+    """
+    Return (error, numbers) for one event; see check_trade_event.
+
+    Checked in order: required fields, enums, numeric fields. The usual
+    types (str enum values, float numbers) skip the str() / float() calls.
+    """
+    if not isinstance(event, dict):
+        return "TRADE_EVENT must be a JSON object", None
+
+    for field in REQUIRED_FIELDS:
+        if field not in event:
+            missing = [name for name in REQUIRED_FIELDS if name not in event]
+            return f"Missing required fields: {missing}", None
+
+    for field, allowed, prefix, suffix in _ENUM_CHECKS:
+        value = event[field]
+        if value.__class__ is not str or value not in allowed:
+            value = str(value)
+            if value not in allowed:
+                return prefix + repr(value) + suffix, None
+
+    numbers = []
+    for field, prefix in _NUMERIC_CHECKS:
+        value = event[field]
+        if value.__class__ is not float:
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                return prefix + repr(value), None
+        numbers.append(value)
+    return None, tuple(numbers)
+
+
+# ----------------------------------------------------------------------
+# Public API
+# ----------------------------------------------------------------------
+
+def check_trade_event(event: Any) -> Tuple[Optional[str], Optional[tuple]]:
+    """
+    Validate without raising: (None, numbers) for a valid event, where
+    numbers are the NUMERIC_FIELDS as floats, or (error message, None).
+    """
+    return _check_trade_event(event)
+
+
+def validate_trade_event(event: Dict) -> tuple:
     """
     Validate a TRADE_EVENT dict according to basic rules.
 
@@ -39,42 +112,21 @@ def validate_trade_event(event: Dict) -> None:
     - Check certain fields have allowed values.
     - Check numeric fields can be interpreted as floats.
 
-    Raises TradeEventValidationError if something is wrong.
+    Returns the NUMERIC_FIELDS values as floats, so callers do not have to
+    convert them again. Raises TradeEventValidationError if something is wrong.
     """
+    error, numbers = _check_trade_event(event)
+    if error is not None:
+        raise TradeEventValidationError(error)
+    return numbers
+
 
-    missing: List[str] = [field for field in REQUIRED_FIELDS if field not in event]
-    if missing:
-        raise TradeEventValidationError(f"Missing required fields: {missing}")
-
-    # environment
-    env = str(event.get("environment"))
-    if env not in ALLOWED_ENVIRONMENTS:
-        raise TradeEventValidationError(f"Invalid environment: {env!r}. Expected one of {ALLOWED_ENVIRONMENTS}")
-
-    # side
-    side = str(event.get("side"))
-    if side not in ALLOWED_SIDES:
-        raise TradeEventValidationError(f"Invalid side: {side!r}. Expected one of {ALLOWED_SIDES}")
-
-    # quantity_type
-    qty_type = str(event.get("quantity_type"))
-    if qty_type not in ALLOWED_QUANTITY_TYPES:
-        raise TradeEventValidationError(
-            f"Invalid quantity_type: {qty_type!r}. Expected one of {ALLOWED_QUANTITY_TYPES}"
-        )
-
-    # state
-    state = str(event.get("state"))
-    if state not in ALLOWED_STATES:
-        raise TradeEventValidationError(f"Invalid state: {state!r}. Expected one of {ALLOWED_STATES}")
-
-    # numeric fields: quantity, price_open, price_close, fees, pnl
-    numeric_fields = ["quantity", "price_open", "price_close", "fees", "pnl"]
-    for field in numeric_fields:
-        value = event.get(field)
-        try:
-            float(value)
-        except (TypeError, ValueError):
-            raise TradeEventValidationError(f"Field {field!r} must be numeric, got: {value!r}")
-
-    # If we reach here, the event passes basic validation.
+def validate_many(events: List[Any]) -> Tuple[List[Optional[str]], List[Optional[tuple]]]:
+    """
+    Validate a batch without raising. Returns (errors, numbers), one entry
+    per event: errors[i] is None for a valid event or its error message, and
+    numbers[i] the NUMERIC_FIELDS as floats (None for an invalid event).
+    """
+    check = _check_trade_event
+    results = [check(event) for event in events]
+    return [error for error, _ in results], [numbers for _, numbers in results]
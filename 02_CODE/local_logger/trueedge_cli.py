@@ -5,6 +5,7 @@ import simulate_trades
 import metrics_demo
 import metrics_by_strategy
 import generate_html_report
+import columnar_snapshot
 
 
 def print_menu() -> None:
@@ -15,6 +16,7 @@ def print_menu() -> None:
     print("3) Show basic metrics (metrics_demo.py)")
     print("4) Show metrics by strategy/account (metrics_by_strategy.py)")
     print("5) Generate HTML report (generate_html_report.py)")
+    print("6) Compact log into a columnar snapshot (columnar_snapshot.py)")
     print("0) Exit")
     print()
 
@@ -29,17 +31,20 @@ def main() -> None:
             logger.main()
         elif choice == "2":
             print("\n[RUN] simulate_trades.py → multiple simulated trades")
-            simulate_trades.main()
+            simulate_trades.main([])
         elif choice == "3":
             print("\n[RUN] metrics_demo.py → basic metrics")
             metrics_demo.main()
         elif choice == "4":
             print("\n[RUN] metrics_by_strategy.py → grouped metrics")
-            metrics_by_strategy.main()
+            metrics_by_strategy.main([])
         elif choice == "5":
             print("\n[RUN] generate_html_report.py → HTML report")
             generate_html_report.main()
             print("\n[INFO] Open reports/index.html in your browser to view the report.")
+        elif choice == "6":
+            print("\n[RUN] columnar_snapshot.py → compact trades_log.jsonl")
+            columnar_snapshot.main([])
         elif choice == "0":
             print("Exiting TRUEEDGE CLI.")
             break